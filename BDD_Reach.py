@@ -0,0 +1,96 @@
+"""
+Checks simple safety properties, that is, properties of the form Gp where p has no LTL operators, by
+symbolic forward reachability with BDDs, see `bdd.py`. The set of reachable states is computed upto
+the fixed point, so properties are proved or refuted without any bound on the depth, and the
+counterexamples found are the shortest ones. The reachable states are computed once for the model,
+and then used for all the properties.
+
+Command line usage:
+    python BDD_Reach.py <specification_file> [--order {interleaved,dfs}] [--cache-size N]
+                                             [--jobs N] [--cache [DIR]] [--trace-out PREFIX]
+                                             [--trace-format {vcd,json,csv,bin}]
+
+    `--order` selects the variable order, see `bdd.variable_order`. `--cache-size` is the base 2
+    logarithm of the number of slots of the operation cache. With `--jobs N`, the properties are
+    checked by `N` worker processes in parallel, see `parallel.py`. With `--cache`, results are taken
+    from, and stored in, the result cache, see `cache.py`. With `--trace-out PREFIX`, the
+    counterexamples are also written to the files `PREFIX_<index>.<format>`, in the format given by
+    `--trace-format`, see `trace_io.py`.
+"""
+
+import time
+from utils import *
+from bdd import get_model
+
+def check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property with string `prop_str` and ast `prop_ast`, see
+    `parallel.check_properties`.
+    """
+    print('Checking property %s:'%prop_str)
+    if prop_ast.type != 'G' or is_temporal(prop_ast.child):
+        print('Property is not of Gp form, ignoring')
+        return CheckResult(None, None, 0)
+    t = time.perf_counter()
+    model = get_model(n_bits, init.ast, trans.ast, args.order, 1 << args.cache_size)
+    reached = model.reach(verbose = True)
+    print('Reached the fixed point after %d steps, %d reachable states in %d nodes'%(
+                len(model.rings) - 1, model.n_states(reached), model.mgr.node_count(reached)))
+    trace = model.check_Gp(prop_ast.child)
+    if trace is None:
+        print('The property holds in all reachable states')
+    else:
+        print("Invariant doesn't hold and there is a counterexample")
+        print_trace(n_bits, trace)
+    stats = model.mgr.stats()
+    print('BDD nodes: %d, operation cache hits: %d, misses: %d, evictions: %d, time: %.3f s'%(
+                stats['nodes'], stats['hits'], stats['misses'], stats['evictions'],
+                time.perf_counter() - t))
+    if trace is None:
+        return CheckResult('proved', None, len(model.rings) - 1)
+    return CheckResult('cex', trace, len(trace.states) - 1)
+
+
+if __name__ == "__main__":
+
+    import argparse
+    from parse_to_z3 import *
+    from spec_loader import load_spec_or_exit
+    from parser.formulas import *
+    import trace_io
+    from parallel import check_properties
+    from cache import ResultCache
+
+    argp = argparse.ArgumentParser(description = 'BDD based reachability for properties of the '
+                                                 'form Gp')
+    argp.add_argument('spec_file')
+    argp.add_argument('--order', choices = ['interleaved', 'dfs'], default = 'interleaved',
+                        help = 'the bits in their order, or in the order of a depth first walk of '
+                               'the transition relation, see bdd.py')
+    argp.add_argument('--cache-size', type = int, default = 18, metavar = 'N',
+                        help = 'use 2^N slots in the operation cache')
+    argp.add_argument('--jobs', type = int, default = 1,
+                        help = 'number of worker processes checking the properties in parallel')
+    argp.add_argument('--cache', nargs = '?', const = '', metavar = 'DIR',
+                        help = 'take results from, and store them in, the result cache in DIR, by '
+                               'default $BOUNDEDMC_CACHE_DIR or ~/.cache/boundedmc')
+    argp.add_argument('--trace-out', metavar = 'PREFIX',
+                        help = 'write the counterexample of the property at each index to the file '
+                               'PREFIX_<index>.<format>, see trace_io.py')
+    argp.add_argument('--trace-format', choices = ['vcd', 'json', 'csv', 'bin'], default = 'vcd',
+                        help = 'the format of the counterexamples written by --trace-out')
+    args = argp.parse_args()
+    if args.trace_out:
+        trace_io.start(args.trace_out, args.trace_format)
+
+    # Read spec file
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
+
+    # Parse system
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
+
+    # Parse and check properties
+    cache = None if args.cache is None else ResultCache(args.cache or None)
+    check_properties(check_property, n_bits, init_z3_gen, trans_z3_gen, props, args, args.jobs,
+                        cache, 'BDD_Reach')
@@ -2,26 +2,76 @@
 A BMC loop for arbitrary ltl formulae.
 
 Command line usage:
-    python Invariant_Liveness.py <spec_file> [threshold]
+    python BMC_LTL.py <spec_file> [threshold] [--loops {position,selector}] [--encoder {classic,linear}]
+                                  [--incremental {assumptions,scopes}] [--jobs N]
+                                  [--cache [DIR]] [--explicit-limit N] [--no-coi] [--no-simplify]
+                                  [--stats FILE]
+                                  [--trace-out PREFIX] [--trace-format {vcd,json,csv,bin}]
+                                  [--annotate]
 
     Check the specificiation given in the file `spec_file`. If `threshold` is provided, run BMC loop
-    upto the given threshold, else use the reoccurrence diameter as the threshold
+    upto the given threshold, else use the reoccurrence diameter as the threshold. `--loops` selects
+    how looping counterexamples are searched for, and `--encoder` selects the encoding of the
+    property, see `BMC_LTL`. `--incremental` selects how temporary constraints are retired, see
+    `incremental.py`. With `--jobs N`, the properties are checked by `N` worker processes in
+    parallel, see `parallel.py`. With `--cache`, results are taken from, and stored in, the result
+    cache, see `cache.py`. With `--stats FILE`, the time spent encoding and solving, and
+    the statistics of the solver, for each bound are written to `FILE`, and summed up at the end,
+    see `instrument.py`. With `--trace-out PREFIX`, the counterexamples are also written to the
+    files `PREFIX_<index>.<format>`, in the format given by `--trace-format`, see `trace_io.py`.
+    With `--annotate`, their states are annotated with the truth of the subformulas of the property
+    in the model.
 
+    With `--explicit-limit N`, if the model has at most `N` bits and is small enough, the properties
+    are checked exactly by the explicit state engine of `explicit.py` instead, and the threshold is
+    ignored. Its counterexamples are not the shortest ones, so by default, BMC is always used.
+
+    Each property is checked on the model reduced to its cone of influence, see `coi.py`, unless
+    `--no-coi` is given. Without a threshold, the exponential threshold is then that of the reduced
+    model. The negation of each property is also simplified before it is encoded, see
+    `ltl_simplify.py`, unless `--no-simplify` is given, which also makes the exponential threshold
+    smaller.
 """
 from z3 import *
 from ltl_encode import *
+from ltl_linear_encode import LinearLTLEncoder
 from utils import *
+from varpool import pool
+import instrument
+from incremental import new_solver
+from coi import check_reduced
+from ltl_simplify import simplify
+
+try:
+    import explicit
+except ImportError:
+    # NumPy is not installed, so only the SAT based engines are available
+    explicit = None
 
 
-def BMC_LTL(n,threshold,init,trans,ast):
+def BMC_LTL(n,threshold,init,trans,ast,loops='position',encoder='classic'):
     """
     Given the ast of a ltl property, initial states, and transition relation, looks for a
-    counterexample of size upto `threshold`. `n` is the number of bits.
+    counterexample of size upto `threshold`. `n` is the number of bits. Returns the counterexample
+    found, see `trace_print`, or None.
+
+    If `loops` is `'position'`, one sat call is made for each possible loop position for each
+    length. If it is `'selector'`, a selector variable `loopsel_k_l` is introduced for each loop
+    position `l`, which implies both the lasso constraint and the looping translation of the formula
+    for `l`, and a single sat call is made for each length, asking for one of the selectors.
+
+    If `encoder` is `'linear'`, the property is encoded using the linear incremental encoding of
+    `ltl_linear_encode.py` instead of the one in `ltl_encode.py`, see `BMC_LTL_linear`. The loop
+    position is then always encoded by selectors, and `loops` is ignored.
     """
+    if encoder == 'linear':
+        return BMC_LTL_linear(n,threshold,init,trans,ast)
+
     # Initialize vars, solver and set.
-    s_i = [[Bool('s_0_%d'%(i)) for i in range(n)]]
-    s=Solver()
+    s_i = [pool.state(0, n)]
+    s=new_solver()
     mem=set()
+    it = instrument.loop('BMC_LTL', s, lambda: {'mem': len(mem)})
     
     # Initialization constraint, we continue this to future iterations
     s.add(init(s_i[0]))
@@ -31,6 +81,7 @@ def BMC_LTL(n,threshold,init,trans,ast):
 
     # BMC loop
     for k in range(threshold):
+        it.bound(k+1)
         
         # Non looping case.
         print("Looking for non looping CEX of size %d"%(k+1), end = '\r')
@@ -44,66 +95,207 @@ def BMC_LTL(n,threshold,init,trans,ast):
         # constraint asserting that the formula is true. Otherwise, an unsat result will propagate
         # to all future SAT calls
         s.add(no_loop)
-        s.add(Bool('nl_%s_%d_0'%(ast.vp,k)))
+        s.add(pool.var(('nl', ast.id, k, 0)))
         # Check sat, print CEX
         if s.check() == sat:
             print("FOUND non looping CEX of size %d:                                               "%(k+1))
-            trace_print(n,k+1,s.model())
-            return
+            return it.end(trace_print(n,k+1,s.model(),ast=ast))
         s.pop()
 
-        # Looping case. We do one sat call for each looping position. Similar to before, we carry
-        # over the looping encode constraints and put the looping constraint, and the actual formula
-        # satisfaction constraint inside a push/pop section. 
-        for l in range(k):
-            print("Looking for looping CEX of size %d with last state equal to state at %d"%(k+1, l), 
-                        end = '\r')
-            ltl_looping_encode(0,l,k,ast,s,mem)
+        # Looping case with selectors. The selectors are fresh for each k, so the implications can be
+        # carried over along with the looping encode constraints, and only asking for some selector
+        # to be true goes inside the push/pop section.
+        if loops == 'selector' and k > 0:
+            print("Looking for looping CEX of size %d"%(k+1), end = '\r')
+            sel = [ pool.var(('loopsel', k, l)) for l in range(k) ]
+            for l in range(k):
+                ltl_looping_encode(0,l,k,ast,s,mem)
+                s.add(Implies(sel[l], And( And([ s_i[l][i] == s_i[k][i] for i in range(n) ]),
+                                           pool.var(('lp', ast.id, k, 0, l)))))
             s.push()
-            s.add( And([ s_i[l][i] == s_i[k][i] for i in range(n) ]))
-            s.add(Bool('lp_%s_%d_0_%d'%(ast.vp,k,l)))
+            s.add(Or(sel))
             if s.check() == sat:
+                m = s.model()
+                l = next( l for l in range(k) if is_true(m.eval(sel[l])) )
                 print("FOUND looping CEX of size %d with last state equal to state at %d:          "%(k+1, l))
-                trace_print(n,k+1,s.model(), l)
-                return
+                return it.end(trace_print(n,k+1,m, l,ast=ast))
             s.pop()
 
+        elif loops == 'position':
+            # Looping case. We do one sat call for each looping position. Similar to before, we
+            # carry over the looping encode constraints and put the looping constraint, and the
+            # actual formula satisfaction constraint inside a push/pop section. 
+            for l in range(k):
+                print("Looking for looping CEX of size %d with last state equal to state at %d"%(k+1, l), 
+                            end = '\r')
+                ltl_looping_encode(0,l,k,ast,s,mem)
+                s.push()
+                s.add( And([ s_i[l][i] == s_i[k][i] for i in range(n) ]))
+                s.add(pool.var(('lp', ast.id, k, 0, l)))
+                if s.check() == sat:
+                    print("FOUND looping CEX of size %d with last state equal to state at %d:          "%(k+1, l))
+                    return it.end(trace_print(n,k+1,s.model(), l,ast=ast))
+                s.pop()
+
         # Create new vars for next k, update path constraints, and update the non_looping
         # constraint.
-        s_i.append([Bool('s_%d_%d'%(k+1,i)) for i in range(n)])
+        s_i.append(pool.state(k+1, n))
         s.add(trans(s_i[k],s_i[k+1]))
         no_loop = And(no_loop,And([ Not( And([ s_i[k+1][i] == s_i[j][i] for i in range(n) ]))
                                                     for j in range(k+1) ]))
 
     print("Could not find CEX paths of length less than %d long.                                  "%threshold)
+    return it.end()
+
+
+def BMC_LTL_linear(n,threshold,init,trans,ast):
+    """
+    Same as `BMC_LTL`, but uses the linear incremental encoding of `ltl_linear_encode.py`. For each
+    length, only the constraints for the new state are added, and a single sat call is made with the
+    closing constraints for that length, covering both the non looping and all the looping cases.
+    """
+    s_i = [pool.state(0, n)]
+    s=new_solver()
+    s.add(init(s_i[0]))
+    enc = LinearLTLEncoder(ast, n, s)
+    it = instrument.loop('BMC_LTL_linear', s)
+
+    for k in range(threshold):
+        it.bound(k+1)
+        print("Looking for CEX of size %d"%(k+1), end = '\r')
+        enc.add_position(k)
+        s.push()
+        enc.close(k)
+        if s.check() == sat:
+            m = s.model()
+            l = enc.get_loop(m, k)
+            if l < 0:
+                print("FOUND non looping CEX of size %d:                                               "%(k+1))
+            else:
+                print("FOUND looping CEX of size %d with last state equal to state at %d:          "%(k+1, l))
+            return it.end(trace_print(n,k+1,m,l,ast=ast))
+        # Retire the closing constraints for this length
+        s.pop()
+
+        s_i.append(pool.state(k+1, n))
+        s.add(trans(s_i[k],s_i[k+1]))
+
+    print("Could not find CEX paths of length less than %d long.                                  "%threshold)
+    return it.end()
+
+def _check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    print('Checking property %s:'%prop_str)
+    prop_ast = ast_to_nnf(FormulaMonadic('NOT', prop_ast))
+    if args.simplify:
+        simple = simplify(prop_ast)
+        if simple is not prop_ast:
+            print('Simplified the negated property from %d to %d nodes'%(prop_ast.size, simple.size))
+            prop_ast = simple
+
+    model = None if explicit is None else explicit.select(n_bits, init, trans, args.explicit_limit,
+                                                                       'LTL')
+    if model is not None:
+        return explicit.check(model, 'LTL', prop_ast)
+    
+    # Get threshold
+    if args.threshold is not None:
+        threshold = args.threshold
+    else:
+        threshold = (2**n_bits) * (2**prop_ast.size)
+        print('Using Exponential threshold %d'%threshold)
+
+    trace = BMC_LTL(n_bits, threshold, init, trans, prop_ast, args.loops, args.encoder)
+    if trace is None:
+        return CheckResult('bounded', None, threshold)
+    return CheckResult('cex', trace, len(trace.states) - 1)
+
+def check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property with string `prop_str` and ast `prop_ast` as given by the command line
+    arguments `args`, see `parallel.check_properties`. Unless `args.coi` is False, the property is
+    checked on the reduced model for its cone of influence, see `coi.py`.
+    """
+    if args.coi:
+        return check_reduced(_check_property, n_bits, init, trans, prop_str, prop_ast, args)
+    return _check_property(n_bits, init, trans, prop_str, prop_ast, args)
 
 
 if __name__ == "__main__":
     
-    import sys
+    import argparse
     from parse_to_z3 import *
-    from parser.ply_parser import *
+    from spec_loader import load_spec_or_exit
     from parser.formulas import *
+    import incremental
+    import trace_io
+    from parallel import check_properties
+    from cache import ResultCache
+
+    argp = argparse.ArgumentParser(description = 'BMC for arbitrary LTL properties')
+    argp.add_argument('spec_file')
+    argp.add_argument('threshold', nargs = '?', type = int)
+    argp.add_argument('--loops', choices = ['position', 'selector'], default = 'position',
+                        help = 'one sat call per loop position, or one per length using loop '
+                               'selector variables')
+    argp.add_argument('--encoder', choices = ['classic', 'linear'], default = 'classic',
+                        help = 'the encoding of ltl_encode.py, or the linear incremental one of '
+                               'ltl_linear_encode.py')
+    argp.add_argument('--incremental', choices = ['assumptions', 'scopes'], default = 'assumptions',
+                        help = 'retire temporary constraints with activation literals, or with the '
+                               'push/pop scopes of z3, see incremental.py')
+    argp.add_argument('--jobs', type = int, default = 1,
+                        help = 'number of worker processes checking the properties in parallel')
+    argp.add_argument('--cache', nargs = '?', const = '', metavar = 'DIR',
+                        help = 'take results from, and store them in, the result cache in DIR, by '
+                               'default $BOUNDEDMC_CACHE_DIR or ~/.cache/boundedmc')
+    argp.add_argument('--explicit-limit', type = int, metavar = 'N',
+                        default = 0,
+                        help = 'use the explicit state engine for models with at most N bits, '
+                               'which finds longer counterexamples than BMC, never by default')
+    argp.add_argument('--no-coi', dest = 'coi', action = 'store_false',
+                        help = 'check the full model instead of the cone of influence of each '
+                               'property')
+    argp.add_argument('--no-simplify', dest = 'simplify', action = 'store_false',
+                        help = 'encode the negated property as it is, without simplifying it, see '
+                               'ltl_simplify.py')
+    argp.add_argument('--stats', metavar = 'FILE',
+                        help = 'write a record of the time spent encoding and solving for each '
+                               'bound to FILE, as JSON lines, see instrument.py')
+    argp.add_argument('--trace-out', metavar = 'PREFIX',
+                        help = 'write the counterexample of the property at each index to the file '
+                               'PREFIX_<index>.<format>, see trace_io.py')
+    argp.add_argument('--trace-format', choices = ['vcd', 'json', 'csv', 'bin'], default = 'vcd',
+                        help = 'the format of the counterexamples written by --trace-out')
+    argp.add_argument('--annotate', action = 'store_true',
+                        help = 'annotate the counterexamples written by --trace-out with the truth '
+                               'of the subformulas of the property')
+    args = argp.parse_args()
+    if args.trace_out:
+        trace_io.start(args.trace_out, args.trace_format, args.annotate)
+    incremental.mode = args.incremental
+    if args.stats:
+        instrument.start(args.stats)
 
     # Read spec file
-    n_bits, init_str, trans_str, prop_strs = 0, '', '', []
-    with open(sys.argv[1]) as f:
-        n_bits, init_str, trans_str, prop_strs = eval(f.read())
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
     
     # Parse system
-    init_z3_gen = parse_pred_z3_gen(init_str, n_bits)
-    trans_z3_gen = parse_trans_z3_gen(trans_str, n_bits)
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
 
     # Parse and check properties
-    for prop_str in prop_strs:
-        print('Checking property %s:'%prop_str)
-        prop_ast = ast_to_nnf(FormulaMonadic('NOT', parser.parse(prop_str)))
-        
-        # Get threshold
-        if len(sys.argv) >= 3:
-            threshold = int(sys.argv[2])
-        else:
-            threshold = (2**n_bits) * (2**prop_ast.size)
-            print('Using Exponential threshold %d'%threshold)
-
-        BMC_LTL(n_bits, threshold, init_z3_gen, trans_z3_gen, prop_ast)
+    cache = None if args.cache is None else ResultCache(args.cache or None)
+    if explicit is not None and explicit.select(n_bits, init_z3_gen, trans_z3_gen,
+                                                args.explicit_limit, 'LTL') is not None:
+        print('Using the explicit state engine')
+        engine = 'BMC_LTL explicit'
+    else:
+        engine = 'BMC_LTL threshold=%s'%args.threshold
+    if args.coi:
+        engine += ' coi'
+    if args.simplify:
+        engine += ' simplify'
+    check_properties(check_property, n_bits, init_z3_gen, trans_z3_gen, props, args, args.jobs,
+                        cache, engine)
+    if args.stats:
+        instrument.report(args.stats)
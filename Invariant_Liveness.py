@@ -3,14 +3,50 @@ BMC loop for safety and simple liveness properties, that is, properties of the f
 p has no LTL operators.
 
 Command line usage:
-    python Invariant_Liveness.py <spec_file> [threshold]
+    python Invariant_Liveness.py <spec_file> [threshold] [--loops {position,selector}]
+                                        [--incremental {assumptions,scopes}] [--jobs N]
+                                        [--cache [DIR]] [--explicit-limit N] [--no-coi]
+                                        [--unroll {functional,relational}] [--stats FILE]
+                                        [--trace-out PREFIX] [--trace-format {vcd,json,csv,bin}]
 
     Check the specificiation given in the file `spec_file`. If `threshold` is provided, run BMC loop
-    upto the given threshold, else use the reoccurrence diameter as the threshold
+    upto the given threshold, else use the reoccurrence diameter as the threshold. `--loops` selects
+    how lasso counterexamples to Fp are searched for, see `Invariant_Check_Fp`. `--incremental` selects
+    how temporary constraints are retired, see `incremental.py`. `--unroll` selects how the
+    transition relation is unrolled, see `unroll.py`. With `--jobs N`, the properties are
+    checked by `N` worker processes in parallel, see `parallel.py`. With `--cache`, the reoccurrence
+    diameter and the results are taken from, and stored in, the result cache, see `cache.py`. With
+    `--stats FILE`, the time spent encoding and solving, and the statistics of the solver, for each
+    bound are written to `FILE`, and summed up at the end, see `instrument.py`. With
+    `--trace-out PREFIX`, the counterexamples are also written to the files
+    `PREFIX_<index>.<format>`, in the format given by `--trace-format`, see `trace_io.py`.
+
+    If the model has at most `N` bits, 16 by default, and is small enough, the properties are
+    checked exactly by the explicit state engine of `explicit.py` instead, and the threshold is
+    ignored. `--explicit-limit 0` always uses BMC.
+
+    Each property is checked on the model reduced to its cone of influence, see `coi.py`, unless
+    `--no-coi` is given. Without a threshold, the reoccurrence diameter of the reduced model is then
+    used as the threshold for each property, and with `--cache`, it is taken from, and stored in,
+    the result cache, keyed on the reduced model.
 """
 
 from z3 import *
 from utils import *
+from varpool import pool
+import instrument
+from incremental import new_solver
+from unroll import Unroller
+from parse_to_z3 import parse_pred_z3_gen
+from reocc_diam import get_reocc_diam
+from coi import check_reduced
+from cache import ResultCache, model_hash
+
+try:
+    import explicit
+except ImportError:
+    # NumPy is not installed, so only the SAT based engines are available
+    explicit = None
 
 #the code for checking invariant
 def Invariant_Check_Gp(n,k,init,trans,p):
@@ -18,114 +54,257 @@ def Invariant_Check_Gp(n,k,init,trans,p):
     Check if there are lassoing cex to `Gp` of length less than `k`. The given kripke model
     has `n` bits, `init` takes a list of z3 variables and returns a z3 expression representing
     the initial states, `trans` takes two lists of z3 variables and returns a z3 expression
-    representing the transition relation.
+    representing the transition relation. Returns the counterexample found, see `trace_print`, or
+    None. The path is unrolled as given by `unroll.mode`, see `Unroller`.
     """
     j=k
-    S_N_prime = [[Bool("s_%d_%d" % (j-k,i)) for i in range(n)]]
-    s=Solver()
+    S_N_prime = [pool.state(j-k, n)]
+    unroller = Unroller(n, trans)
+    s=new_solver()
+    it = instrument.loop('Invariant_Check_Gp', s)
+    it.bound(0)
     s.add(init(S_N_prime[0]))
     s.push()
     s.add(Not(p(S_N_prime[0])))
     if(s.check() == unsat):
         while(k>0):
             s.pop()
+            it.bound(j-k+1)
             print("Checking for CEX after %d transitions"%(j-k+1), end='\r')
-            S_N_prime.append([Bool("s_%d_%d" %(j-k+1,i)) for i in range(n)])
-            s.add(trans(S_N_prime[j-k],S_N_prime[j-k+1]))
+            nxt, step = unroller.step(S_N_prime[j-k], j-k+1)
+            S_N_prime.append(nxt)
+            s.add(step)
             s.push()
             s.add(Not(p(S_N_prime[j-k+1])))
             if(s.check() == sat):
                 print("Invariant doesn't hold and there is a counterexample             ")
-                trace_print(n, len(S_N_prime), s.model())
-                return
+                return it.end(trace_print(n, len(S_N_prime), s.model(), states = S_N_prime))
             k-=1
         print("Found no counterexamples within threshold                                ")
-        return
+        return it.end()
     else:
         print("Invariant doesn't hold and there is a counterexample                     ")
-        trace_print(n, 1, s.model())
-        return
+        return it.end(trace_print(n, 1, s.model()))
 
 #BMC for Fp
-def Invariant_Check_Fp(n_bits, threshold, init, trans, p):
+def Invariant_Check_Fp(n_bits, threshold, init, trans, p, loops = 'position'):
     """
     Check if there are lassoing cex to `Fp` of length less than `threshold`. The given kripke model
     has `n_bits` bits, `init` takes a list of z3 variables and returns a z3 expression representing
     the initial states, `trans` takes two lists of z3 variables and returns a z3 expression
-    representing the transition relation.
+    representing the transition relation. Returns the counterexample found, see `trace_print`, or
+    None.
+
+    If `loops` is `'position'`, one sat call is made for each possible loop position for each
+    length. If it is `'selector'`, a selector variable `loopsel_k_l` is introduced for each loop
+    position `l`, which implies that the last state is the same as the state at `l`, and a single
+    sat call is made for each length, asking for at least one of the selectors to be true.
+
+    The path is unrolled as given by `unroll.mode`, see `Unroller`.
     """
-    s = Solver()
+    s = new_solver()
+    it = instrument.loop('Invariant_Check_Fp', s)
+    unroller = Unroller(n_bits, trans)
 
-    # The variables for the states
-    st = [[Bool('s_0_%d'%i) for i in range(n_bits)], [Bool('s_1_%d'%i) for i in range(n_bits)]]
+    # The expressions for the states
+    st = [pool.state(0, n_bits)]
+    nxt, step = unroller.step(st[0], 1)
+    st.append(nxt)
 
     # Add path conditions for lasso length 1
-    s.add(And(init(st[0]), trans(st[0], st[1])))
+    s.add(And(init(st[0]), step))
     # Add cex conditions for lasso length 1
     s.add(And(Not(p(st[0])), Not(p(st[1]))))
 
     for k in range(1, threshold+1):
+        it.bound(k)
         print("Looking for cex of size %d"%k, end='\r')
 
-        # Check for each loop position
-        for i in range(k):
-            # Set backtrack point before lasso constriant
+        if loops == 'selector':
+            # The selectors are fresh for each k, so the implications can stay in the solver
+            sel = [ pool.var(('loopsel', k, i)) for i in range(k) ]
+            s.add([ Implies(sel[i], And([ p == q for p, q in zip (st[i], st[k]) ]))
+                                                                            for i in range(k) ])
+            # Set backtrack point before asking for some loop, and check if cex
             s.push()
-            # Add lasso position
-            s.add(And([ p == q for p, q in zip (st[i], st[k]) ]))
-            # check if cex
+            s.add(Or(sel))
             if s.check() == sat:
+                m = s.model()
+                i = next( i for i in range(k) if is_true(m.eval(sel[i])) )
                 print("Found CEX of length %d with last state being the same as %d         "%(k, i))
-                trace_print(n_bits, k+1, s.model(), i)
-                return
-            # remove lasso constraint
+                return it.end(trace_print(n_bits, k+1, m, i, st))
             s.pop()
 
-        # Introduce new variables
-        st.append([Bool('s_%d_%d'%(k+1, i)) for i in range(n_bits)])
+        else:
+            # Check for each loop position
+            for i in range(k):
+                # Set backtrack point before lasso constriant
+                s.push()
+                # Add lasso position
+                s.add(And([ p == q for p, q in zip (st[i], st[k]) ]))
+                # check if cex
+                if s.check() == sat:
+                    print("Found CEX of length %d with last state being the same as %d         "%(k, i))
+                    return it.end(trace_print(n_bits, k+1, s.model(), i, st))
+                # remove lasso constraint
+                s.pop()
+
+        # Introduce the new state
+        nxt, step = unroller.step(st[k], k+1)
+        st.append(nxt)
         
         # Add path and cex conditions
-        s.add(trans(st[k], st[k+1]))
+        s.add(step)
         s.add(Not(p(st[k+1])))
 
     print("Found no counterexamples within the threshold")
+    return it.end()
+
+# The reoccurrence diameters found so far, by the asts of the models, in front of the result cache
+_diameters = {}
+
+# The result caches opened in this process, by their directories
+_caches = {}
+
+def _result_cache(cache_dir):
+    """
+    Returns the `ResultCache` in the directory `cache_dir`, or the default one if it is empty,
+    opening it only the first time in each process
+    """
+    if cache_dir not in _caches:
+        _caches[cache_dir] = ResultCache(cache_dir or None)
+    return _caches[cache_dir]
+
+def _diameter(n_bits, init, trans, cache_dir):
+    """
+    Returns the reoccurrence diameter of the model given as in `parallel.check_properties`, taken
+    from, and stored in, the result cache in `cache_dir` (see `_result_cache`) unless it is None
+    """
+    key = (n_bits, init.ast, trans.ast)
+    if key in _diameters:
+        return _diameters[key]
+    cache = None if cache_dir is None else _result_cache(cache_dir)
+    model = None if cache is None else model_hash(n_bits, init.ast, trans.ast)
+    rd = None if cache is None else cache.get_diam(model)
+    if rd is None:
+        rd = get_reocc_diam(n_bits, init, trans)
+        if cache is not None:
+            cache.put_diam(model, rd)
+    _diameters[key] = rd
+    return rd
+
+def _check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    print('Checking property %s:'%prop_str)
+    model = None if explicit is None else explicit.select(n_bits, init, trans, args.explicit_limit)
+    if prop_ast.type not in ('F', 'G'):
+        print('Property is not of Fp or Gp form, ignoring')
+        return CheckResult(None, None, 0)
+    print('Property is a simple %s property'%('liveness' if prop_ast.type == 'F' else 'safety'))
+    if model is not None:
+        return explicit.check(model, prop_ast.type, prop_ast.child)
+
+    # Without a threshold, the reoccurrence diameter of the (reduced) model is used
+    threshold = args.threshold
+    if threshold is None:
+        threshold = _diameter(n_bits, init, trans, args.cache)
+        print('Using reoccurrence diameter %d as threshold'%threshold)
+    if prop_ast.type == 'F':
+        trace = Invariant_Check_Fp(n_bits, threshold, init, trans,
+                                    parse_pred_z3_gen(prop_ast.child, n_bits), args.loops)
+    else:
+        trace = Invariant_Check_Gp(n_bits, threshold, init, trans,
+                                    parse_pred_z3_gen(prop_ast.child, n_bits))
+    if trace is None:
+        return CheckResult('bounded', None, threshold)
+    return CheckResult('cex', trace, len(trace.states) - 1)
+
+def check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property with string `prop_str` and ast `prop_ast` as given by the command line
+    arguments `args`, see `parallel.check_properties`. Unless `args.coi` is False, the property is
+    checked on the reduced model for its cone of influence, see `coi.py`.
+    """
+    if args.coi:
+        return check_reduced(_check_property, n_bits, init, trans, prop_str, prop_ast, args)
+    return _check_property(n_bits, init, trans, prop_str, prop_ast, args)
 
 
 if __name__ == "__main__":
     
-    import sys
+    import argparse
     from parse_to_z3 import *
-    from parser.ply_parser import *
+    from spec_loader import load_spec_or_exit
     from parser.formulas import *
+    import incremental
+    import unroll
+    import trace_io
+    from parallel import check_properties
+
+    argp = argparse.ArgumentParser(description = 'BMC for properties of the form Fp and Gp')
+    argp.add_argument('spec_file')
+    argp.add_argument('threshold', nargs = '?', type = int)
+    argp.add_argument('--loops', choices = ['position', 'selector'], default = 'position',
+                        help = 'one sat call per loop position, or one per length using loop '
+                               'selector variables')
+    argp.add_argument('--incremental', choices = ['assumptions', 'scopes'], default = 'assumptions',
+                        help = 'retire temporary constraints with activation literals, or with the '
+                               'push/pop scopes of z3, see incremental.py')
+    argp.add_argument('--jobs', type = int, default = 1,
+                        help = 'number of worker processes checking the properties in parallel')
+    argp.add_argument('--cache', nargs = '?', const = '', metavar = 'DIR',
+                        help = 'take results from, and store them in, the result cache in DIR, by '
+                               'default $BOUNDEDMC_CACHE_DIR or ~/.cache/boundedmc')
+    argp.add_argument('--explicit-limit', type = int, metavar = 'N',
+                        default = 0 if explicit is None else explicit.EXPLICIT_LIMIT,
+                        help = 'use the explicit state engine for models with at most N bits')
+    argp.add_argument('--no-coi', dest = 'coi', action = 'store_false',
+                        help = 'check the full model instead of the cone of influence of each '
+                               'property')
+    argp.add_argument('--unroll', choices = ['functional', 'relational'], default = 'functional',
+                        help = 'build the next state bits defined as functions of the current state '
+                               'by substitution, or always use fresh variables, see unroll.py')
+    argp.add_argument('--stats', metavar = 'FILE',
+                        help = 'write a record of the time spent encoding and solving for each '
+                               'bound to FILE, as JSON lines, see instrument.py')
+    argp.add_argument('--trace-out', metavar = 'PREFIX',
+                        help = 'write the counterexample of the property at each index to the file '
+                               'PREFIX_<index>.<format>, see trace_io.py')
+    argp.add_argument('--trace-format', choices = ['vcd', 'json', 'csv', 'bin'], default = 'vcd',
+                        help = 'the format of the counterexamples written by --trace-out')
+    args = argp.parse_args()
+    if args.trace_out:
+        trace_io.start(args.trace_out, args.trace_format)
+    incremental.mode = args.incremental
+    unroll.mode = args.unroll
+    if args.stats:
+        instrument.start(args.stats)
 
        # Read spec file
-    n_bits, init_str, trans_str, prop_strs = 0, '', '', []
-    with open(sys.argv[1]) as f:
-        n_bits, init_str, trans_str, prop_strs = eval(f.read())
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
     
     # Parse system
-    init_z3_gen = parse_pred_z3_gen(init_str, n_bits)
-    trans_z3_gen = parse_trans_z3_gen(trans_str, n_bits)
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
 
-    # Get threshold
-    if len(sys.argv) >= 3:
-        threshold = int(sys.argv[2])
+    # Get threshold, which is not needed if the explicit state engine is used, and which is found
+    # for each property with the cone of influence reduction
+    cache = None if args.cache is None else _result_cache(args.cache)
+    if explicit is not None and explicit.select(n_bits, init_z3_gen, trans_z3_gen,
+                                                args.explicit_limit) is not None:
+        print('Using the explicit state engine')
+        engine = 'Invariant_Liveness explicit'
+    elif args.threshold is None and args.coi:
+        engine = 'Invariant_Liveness threshold=coi'
     else:
-        from reocc_diam import *
-        threshold = get_reocc_diam(n_bits, init_z3_gen, trans_z3_gen)
-        print('Using reoccurrence diameter %d as threshold'%threshold)
+        if args.threshold is None:
+            args.threshold = _diameter(n_bits, init_z3_gen, trans_z3_gen, args.cache)
+            print('Using reoccurrence diameter %d as threshold'%args.threshold)
+        engine = 'Invariant_Liveness threshold=%d'%args.threshold
+    if args.coi:
+        engine += ' coi'
 
     # Parse and check properties
-    for prop_str in prop_strs:
-        print('Checking property %s:'%prop_str)
-        prop_ast = parser.parse(prop_str)
-        if prop_ast.type == 'F':
-            print('Property is a simple liveness property')
-            Invariant_Check_Fp(n_bits, threshold, init_z3_gen, trans_z3_gen, 
-                                parse_pred_z3_gen(prop_ast.child, n_bits))
-        elif prop_ast.type == 'G':
-            print('Property is a simple safety property')
-            Invariant_Check_Gp(n_bits, threshold, init_z3_gen, trans_z3_gen, 
-                                parse_pred_z3_gen(prop_ast.child, n_bits))
-        else:
-            print('Property is not of Fp or Gp form, ignoring')
+    check_properties(check_property, n_bits, init_z3_gen, trans_z3_gen, props, args, args.jobs,
+                        cache, engine)
+    if args.stats:
+        instrument.report(args.stats)
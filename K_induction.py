@@ -2,69 +2,183 @@
 Uses k-induction to check for the correctness of simple safety properties. Properties must be of the
 form Gp, where p has no LTL operators.
 
+The base case and the induction step share a single solver and unrolling `s_0 ... s_k` of the
+transition relation, along with `p` on `s_0 ... s_(k-1)`. The initial state constraint on `s_0`, and
+`Not p` on `s_k`, are guarded by activation literals, so that the base case is checked with both
+literals as assumptions, and the step case with only the second. The step case is restricted to
+simple paths, so that the loop terminates for all properties that hold, but the constraints that
+states are distinct are only added lazily: when the step case has a counterexample in which some
+state repeats, the states that are equal in it are made distinct, and the step case is checked again.
+
 Command line usage:
-    python K_induction.py <specification_file>
+    python K_induction.py <specification_file> [--jobs N] [--cache [DIR]] [--no-coi]
+                                               [--unroll {functional,relational}] [--stats FILE]
+                                               [--trace-out PREFIX]
+                                               [--trace-format {vcd,json,csv,bin}]
+
+    With `--jobs N`, the properties are checked by `N` worker processes in parallel, see
+    `parallel.py`. With `--cache`, results are taken from, and stored in, the result cache, see
+    `cache.py`. Each property is checked on the model reduced to its cone of influence, see
+    `coi.py`, unless `--no-coi` is given. `--unroll` selects how the transition relation is
+    unrolled, see `unroll.py`. With `--stats FILE`, the time spent encoding and solving, and
+    the statistics of the solver, for each bound are written to `FILE`, and summed up at the end,
+    see `instrument.py`. With `--trace-out PREFIX`, the counterexamples are also written to the
+    files `PREFIX_<index>.<format>`, in the format given by `--trace-format`, see `trace_io.py`.
 """
+import time
 from z3 import *
 from utils import *
+from varpool import pool
+import instrument
+from incremental import new_solver
+from unroll import Unroller
+from parse_to_z3 import parse_pred_z3_gen
+from coi import check_reduced
+
+def _print_timings(times):
+    print('Depth   Base (s)   Step (s)   Simple path constraints')
+    for k, t_base, t_step, n_simple in times:
+        print('%-5d %10.4f %10.4f   %d'%(k, t_base, t_step, n_simple))
+
+def K_induction(n,init,trans,p,stats=None):
+    """
+    Checks `Gp` by k-induction, for a kripke model with `n` bits, where `init` takes a list of z3
+    variables and returns a z3 expression representing the initial states, `trans` takes two lists of
+    z3 variables and returns a z3 expression representing the transition relation, and `p` takes a
+    list of z3 variables. Prints the depth at which the property is proved or a counterexample is
+    found, along with the time taken by the base and step cases at each depth. Returns the
+    counterexample found, see `trace_print`, or None if the property is proved. If a dict `stats` is
+    given, the depth is stored in it as `depth`, and the timings as `times`, a list of tuples of the
+    depth, the times taken by the base and step cases, and the number of simple path constraints.
+    The unrolling is done as given by `unroll.mode`, see `Unroller`.
+    """
+    st = [pool.state(0, n)]
+    unroller = Unroller(n, trans)
+    s = new_solver()
+    it = instrument.loop('K_induction', s)
+    init_act = pool.var(('kind_init',))
+    s.add(Implies(init_act, init(st[0])))
+    times = []
+    if stats is not None:
+        stats['times'] = times
+
+    k = 0
+    while True:
+        it.bound(k)
+        print("Checking for CEX after %d transitions"%(k), end='\r')
+        # The literal asserting that p does not hold at the last state
+        neg_act = pool.var(('kind_neg', k))
+        s.add(Implies(neg_act, Not(p(st[k]))))
 
-def K_induction(n,init,trans,p):
-    S_N_prime = [[Bool("s_%s_%s" % (0,i)) for i in range(n)]]
-    s=Solver()
-    s1=Solver()
-    s.push()
-    s1.add(init(S_N_prime[0]))
-    s1.push()
-    s1.add(Not(p(S_N_prime[0])))
-    if(s1.check() == unsat):
-        k=1
-        while(True):
-            s.pop()
-            print("Checking for CEX after %d transitions"%(k), end='\r')
-            S_N_prime.append([Bool("s_%s_%s" % (k,i)) for i in range(n)])
-            s.add(And(p(S_N_prime[k-1]),trans(S_N_prime[k-1],S_N_prime[k])))
-            s.push()
-            s.add(Not(p(S_N_prime[k])))
-            if(s.check()==unsat):
-                print("Verified, p is %d-inductive                                          "%k)
-                return
-            s1.pop()
-            s1.add(trans(S_N_prime[k-1],S_N_prime[k]))
-            s1.push()
-            s1.add(Not(p(S_N_prime[k])))
-            if(s1.check()==sat):
-                print("CounterExample                                                       ")
-                trace_print(n, len(S_N_prime), s.model())
-                return
-            k+=1
-        print("The invariant could not be proved                                            ")
-    else:
-        print("Invariant doesn't hold and there is a counterexample                         ")
-        trace_print(n, 1, s.model())
-        return
+        # Step case, p holding on k states implies p at the next one, on simple paths
+        t_step, n_simple, proved = time.perf_counter(), 0, False
+        while k > 0:
+            if s.check(neg_act) == unsat:
+                proved = True
+                break
+            pairs = repeated_states(s.model(), st)
+            if not pairs:
+                break
+            n_simple += len(pairs)
+            s.add([ distinct_states(st[i], st[j]) for i, j in pairs ])
+        t_step = time.perf_counter() - t_step
+        if proved:
+            times.append((k, 0.0, t_step, n_simple))
+            if stats is not None:
+                stats['depth'] = k
+            print("Verified, p is %d-inductive                                          "%k)
+            _print_timings(times)
+            return it.end()
+
+        # Base case, a path from an initial state to a state where p does not hold
+        t_base = time.perf_counter()
+        res = s.check(init_act, neg_act)
+        t_base = time.perf_counter() - t_base
+        times.append((k, t_base, t_step, n_simple))
+        if res == sat:
+            if stats is not None:
+                stats['depth'] = k
+            print("Invariant doesn't hold and there is a counterexample                         ")
+            trace = trace_print(n, k+1, s.model(), states = st)
+            _print_timings(times)
+            return it.end(trace)
+
+        # Retire the literal, and extend the unrolling, with p holding on all but the last state
+        s.add(Not(neg_act))
+        nxt, step = unroller.step(st[k], k+1)
+        st.append(nxt)
+        s.add(p(st[k]), step)
+        k += 1
+
+def _check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    print('Checking property %s:'%prop_str)
+    if prop_ast.type != 'G':
+        print('Property is not of Gp form, ignoring')
+        return CheckResult(None, None, 0)
+    stats = {}
+    trace = K_induction(n_bits, init, trans, parse_pred_z3_gen(prop_ast.child, n_bits), stats)
+    return CheckResult('proved' if trace is None else 'cex', trace, stats['depth'])
+
+def check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property with string `prop_str` and ast `prop_ast`, see
+    `parallel.check_properties`. Unless `args.coi` is False, the property is checked on the reduced
+    model for its cone of influence, see `coi.py`.
+    """
+    if args.coi:
+        return check_reduced(_check_property, n_bits, init, trans, prop_str, prop_ast, args)
+    return _check_property(n_bits, init, trans, prop_str, prop_ast, args)
 
 
 if __name__ == "__main__":
     
-    import sys
+    import argparse
     from parse_to_z3 import *
-    from parser.ply_parser import *
+    from spec_loader import load_spec_or_exit
     from parser.formulas import *
+    import unroll
+    import trace_io
+    from parallel import check_properties
+    from cache import ResultCache
+
+    argp = argparse.ArgumentParser(description = 'k-induction for properties of the form Gp')
+    argp.add_argument('spec_file')
+    argp.add_argument('--jobs', type = int, default = 1,
+                        help = 'number of worker processes checking the properties in parallel')
+    argp.add_argument('--cache', nargs = '?', const = '', metavar = 'DIR',
+                        help = 'take results from, and store them in, the result cache in DIR, by '
+                               'default $BOUNDEDMC_CACHE_DIR or ~/.cache/boundedmc')
+    argp.add_argument('--no-coi', dest = 'coi', action = 'store_false',
+                        help = 'check the full model instead of the cone of influence of each '
+                               'property')
+    argp.add_argument('--unroll', choices = ['functional', 'relational'], default = 'functional',
+                        help = 'build the next state bits defined as functions of the current state '
+                               'by substitution, or always use fresh variables, see unroll.py')
+    argp.add_argument('--stats', metavar = 'FILE',
+                        help = 'write a record of the time spent encoding and solving for each '
+                               'bound to FILE, as JSON lines, see instrument.py')
+    argp.add_argument('--trace-out', metavar = 'PREFIX',
+                        help = 'write the counterexample of the property at each index to the file '
+                               'PREFIX_<index>.<format>, see trace_io.py')
+    argp.add_argument('--trace-format', choices = ['vcd', 'json', 'csv', 'bin'], default = 'vcd',
+                        help = 'the format of the counterexamples written by --trace-out')
+    args = argp.parse_args()
+    if args.trace_out:
+        trace_io.start(args.trace_out, args.trace_format)
+    unroll.mode = args.unroll
+    if args.stats:
+        instrument.start(args.stats)
 
     # Read spec file
-    n_bits, init_str, trans_str, prop_strs = 0, '', '', []
-    with open(sys.argv[1]) as f:
-        n_bits, init_str, trans_str, prop_strs = eval(f.read())
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
     
     # Parse system
-    init_z3_gen = parse_pred_z3_gen(init_str, n_bits)
-    trans_z3_gen = parse_trans_z3_gen(trans_str, n_bits)
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
 
     # Parse and check properties
-    for prop_str in prop_strs:
-        print('Checking property %s:'%prop_str)
-        prop_ast = parser.parse(prop_str)
-        if prop_ast.type == 'G':
-            K_induction(n_bits, init_z3_gen, trans_z3_gen, parse_pred_z3_gen(prop_ast.child, n_bits))
-        else:
-            print('Property is not of Gp form, ignoring')
+    cache = None if args.cache is None else ResultCache(args.cache or None)
+    check_properties(check_property, n_bits, init_z3_gen, trans_z3_gen, props, args, args.jobs,
+                        cache, 'K_induction coi' if args.coi else 'K_induction')
+    if args.stats:
+        instrument.report(args.stats)
@@ -0,0 +1,336 @@
+"""
+Checks simple safety properties, that is, properties of the form Gp where p has no LTL operators,
+with IC3, also known as property directed reachability (PDR).
+
+The frames `F_0 ... F_k` over-approximate the states reachable in at most `0 ... k` steps: `F_0` is
+the set of initial states, and each later frame is a set of clauses, each blocking a cube of states,
+that is, a partial assignment to the bits. A clause is stored in the frame of the highest level at
+which it is known to hold, and holds in all the frames below it. Each frame `i` has its own
+incremental solver, holding `F_i` on the current state, and the transition relation and `Not p`
+under activation literals, so that all the queries are sat calls with assumptions. The transition
+relation is only assumed by the one step queries, so that bad states without successors are found.
+
+The bad states of the last frame are blocked by recursively blocking their predecessors in the
+earlier frames. A cube which has no predecessor in the previous frame outside itself is generalized
+by taking the unsat core of the query, and then by dropping literals one by one while the cube stays
+relatively inductive, before being blocked. If a predecessor is found in `F_0`, there is a
+counterexample. Once the last frame has no bad states, clauses are propagated to the later frames
+where they hold, and if some frame ends up with no clauses of its own, it is equal to the next one,
+and so it is an inductive invariant implying p. The invariant is printed as a predicate that can be
+checked independently, see `check_invariant`.
+
+Command line usage:
+    python PDR.py <specification_file> [--jobs N] [--cache [DIR]] [--trace-out PREFIX]
+                                       [--trace-format {vcd,json,csv,bin}]
+
+    With `--jobs N`, the properties are checked by `N` worker processes in parallel, see
+    `parallel.py`. With `--cache`, results are taken from, and stored in, the result cache, see
+    `cache.py`. With `--trace-out PREFIX`, the counterexamples are also written to the
+    files `PREFIX_<index>.<format>`, in the format given by `--trace-format`, see `trace_io.py`.
+"""
+
+import heapq
+from z3 import *
+from utils import *
+from varpool import pool
+from incremental import new_solver
+from parse_to_z3 import parse_pred_z3_gen
+
+def _lits(cube, st):
+    # The z3 literals of the cube, a tuple of pairs of a bit and its value, over the state `st`
+    return [ st[i] if b else Not(st[i]) for i, b in cube ]
+
+def _clause(cube, st):
+    # The z3 clause blocking the cube over the state `st`
+    return Or([ Not(st[i]) if b else st[i] for i, b in cube ])
+
+def cube_to_str(cube):
+    """
+    The string of the predicate of the cube, in the syntax of the specification files
+    """
+    lits = [ 'v%d'%i if b else '(!v%d)'%i for i, b in cube ]
+    return lits[0] if len(lits) == 1 else '(%s)'%(' . '.join(lits))
+
+def invariant_to_str(cubes):
+    """
+    The string of the predicate blocking all the given cubes, in the syntax of the specification
+    files. The conjunction is balanced, so that the parser does not recurse too deep on it.
+    """
+    fs = [ '(!%s)'%cube_to_str(c) for c in cubes ]
+    if not fs:
+        return 'tru'
+    while len(fs) > 1:
+        fs = [ '(%s . %s)'%(fs[i], fs[i+1]) if i+1 < len(fs) else fs[i]
+                                                            for i in range(0, len(fs), 2) ]
+    return fs[0]
+
+def check_invariant(n_bits, init, trans, p, inv):
+    """
+    Checks that the predicate `inv`, a string or an ast, is an inductive invariant implying `p`, for
+    the Kripke model with `n_bits` bits, where `init`, `trans` and `p` are as in `parse_to_z3.py`.
+    Each of the conditions is checked by a fresh solver. Returns the list of the conditions that do
+    not hold, which is empty if the invariant is correct.
+    """
+    inv = parse_pred_z3_gen(inv, n_bits)
+    s0, s1 = pool.state(0, n_bits), pool.state(1, n_bits)
+    failed = []
+    for name, cond in [('initiation', And(init(s0), Not(inv(s0)))),
+                       ('consecution', And(inv(s0), trans(s0, s1), Not(inv(s1)))),
+                       ('safety', And(inv(s0), Not(p(s0))))]:
+        s = Solver()
+        s.add(cond)
+        if s.check() != unsat:
+            failed.append(name)
+    return failed
+
+class PDR():
+    """
+    The state of IC3 checking `Gp` on the Kripke model with `n` bits, where `init` takes a list of
+    z3 variables and returns a z3 expression representing the initial states, `trans` takes two lists
+    of z3 variables and returns a z3 expression representing the transition relation, and `p` takes a
+    list of z3 variables.
+
+    `frames[i]` is the list of the cubes blocked by the clauses of level `i`, and `solvers[i]` is
+    the solver for `F_i`. `invariant` is set to the list of the cubes blocked by the invariant once
+    the property is proved.
+    """
+    def __init__(self, n, init, trans, p):
+        self.n = n
+        self.trans = trans
+        self.p = p
+        self.st = pool.state(0, n)
+        self.nx = pool.state(1, n)
+        self.bad = pool.var(('pdr_bad',))
+        self.step = pool.var(('pdr_trans',))
+        self.init_solver = new_solver()
+        self.init_solver.add(init(self.st))
+        self.init_solver.add(Implies(self.bad, Not(p(self.st))))
+        self.frames = []
+        self.solvers = []
+        self.invariant = None
+        self._new_frame()
+        self.solvers[0].add(init(self.st))
+
+    def _new_frame(self):
+        s = new_solver()
+        s.add(Implies(self.step, self.trans(self.st, self.nx)))
+        s.add(Implies(self.bad, Not(self.p(self.st))))
+        self.frames.append([])
+        self.solvers.append(s)
+
+    def _state(self, m, st):
+        # The full cube of the state `st` in the model `m`
+        return tuple( (i, 1 if is_true(m.eval(v, model_completion = True)) else 0)
+                                                                    for i, v in enumerate(st) )
+
+    def _is_init(self, cube):
+        return self.init_solver.check(_lits(cube, self.st)) == sat
+
+    def _relative(self, cube, i):
+        """
+        Checks if `cube` is inductive relative to `F_i`, that is, if no state of `F_i` outside it
+        has a successor in it. Returns the pair of the sat result, and either the predecessor found
+        or the sub cube of the literals in the unsat core.
+        """
+        s = self.solvers[i]
+        s.push()
+        s.add(_clause(cube, self.st))
+        lits = _lits(cube, self.nx)
+        res = s.check(self.step, lits)
+        if res == sat:
+            out = self._state(s.model(), self.st)
+        else:
+            core = { c.get_id() for c in s.unsat_core() }
+            out = tuple( l for l, z in zip(cube, lits) if z.get_id() in core )
+        s.pop()
+        return res, out
+
+    def _generalize(self, cube, core, i):
+        """
+        Shrinks the cube, which is inductive relative to `F_(i-1)`, first to the sub cube `core`
+        from the unsat core, and then by dropping literals, keeping it disjoint from the initial
+        states and relatively inductive
+        """
+        if not core or self._is_init(core):
+            # Put back literals of the cube until the initial states are excluded
+            core = list(core)
+            for l in cube:
+                if l not in core:
+                    core.append(l)
+                    if not self._is_init(tuple(sorted(core))):
+                        break
+            core = tuple(sorted(core))
+        for l in list(core):
+            if l not in core or len(core) == 1:
+                continue
+            cand = tuple( m for m in core if m != l )
+            if self._is_init(cand):
+                continue
+            res, sub = self._relative(cand, i - 1)
+            if res == unsat:
+                core = sub if sub and not self._is_init(sub) else cand
+        return core
+
+    def _add_blocked(self, cube, level):
+        self.frames[level].append(cube)
+        for s in self.solvers[1 : level + 1]:
+            s.add(_clause(cube, self.st))
+
+    def _block(self, cube, k):
+        """
+        Blocks the bad state `cube` in `F_k`, along with its predecessors in the earlier frames.
+        Returns the counterexample if the state is reachable, else None.
+        """
+        # The proof obligations, with the cube to block, the frame, and the obligation for the
+        # successor of the cube on the path to the bad state
+        heap = [(k, 0, cube, None)]
+        count = 1
+        while heap:
+            i, _, c, succ = heapq.heappop(heap)
+            if i == 0:
+                # The cube is an initial state, follow the successors to the bad state
+                states, ob = [c], succ
+                while ob is not None:
+                    states.append(ob[2])
+                    ob = ob[3]
+                return Trace([ tuple( b for _, b in s ) for s in states ], -1)
+            # Skip the cubes that are already blocked
+            if self.solvers[i].check(_lits(c, self.st)) == unsat:
+                if i < k:
+                    heapq.heappush(heap, (i + 1, count, c, succ))
+                    count += 1
+                continue
+            res, out = self._relative(c, i - 1)
+            if res == sat:
+                heapq.heappush(heap, (i, count, c, succ))
+                heapq.heappush(heap, (i - 1, count + 1, out, (i, count, c, succ)))
+                count += 2
+                continue
+            g = self._generalize(c, out, i)
+            # Block the cube in as late a frame as possible
+            j = i
+            while j < k and self._relative(g, j)[0] == unsat:
+                j += 1
+            self._add_blocked(g, j)
+            if j < k:
+                heapq.heappush(heap, (j + 1, count, c, succ))
+                count += 1
+        return None
+
+    def _propagate(self, k):
+        """
+        Pushes the clauses of the frames `1 ... k` forward where they hold. Returns True if some
+        frame becomes equal to the next, in which case `invariant` is set.
+        """
+        for i in range(1, k + 1):
+            for c in list(self.frames[i]):
+                if self.solvers[i].check(self.step, _lits(c, self.nx)) == unsat:
+                    self.frames[i].remove(c)
+                    self.frames[i + 1].append(c)
+                    self.solvers[i + 1].add(_clause(c, self.st))
+            if not self.frames[i]:
+                self.invariant = [ c for f in self.frames[i + 1:] for c in f ]
+                return True
+        return False
+
+    def run(self, stats = None):
+        """
+        Runs IC3, and returns the counterexample found, as a `Trace`, or None if the property is
+        proved. If a dict `stats` is given, the number of frames is stored in it as `depth`.
+        """
+        if self.init_solver.check(self.bad) == sat:
+            if stats is not None:
+                stats['depth'] = 0
+            return Trace([ tuple( b for _, b in self._state(self.init_solver.model(), self.st) ) ],
+                         -1)
+        self._new_frame()
+        k = 1
+        while True:
+            print("Blocking bad states in frame %d"%k, end='\r')
+            while self.solvers[k].check(self.bad) == sat:
+                trace = self._block(self._state(self.solvers[k].model(), self.st), k)
+                if trace is not None:
+                    if stats is not None:
+                        stats['depth'] = k
+                    return trace
+            self._new_frame()
+            if self._propagate(k):
+                if stats is not None:
+                    stats['depth'] = k
+                return None
+            k += 1
+
+    def print_stats(self):
+        """
+        Prints the number of clauses, sat calls, and time spent in them, for each frame
+        """
+        print('Frame   Clauses   SAT calls   SAT time (s)')
+        for i, (f, s) in enumerate(zip(self.frames, self.solvers)):
+            print('%-5d %9d %11d %14.4f'%(i, len(f), s.checks, s.check_time))
+
+def check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property with string `prop_str` and ast `prop_ast`, see
+    `parallel.check_properties`.
+    """
+    print('Checking property %s:'%prop_str)
+    if prop_ast.type != 'G' or is_temporal(prop_ast.child):
+        print('Property is not of Gp form, ignoring')
+        return CheckResult(None, None, 0)
+    p = parse_pred_z3_gen(prop_ast.child, n_bits)
+    pdr = PDR(n_bits, init, trans, p)
+    stats = {}
+    trace = pdr.run(stats)
+    if trace is None:
+        inv = invariant_to_str(pdr.invariant)
+        print("Verified, found an inductive invariant in frame %d                          "%(
+                                                                                stats['depth']))
+        print('Invariant: %s'%inv)
+        failed = check_invariant(n_bits, init, trans, p, inv)
+        if failed:
+            raise AssertionError('The invariant fails %s'%', '.join(failed))
+        print('Checked that the invariant is inductive and implies the property')
+    else:
+        print("Invariant doesn't hold and there is a counterexample                         ")
+        print_trace(n_bits, trace)
+    pdr.print_stats()
+    return CheckResult('proved' if trace is None else 'cex', trace, stats['depth'])
+
+
+if __name__ == "__main__":
+
+    import argparse
+    from parse_to_z3 import *
+    from spec_loader import load_spec_or_exit
+    from parser.formulas import *
+    import trace_io
+    from parallel import check_properties
+    from cache import ResultCache
+
+    argp = argparse.ArgumentParser(description = 'IC3/PDR for properties of the form Gp')
+    argp.add_argument('spec_file')
+    argp.add_argument('--jobs', type = int, default = 1,
+                        help = 'number of worker processes checking the properties in parallel')
+    argp.add_argument('--cache', nargs = '?', const = '', metavar = 'DIR',
+                        help = 'take results from, and store them in, the result cache in DIR, by '
+                               'default $BOUNDEDMC_CACHE_DIR or ~/.cache/boundedmc')
+    argp.add_argument('--trace-out', metavar = 'PREFIX',
+                        help = 'write the counterexample of the property at each index to the file '
+                               'PREFIX_<index>.<format>, see trace_io.py')
+    argp.add_argument('--trace-format', choices = ['vcd', 'json', 'csv', 'bin'], default = 'vcd',
+                        help = 'the format of the counterexamples written by --trace-out')
+    args = argp.parse_args()
+    if args.trace_out:
+        trace_io.start(args.trace_out, args.trace_format)
+
+    # Read spec file
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
+
+    # Parse system
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
+
+    # Parse and check properties
+    cache = None if args.cache is None else ResultCache(args.cache or None)
+    check_properties(check_property, n_bits, init_z3_gen, trans_z3_gen, props, args, args.jobs,
+                        cache, 'PDR')
@@ -0,0 +1,271 @@
+"""
+Reads models in the AIGER format (http://fmv.jku.at/aiger), both ASCII (`aag`) and binary (`aig`),
+including the bad state, invariant constraint, justice and fairness sections of AIGER 1.9. The and
+gates are built directly as a shared DAG of `Formula`s (see `parser/formulas.py`), without going
+through the text of the formulas, and the walks over the gates are iterative, so circuits of any
+depth can be read. `spec_loader.load_spec` recognizes AIGER files by their header, so all the scripts
+take them as specification files.
+
+The model has a state bit for each latch, followed by a state bit for each input, so bit `i` is
+latch `i` for `i < L`, and input `i - L` otherwise. The transition relation is the conjunction of
+the definitions `(vi = f)` of the latches, with `f` the gate of the next state function over the
+`uj`, so that the definitions are picked up by the cone of influence reduction and the functional
+unrolling (see `coi.py` and `unroll.py`). The input bits are left free, so they take any value in
+each state. A latch with the reset value 0 or 1 is constrained in the initial states, and one
+which is reset to itself is left free. The invariant constraints are added to the initial states
+and, on the next state, to the transition relation, so that they hold in every state.
+
+Each bad state literal `b` gives the property `G (! b)`. Each justice property, a set of literals
+that a counterexample makes true infinitely often, along with all the fairness literals, gives the
+LTL property `! ((G (F j1)) . (G (F j2)) ...)`, which only the LTL engines can check. If there are
+neither bad state nor justice properties, the outputs are taken as bad states, as in AIGER 1.0. The
+properties are named in their strings by their section and index, like `G (! b0)`, rather than by
+the formula of their gate.
+
+Command line usage:
+    python aiger.py <aiger_file>
+
+    Reads the file, and prints the sizes of its sections and of the formulas built.
+"""
+
+import gc
+from parser.formulas import *
+from spec_loader import Spec, SpecError, Conjunction
+
+class Aig():
+    """
+    The sections of an AIGER file. `bits[v]` is the state bit of the input or latch variable `v`, and
+    `left[v]` and `right[v]` are the literals of the inputs of the and gate for variable `v`, all -1
+    for the variables that are not inputs, latches or gates respectively. The latches are
+    `(next, reset)` pairs of literals, the reset literal being 0, 1, or the literal of the latch.
+    """
+    def __init__(self, max_var, n_inputs, n_latches):
+        self.max_var = max_var
+        self.n_inputs = n_inputs
+        self.n_latches = n_latches
+        self.latches = []
+        self.outputs = []
+        self.bad = []
+        self.constraints = []
+        self.justice = []
+        self.fairness = []
+        self.bits = [-1] * (max_var + 1)
+        self.left = [-1] * (max_var + 1)
+        self.right = [-1] * (max_var + 1)
+
+class _Reader():
+    # Reads the lines and the numbers of the binary encoding of the and gates from the bytes `data`
+    def __init__(self, data, path):
+        self.data = data
+        self.path = path
+        self.pos = 0
+        self.lineno = 0
+
+    def error(self, msg):
+        raise SpecError(self.path, self.lineno, msg)
+
+    def line(self):
+        end = self.data.find(b'\n', self.pos)
+        if end < 0:
+            self.error('unexpected end of file')
+        line = self.data[self.pos:end]
+        self.pos = end + 1
+        self.lineno += 1
+        return line
+
+    def numbers(self, count):
+        fields = self.line().split()
+        if len(fields) != count or not all( f.isdigit() for f in fields ):
+            self.error('expected %d number%s'%(count, '' if count == 1 else 's'))
+        return [ int(f) for f in fields ]
+
+    def varint(self):
+        x, shift = 0, 0
+        data = self.data
+        try:
+            while True:
+                b = data[self.pos]
+                self.pos += 1
+                x |= (b & 0x7f) << shift
+                if b < 0x80:
+                    return x
+                shift += 7
+        except IndexError:
+            self.error('unexpected end of file in the and gates')
+
+def read_aiger(data, path = '<aiger>'):
+    """
+    Reads the AIGER file, ASCII or binary, with the contents `data` (bytes), returns its `Aig`
+    """
+    r = _Reader(data, path)
+    header = r.line().split()
+    if not header or header[0] not in (b'aag', b'aig') or not 6 <= len(header) <= 10 \
+                                            or not all( f.isdigit() for f in header[1:] ):
+        r.error('not an AIGER header')
+    binary = header[0] == b'aig'
+    M, I, L, O, A, B, C, J, F = [ int(f) for f in header[1:] ] + [0] * (10 - len(header))
+    if M < I + L + A or (binary and M != I + L + A):
+        r.error('the maximum variable index is inconsistent with the header')
+    aig = Aig(M, I, L)
+
+    def literal(lit):
+        if lit > 2*M + 1:
+            r.error('literal %d is out of range'%lit)
+        return lit
+
+    def define(lhs, bit = -1):
+        # Checks that `lhs` is a variable that was not defined yet, and sets its state bit
+        if lhs & 1 or lhs < 2 or lhs > 2*M:
+            r.error('%d is not the literal of a variable'%lhs)
+        if aig.bits[lhs >> 1] >= 0 or aig.left[lhs >> 1] >= 0:
+            r.error('variable %d is defined twice'%(lhs >> 1))
+        aig.bits[lhs >> 1] = bit
+
+    for k in range(I):
+        define(2*(k + 1) if binary else r.numbers(1)[0], L + k)
+    for k in range(L):
+        fields = r.line().split()
+        if not binary:
+            if not fields or not fields[0].isdigit():
+                r.error('expected the literal of a latch')
+            lhs = int(fields.pop(0))
+        else:
+            lhs = 2*(I + k + 1)
+        define(lhs, k)
+        if not 1 <= len(fields) <= 2 or not all( f.isdigit() for f in fields ):
+            r.error('expected the next state literal and the reset value of a latch')
+        reset = int(fields[1]) if len(fields) == 2 else 0
+        if reset not in (0, 1, lhs):
+            r.error('the reset value of a latch must be 0, 1 or the latch itself')
+        aig.latches.append((literal(int(fields[0])), reset))
+    aig.outputs = [ literal(r.numbers(1)[0]) for _ in range(O) ]
+    aig.bad = [ literal(r.numbers(1)[0]) for _ in range(B) ]
+    aig.constraints = [ literal(r.numbers(1)[0]) for _ in range(C) ]
+    sizes = [ r.numbers(1)[0] for _ in range(J) ]
+    aig.justice = [ [ literal(r.numbers(1)[0]) for _ in range(n) ] for n in sizes ]
+    aig.fairness = [ literal(r.numbers(1)[0]) for _ in range(F) ]
+
+    left, right = aig.left, aig.right
+    if binary:
+        for k in range(A):
+            lhs = 2*(I + L + k + 1)
+            rhs0 = lhs - r.varint()
+            rhs1 = rhs0 - r.varint()
+            if rhs1 < 0:
+                r.error('the inputs of gate %d are out of range'%lhs)
+            left[lhs >> 1], right[lhs >> 1] = rhs0, rhs1
+    else:
+        for _ in range(A):
+            lhs, rhs0, rhs1 = r.numbers(3)
+            define(lhs)
+            left[lhs >> 1], right[lhs >> 1] = literal(rhs0), literal(rhs1)
+    return aig
+
+def _builder(aig, prefix, path):
+    # Returns the function giving the formula of a literal, with the state bits named `prefix + i`.
+    # The formulas of the variables are memoized in `nodes`, and built by an iterative depth first
+    # walk, in which `nodes[v]` is `False` while the inputs of gate `v` are being built.
+    nodes = [None] * (aig.max_var + 1)
+    nodes[0] = FormulaMonadic('LITERAL', 'fls')
+    for var, bit in enumerate(aig.bits):
+        if bit >= 0:
+            nodes[var] = FormulaMonadic('PROP', '%s%d'%(prefix, bit))
+    left, right = aig.left, aig.right
+    tru = FormulaMonadic('LITERAL', 'tru')
+
+    def node(lit):
+        if lit == 1:
+            return tru
+        f = nodes[lit >> 1]
+        return FormulaMonadic('NOT', f) if lit & 1 else f
+
+    def formula(lit):
+        stack = [lit >> 1]
+        while stack:
+            var = stack[-1]
+            if nodes[var] is not None and nodes[var] is not False:
+                stack.pop()
+                continue
+            if left[var] < 0:
+                raise SpecError(path, 0, 'variable %d is not an input, a latch or a gate'%var)
+            pending = [ l >> 1 for l in (left[var], right[var]) if nodes[l >> 1] is None ]
+            if pending:
+                nodes[var] = False
+                stack.extend(pending)
+                continue
+            if any( nodes[l >> 1] is False for l in (left[var], right[var]) ):
+                raise SpecError(path, 0, 'the and gates have a cycle through variable %d'%var)
+            nodes[var] = FormulaDyadic('AND', node(left[var]), node(right[var]))
+            stack.pop()
+        return node(lit)
+
+    return formula
+
+def _iff(a, b):
+    # The same shape that the parser produces for `(a = b)`
+    return FormulaDyadic('AND', FormulaDyadic('OR', FormulaMonadic('NOT', a), b),
+                                FormulaDyadic('OR', FormulaMonadic('NOT', b), a))
+
+def aig_spec(aig, path = '<aiger>'):
+    """
+    Returns the `Spec` of the model given by the `Aig` `aig`, see above
+    """
+    # The garbage collector is paused while the formulas are built, as in `spec_loader.py`
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _aig_spec(aig, path)
+    finally:
+        if enabled:
+            gc.enable()
+
+def _aig_spec(aig, path):
+    cur, nxt = _builder(aig, 'u', path), _builder(aig, 'v', path)
+    init, trans = Conjunction(), Conjunction()
+    for k, (next_lit, reset) in enumerate(aig.latches):
+        bit = FormulaMonadic('PROP', 'v%d'%k)
+        trans.add(_iff(bit, cur(next_lit)))
+        if reset < 2:
+            init.add(bit if reset else FormulaMonadic('NOT', bit))
+    for c in aig.constraints:
+        init.add(nxt(c))
+        trans.add(nxt(c))
+
+    props = []
+    bad = aig.bad if aig.bad or aig.justice else aig.outputs
+    for k, b in enumerate(bad):
+        props.append(('G (! b%d)'%k, FormulaMonadic('G', FormulaMonadic('NOT', nxt(b)))))
+    for k, lits in enumerate(aig.justice):
+        fair = Conjunction()
+        for l in lits + aig.fairness:
+            fair.add(FormulaMonadic('G', FormulaMonadic('F', nxt(l))))
+        props.append(('! (G (F j%d))'%k, FormulaMonadic('NOT', fair.result())))
+    return Spec(aig.n_latches + aig.n_inputs, init.result(), trans.result(), props)
+
+def load_aiger(path):
+    """
+    Loads the AIGER file at `path`, and returns its `Spec`
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return aig_spec(read_aiger(data, path), path)
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    argp = argparse.ArgumentParser(description = 'Reads an AIGER file')
+    argp.add_argument('aiger_file')
+    args = argp.parse_args()
+
+    with open(args.aiger_file, 'rb') as f:
+        aig = read_aiger(f.read(), args.aiger_file)
+    print('%d inputs, %d latches, %d and gates, %d bad states, %d constraints, %d justice, '
+          '%d fairness'%(aig.n_inputs, aig.n_latches, sum( l >= 0 for l in aig.left ), len(aig.bad),
+                         len(aig.constraints), len(aig.justice), len(aig.fairness)))
+    spec = aig_spec(aig, args.aiger_file)
+    print('%d bits, initial states of size %d, transition relation of size %d'%(spec.n_bits,
+                spec.init.size, spec.trans.size))
+    for prop_str, _ in spec.props:
+        print(prop_str)
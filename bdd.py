@@ -0,0 +1,480 @@
+"""
+A small BDD package, and forward reachability of Kripke models with it.
+
+The nodes of all the BDDs of a manager `BDD` are stored in three parallel arrays, giving for each
+node its level, and the nodes for its low (level false) and high (level true) branches. A node is
+referred to by its index in these arrays, nodes 0 and 1 being the constants false and true. A
+unique table maps each `(level, low, high)` triple to its node, so equal functions are the same node,
+and a node is never created with equal branches. Nodes are never freed, which is fine for the size
+of the models we check. The results of the operations are memoized in a direct mapped operation
+cache of fixed size, where a new entry evicts the old entry in its slot.
+
+The state variables of a model with `n_bits` bits are `ui`, the bits of the current state, and `vi`,
+the bits of the next state, as in the transition relations (see `parse_to_z3.py`). Their levels are
+given by a variable order (see `variable_order`), which always keeps `ui` and `vi` at adjacent
+levels, so that renaming between them preserves the order, and can be done by rebuilding nodes.
+
+Sets of states are BDDs over the `ui`. The image of a set `S` is computed as the relational product
+`exists u. S(u) and trans(u, v)`, renamed back to the `ui`, without building the conjunction, see
+`BDD.and_exists`.
+"""
+
+import sys
+from array import array
+from parser.formulas import *
+from utils import Trace
+
+# The default number of slots of the operation cache
+CACHE_SIZE = 1 << 18
+
+# The operations, as stored in the operation cache
+_AND, _OR, _NOT, _EXISTS, _AND_EXISTS, _RENAME = range(6)
+
+class BDD():
+    """
+    A manager for the BDDs over `n_levels` variables, referred to by their levels `0 ...
+    n_levels-1`, level 0 being the top one. `cache_size` is the number of slots of the operation
+    cache, a power of 2.
+    """
+    def __init__(self, n_levels, cache_size = CACHE_SIZE):
+        self.n_levels = n_levels
+        # The constants are at the level below all the variables
+        self.level = array('i', [n_levels, n_levels])
+        self.low = array('i', [0, 1])
+        self.high = array('i', [0, 1])
+        self.unique = {}
+        self.mask = cache_size - 1
+        self.cache_keys = [None] * cache_size
+        self.cache_vals = array('i', [0] * cache_size)
+        self.hits = self.misses = self.evictions = 0
+        # Registered sets of levels to quantify, see `quantifier`
+        self.quants = []
+        # The operations recurse once per level, and a few operations may be nested
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * n_levels + 1000))
+
+    def size(self):
+        """
+        The number of nodes in the manager, including the constants
+        """
+        return len(self.level)
+
+    def mk(self, level, low, high):
+        """
+        Returns the node at `level` with the branches `low` and `high`, creating it if needed
+        """
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.level)
+            self.level.append(level)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+        return node
+
+    def var(self, level):
+        """
+        The BDD of the variable at `level`
+        """
+        return self.mk(level, 0, 1)
+
+    def _lookup(self, key):
+        slot = hash(key) & self.mask
+        if self.cache_keys[slot] == key:
+            self.hits += 1
+            return self.cache_vals[slot]
+        self.misses += 1
+        return -1
+
+    def _store(self, key, value):
+        slot = hash(key) & self.mask
+        if self.cache_keys[slot] is not None:
+            self.evictions += 1
+        self.cache_keys[slot] = key
+        self.cache_vals[slot] = value
+        return value
+
+    def _cofactors(self, f, level):
+        if self.level[f] == level:
+            return self.low[f], self.high[f]
+        return f, f
+
+    def not_(self, f):
+        if f <= 1:
+            return 1 - f
+        key = (_NOT, f)
+        r = self._lookup(key)
+        if r >= 0:
+            return r
+        return self._store(key, self.mk(self.level[f], self.not_(self.low[f]),
+                                                        self.not_(self.high[f])))
+
+    def and_(self, f, g):
+        if f == 0 or g == 0:
+            return 0
+        if f == 1 or f == g:
+            return g
+        if g == 1:
+            return f
+        if f > g:
+            f, g = g, f
+        key = (_AND, f, g)
+        r = self._lookup(key)
+        if r >= 0:
+            return r
+        top = min(self.level[f], self.level[g])
+        f0, f1 = self._cofactors(f, top)
+        g0, g1 = self._cofactors(g, top)
+        return self._store(key, self.mk(top, self.and_(f0, g0), self.and_(f1, g1)))
+
+    def or_(self, f, g):
+        if f == 1 or g == 1:
+            return 1
+        if f == 0 or f == g:
+            return g
+        if g == 0:
+            return f
+        if f > g:
+            f, g = g, f
+        key = (_OR, f, g)
+        r = self._lookup(key)
+        if r >= 0:
+            return r
+        top = min(self.level[f], self.level[g])
+        f0, f1 = self._cofactors(f, top)
+        g0, g1 = self._cofactors(g, top)
+        return self._store(key, self.mk(top, self.or_(f0, g0), self.or_(f1, g1)))
+
+    def diff(self, f, g):
+        """
+        The BDD of `f and not g`
+        """
+        return self.and_(f, self.not_(g))
+
+    def quantifier(self, levels):
+        """
+        Registers the set of `levels` to be quantified by `exists` and `and_exists`, and returns
+        its index
+        """
+        mark = bytearray(self.n_levels + 1)
+        for l in levels:
+            mark[l] = 1
+        self.quants.append(mark)
+        return len(self.quants) - 1
+
+    def exists(self, f, q):
+        """
+        Existentially quantifies the levels of the quantifier `q` in `f`
+        """
+        if f <= 1:
+            return f
+        key = (_EXISTS, f, q)
+        r = self._lookup(key)
+        if r >= 0:
+            return r
+        lo, hi = self.exists(self.low[f], q), self.exists(self.high[f], q)
+        if self.quants[q][self.level[f]]:
+            r = self.or_(lo, hi)
+        else:
+            r = self.mk(self.level[f], lo, hi)
+        return self._store(key, r)
+
+    def and_exists(self, f, g, q):
+        """
+        The relational product `exists q. f and g`, computed without building the conjunction
+        """
+        if f == 0 or g == 0:
+            return 0
+        if f == 1 and g == 1:
+            return 1
+        if f == 1 or f == g:
+            return self.exists(g, q)
+        if g == 1:
+            return self.exists(f, q)
+        if f > g:
+            f, g = g, f
+        key = (_AND_EXISTS, f, g, q)
+        r = self._lookup(key)
+        if r >= 0:
+            return r
+        top = min(self.level[f], self.level[g])
+        f0, f1 = self._cofactors(f, top)
+        g0, g1 = self._cofactors(g, top)
+        lo = self.and_exists(f0, g0, q)
+        if self.quants[q][top]:
+            r = 1 if lo == 1 else self.or_(lo, self.and_exists(f1, g1, q))
+        else:
+            r = self.mk(top, lo, self.and_exists(f1, g1, q))
+        return self._store(key, r)
+
+    def rename(self, f, shift):
+        """
+        Moves every node of `f` `shift` levels down. The caller must make sure that this keeps the
+        levels in `f` distinct and in the same order.
+        """
+        if f <= 1:
+            return f
+        key = (_RENAME, f, shift)
+        r = self._lookup(key)
+        if r >= 0:
+            return r
+        return self._store(key, self.mk(self.level[f] + shift, self.rename(self.low[f], shift),
+                                                               self.rename(self.high[f], shift)))
+
+    def pick(self, f, levels):
+        """
+        Returns the values of the variables at `levels`, as a list of 0 and 1, in some assignment
+        satisfying `f`, which must not be false. The variables not in `f` are set to 0.
+        """
+        values = {}
+        while f > 1:
+            if self.low[f] != 0:
+                values[self.level[f]] = 0
+                f = self.low[f]
+            else:
+                values[self.level[f]] = 1
+                f = self.high[f]
+        return [ values.get(l, 0) for l in levels ]
+
+    def count(self, f):
+        """
+        The number of assignments to all the `n_levels` variables satisfying `f`
+        """
+        counts = {0: 0, 1: 1}
+        stack = [f]
+        while stack:
+            g = stack[-1]
+            if g in counts:
+                stack.pop()
+                continue
+            lo, hi = self.low[g], self.high[g]
+            if lo not in counts or hi not in counts:
+                stack.extend((lo, hi))
+                continue
+            counts[g] = sum( counts[c] << (self.level[c] - self.level[g] - 1) for c in (lo, hi) )
+            stack.pop()
+        return counts[f] << self.level[f]
+
+    def node_count(self, f):
+        """
+        The number of nodes in the BDD `f`, including the constants
+        """
+        seen = set()
+        stack = [f]
+        while stack:
+            g = stack.pop()
+            if g not in seen:
+                seen.add(g)
+                if g > 1:
+                    stack.extend((self.low[g], self.high[g]))
+        return len(seen)
+
+    def stats(self):
+        """
+        A dict with the counts of nodes and of operation cache hits, misses and evictions
+        """
+        return {'nodes': self.size(), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+def compile_ast_bdd(ast, mgr, get_var, kind):
+    """
+    Builds the BDD in the manager `mgr` for the propositional formula `ast`, where `get_var` maps the
+    name of a proposition to its BDD. Shared subformulas are translated only once, and the ast is
+    walked iteratively. `kind` names what the formula is for error messages.
+    """
+    done = {}
+    stack = [ast]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        if isinstance(node, FormulaMonadic):
+            if node.type == 'PROP':
+                done[node] = get_var(node.child)
+            elif node.type == 'LITERAL':
+                done[node] = 1 if node.child == 'tru' else 0
+            elif node.type == 'NOT':
+                if node.child not in done:
+                    stack.append(node.child)
+                    continue
+                done[node] = mgr.not_(done[node.child])
+            else:
+                raise ValueError('ERROR: %s uses disallowed unary token'%kind)
+        elif isinstance(node, FormulaDyadic):
+            if node.type not in ('OR', 'AND'):
+                raise ValueError('ERROR: %s uses disallowed binary connective'%kind)
+            if node.left not in done or node.right not in done:
+                stack.append(node.left)
+                stack.append(node.right)
+                continue
+            if node.type == 'OR':
+                done[node] = mgr.or_(done[node.left], done[node.right])
+            else:
+                done[node] = mgr.and_(done[node.left], done[node.right])
+        else:
+            raise ValueError("ERROR: Ast node is not monadic or dyadic")
+        stack.pop()
+    return done[ast]
+
+def variable_order(n_bits, trans_ast, heuristic = 'interleaved'):
+    """
+    Returns the list of the bits in the order their variables are placed, from the top level. Each
+    bit `i` takes two adjacent levels, `ui` above `vi`.
+
+    With `'interleaved'`, the bits are in their order `0 ... n_bits-1`. With `'dfs'`, they are in
+    the order they are first met in a depth first walk of the transition relation, which tends to
+    keep the bits that are used together close to each other.
+    """
+    if heuristic == 'interleaved':
+        return list(range(n_bits))
+    if heuristic != 'dfs':
+        raise ValueError('ERROR: Unknown variable order %s'%heuristic)
+    order, seen, placed = [], set(), set()
+    stack = [trans_ast]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Formula) or node in seen:
+            continue
+        seen.add(node)
+        if node.type == 'PROP':
+            i = int(node.child[1:])
+            if i not in placed:
+                placed.add(i)
+                order.append(i)
+        elif isinstance(node, FormulaMonadic):
+            stack.append(node.child)
+        else:
+            stack.extend((node.right, node.left))
+    return order + [ i for i in range(n_bits) if i not in placed ]
+
+class SymbolicModel():
+    """
+    The Kripke model with `n_bits` bits, the initial states `init_ast` and the transition relation
+    `trans_ast` as BDDs, with the variables placed in the order given by `order` (see
+    `variable_order`), and the operation cache having `cache_size` slots.
+
+    `rings[k]` is the set of states first reached after `k` steps, as computed by `reach`.
+    """
+    def __init__(self, n_bits, init_ast, trans_ast, order = 'interleaved', cache_size = CACHE_SIZE):
+        self.n_bits = n_bits
+        self.mgr = mgr = BDD(2 * n_bits, cache_size)
+        self.order = variable_order(n_bits, trans_ast, order)
+        self.u_level = [0] * n_bits
+        for k, i in enumerate(self.order):
+            self.u_level[i] = 2 * k
+        self.u_vars = [ mgr.var(self.u_level[i]) for i in range(n_bits) ]
+        self.v_vars = [ mgr.var(self.u_level[i] + 1) for i in range(n_bits) ]
+        self.q_u = mgr.quantifier(self.u_level)
+        self.q_v = mgr.quantifier([ l + 1 for l in self.u_level ])
+
+        def get_var(name):
+            if int(name[1:]) >= n_bits:
+                raise ValueError('ERROR: Index of variable must not be more than n_bits')
+            if name[0] == 'u':
+                return self.u_vars[int(name[1:])]
+            elif name[0] == 'v':
+                return self.v_vars[int(name[1:])]
+            else:
+                raise ValueError('ERROR: Variable must be `ui` or `vi`')
+
+        self.trans = compile_ast_bdd(trans_ast, mgr, get_var, 'Transition')
+        self.init = self.pred(init_ast)
+        self.rings = None
+
+    def pred(self, ast):
+        """
+        The BDD over the `ui` of the predicate `ast` over the `vi`
+        """
+        def get_var(name):
+            if name[0] != 'v' or int(name[1:]) >= self.n_bits:
+                raise ValueError('ERROR: Variable in predicate must be of form vi, i < n_bits')
+            return self.u_vars[int(name[1:])]
+        return compile_ast_bdd(ast, self.mgr, get_var, 'Predicate')
+
+    def image(self, states):
+        """
+        The set of the successors of the set of states `states`
+        """
+        return self.mgr.rename(self.mgr.and_exists(states, self.trans, self.q_u), -1)
+
+    def preimage(self, states):
+        """
+        The set of the predecessors of the set of states `states`
+        """
+        return self.mgr.and_exists(self.mgr.rename(states, 1), self.trans, self.q_v)
+
+    def reach(self, verbose = False):
+        """
+        Computes the rings of the states reachable from the initial states by breadth first search,
+        upto the fixed point, and returns the set of reachable states. If `verbose`, prints the
+        size of each ring.
+        """
+        if self.rings is not None:
+            return self.reached
+        mgr = self.mgr
+        self.rings = [self.init]
+        self.reached = frontier = self.init
+        while frontier != 0:
+            if verbose:
+                print('Depth %d: %d new states, %d nodes          '%(len(self.rings) - 1,
+                            self.n_states(frontier), mgr.node_count(frontier)), end = '\r')
+            frontier = mgr.diff(self.image(frontier), self.reached)
+            self.reached = mgr.or_(self.reached, frontier)
+            self.rings.append(frontier)
+        self.rings.pop()
+        return self.reached
+
+    def n_states(self, states):
+        """
+        The number of states in the set `states`
+        """
+        return self.mgr.count(states) >> self.n_bits
+
+    def state(self, states):
+        """
+        Some state in the non empty set `states`, as a tuple of its bits
+        """
+        return tuple(self.mgr.pick(states, self.u_level))
+
+    def cube(self, state):
+        """
+        The set containing only the state given as a tuple of its bits
+        """
+        f = 1
+        for i in sorted(range(self.n_bits), key = lambda i: -self.u_level[i]):
+            f = self.mgr.mk(self.u_level[i], f, 0) if state[i] == 0 else \
+                self.mgr.mk(self.u_level[i], 0, f)
+        return f
+
+    def check_Gp(self, p_ast):
+        """
+        Checks the invariant `Gp` on the reachable states. Returns the shortest counterexample, as a
+        `Trace`, or None if the invariant holds.
+        """
+        mgr = self.mgr
+        self.reach()
+        bad = mgr.not_(self.pred(p_ast))
+        k = next(( k for k, ring in enumerate(self.rings) if mgr.and_(ring, bad) != 0 ), None)
+        if k is None:
+            return None
+        # Walk back from a bad state in the ring k through the earlier rings
+        states = [self.state(mgr.and_(self.rings[k], bad))]
+        for j in range(k - 1, -1, -1):
+            pre = mgr.and_(self.rings[j], self.preimage(self.cube(states[-1])))
+            states.append(self.state(pre))
+        return Trace(states[::-1], -1)
+
+# The models built so far, by the asts and the options they were built from
+_models = {}
+
+def get_model(n_bits, init_ast, trans_ast, order = 'interleaved', cache_size = CACHE_SIZE):
+    """
+    Returns the `SymbolicModel` for the given model, building it only the first time
+    """
+    key = (n_bits, init_ast, trans_ast, order, cache_size)
+    if key not in _models:
+        _models[key] = SymbolicModel(n_bits, init_ast, trans_ast, order, cache_size)
+    return _models[key]
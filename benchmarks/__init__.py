@@ -0,0 +1,6 @@
+"""
+Benchmarks for the model checking engines. Each benchmark is a script run from the root of the
+repository as a module, for instance
+
+    python -m benchmarks.bench_compile
+"""
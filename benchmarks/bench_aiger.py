@@ -0,0 +1,153 @@
+"""
+Measures reading generated AIGER circuits (see `aiger.py`), in both the ASCII and the binary format,
+building their formulas, compiling the transition relation to z3, and checking their bad state
+properties with a few steps of BMC. The circuits have `n_gates` and gates, each taking its inputs
+from the recent variables, so that they are deep and share a lot. Before that, the models read from
+a small circuit are checked against a simulation of the circuit on random inputs.
+
+Usage:
+    python -m benchmarks.bench_aiger [n_gates] [seed]
+"""
+
+import os
+import io
+import sys
+import time
+import random
+import tempfile
+import contextlib
+import z3
+from aiger import read_aiger, aig_spec
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from benchmarks.models import dag_size
+from Invariant_Liveness import Invariant_Check_Gp
+
+def random_circuit(n_inputs, n_latches, n_gates, n_bad, rng, window = 256):
+    """
+    Returns the inputs, latches, bad states and and gates `(lhs, rhs0, rhs1)` of a random circuit,
+    numbered as in the binary format
+    """
+    first = n_inputs + n_latches + 1
+    gates = []
+    for var in range(first, first + n_gates):
+        rhs = [ 2*rng.randrange(max(1, var - window), var) + rng.randrange(2) for _ in range(2) ]
+        gates.append((2*var, max(rhs), min(rhs)))
+    last = [ g[0] + rng.randrange(2) for g in gates[-max(n_latches, n_bad):] ]
+    latches = []
+    for k in range(n_latches):
+        lhs = 2*(n_inputs + k + 1)
+        latches.append((lhs, rng.choice(last), rng.choice((0, 0, 1, lhs))))
+    bad = [ rng.choice(last) for _ in range(n_bad) ]
+    return n_inputs, latches, bad, gates
+
+def _varint(x):
+    out = bytearray()
+    while x >= 0x80:
+        out.append(x & 0x7f | 0x80)
+        x >>= 7
+    out.append(x)
+    return out
+
+def write_aiger(circuit, binary):
+    """
+    Returns the bytes of the circuit in the binary or the ASCII format
+    """
+    n_inputs, latches, bad, gates = circuit
+    M = n_inputs + len(latches) + len(gates)
+    lines = [ '%s %d %d %d 0 %d %d'%('aig' if binary else 'aag', M, n_inputs, len(latches),
+                                      len(gates), len(bad)) ]
+    if not binary:
+        lines += [ str(2*(k + 1)) for k in range(n_inputs) ]
+    lines += [ ('%d %d' if binary else '%d %d %d')%(l[1:] if binary else l) for l in latches ]
+    lines += [ str(b) for b in bad ]
+    if not binary:
+        lines += [ '%d %d %d'%g for g in gates ]
+    data = bytearray(('\n'.join(lines) + '\n').encode())
+    if binary:
+        for lhs, rhs0, rhs1 in gates:
+            data += _varint(lhs - rhs0) + _varint(rhs0 - rhs1)
+    return bytes(data)
+
+def simulate(circuit, rng, steps):
+    """
+    Yields the pairs of the state bits (latches then inputs) and the values of the bad states of a
+    random run of the circuit
+    """
+    n_inputs, latches, bad, gates = circuit
+    val = [False] * (n_inputs + len(latches) + len(gates) + 1)
+    lit = lambda l: val[l >> 1] ^ bool(l & 1)
+    for k, (lhs, _, reset) in enumerate(latches):
+        val[lhs >> 1] = bool(reset) if reset < 2 else rng.random() < 0.5
+    for _ in range(steps):
+        for k in range(n_inputs):
+            val[k + 1] = rng.random() < 0.5
+        for lhs, rhs0, rhs1 in gates:
+            val[lhs >> 1] = lit(rhs0) and lit(rhs1)
+        yield [ val[l[0] >> 1] for l in latches ] + val[1:n_inputs+1], [ lit(b) for b in bad ]
+        nxt = [ lit(l[1]) for l in latches ]
+        for (lhs, _, _), v in zip(latches, nxt):
+            val[lhs >> 1] = v
+
+def holds(template, *states):
+    return z3.is_true(z3.simplify(template(*[ [ z3.BoolVal(b) for b in s ] for s in states ])))
+
+def check_small(rng, steps = 100):
+    """
+    Checks the models read from a small random circuit against its simulation
+    """
+    circuit = random_circuit(4, 12, 300, 3, rng, window = 32)
+    specs = [ aig_spec(read_aiger(write_aiger(circuit, binary))) for binary in (False, True) ]
+    assert specs[0] == specs[1], 'The ASCII and binary formats give different models'
+    n_bits, init, trans, props = specs[0]
+    init, trans = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+    safe = [ parse_pred_z3_gen(p.child, n_bits) for _, p in props ]
+    prev = None
+    for i, (state, bad) in enumerate(simulate(circuit, rng, steps)):
+        assert holds(init, state) if i == 0 else holds(trans, prev, state), 'Wrong transition'
+        if prev is not None:
+            # Flipping a latch in the next state is not a transition
+            wrong = list(state)
+            wrong[rng.randrange(len(circuit[1]))] ^= True
+            assert not holds(trans, prev, wrong), 'Latch not determined by the transition'
+        assert [ not holds(s, state) for s in safe ] == bad, 'Wrong bad states'
+        prev = state
+    print('Checked the model of a %d gate circuit on a run of %d steps'%(len(circuit[3]), steps))
+
+def timed(f):
+    t = time.perf_counter()
+    res = f()
+    return res, time.perf_counter() - t
+
+def main(n_gates = 100000, seed = 0, depth = 3):
+    rng = random.Random(seed)
+    check_small(rng)
+
+    circuit = random_circuit(64, 512, n_gates, 4, rng)
+    print('Circuit with %d inputs, %d latches and %d and gates:'%(64, 512, n_gates))
+    with tempfile.TemporaryDirectory() as dir:
+        for binary in (False, True):
+            # The formulas of one format are freed before reading the other, as they would be shared
+            spec = None
+            path = os.path.join(dir, 'circuit.aig' if binary else 'circuit.aag')
+            with open(path, 'wb') as f:
+                f.write(write_aiger(circuit, binary))
+            with open(path, 'rb') as f:
+                aig, t_read = timed(lambda: read_aiger(f.read(), path))
+            spec, t_build = timed(lambda: aig_spec(aig, path))
+            print('  %-6s %6.2f MB   read %6.3f s   build %6.3f s'%('aig' if binary else 'aag',
+                            os.path.getsize(path) / 2**20, t_read, t_build))
+    n_bits, init, trans, props = spec
+    print('  Transition relation of %d distinct nodes'%dag_size(trans))
+
+    init, trans = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+    _, t = timed(lambda: trans.expr)
+    print('  Compiled to z3 in %.3f s'%t)
+    for prop_str, prop_ast in props:
+        p = parse_pred_z3_gen(prop_ast.child, n_bits)
+        with contextlib.redirect_stdout(io.StringIO()):
+            trace, t = timed(lambda: Invariant_Check_Gp(n_bits, depth, init, trans, p))
+        found = 'no counterexample' if trace is None else 'counterexample of length %d'%len(trace)
+        print('  %s: BMC to depth %d in %.3f s, %s'%(prop_str, depth, t, found))
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
@@ -0,0 +1,58 @@
+"""
+Checks that the BDD based reachability of `bdd.py` gives the same verdicts and counterexample
+lengths for random invariants on random models as the explicit state engine of `explicit.py`. Then
+times proving an invariant of a counter that resets halfway (see `models.resetting_counter`) with
+BDDs, for both variable orders, and with k-induction, which needs a depth exponential in the number
+of bits for it. Exits with status 1 if there are differences.
+
+Usage:
+    python -m benchmarks.bench_bdd [max_bits] [n_models] [seed]
+"""
+
+import io
+import sys
+import time
+import random
+import contextlib
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from benchmarks.models import random_model, random_pred, resetting_counter
+from explicit import ExplicitModel
+from bdd import SymbolicModel
+from K_induction import K_induction
+
+def main(max_bits = 7, n_models = 40, seed = 0):
+    rng = random.Random(seed)
+    bad, checks = 0, 0
+    for _ in range(n_models):
+        n_bits, init, trans = random_model(rng.randint(1, 4), rng)
+        explicit = ExplicitModel(n_bits, init, trans)
+        symbolic = SymbolicModel(n_bits, init, trans, rng.choice(['interleaved', 'dfs']))
+        for _ in range(5):
+            p = random_pred(n_bits, 3, rng)
+            exp_res, bdd_res = explicit.check_Gp(p), symbolic.check_Gp(p)
+            checks += 1
+            if (exp_res is None) != (bdd_res is None) or (exp_res is not None and
+                                                len(exp_res.states) != len(bdd_res.states)):
+                bad += 1
+                print('Difference on G %s: explicit %s, BDD %s'%(p, exp_res, bdd_res))
+    print('%d differences in %d checks'%(bad, checks))
+
+    for n_bits in range(3, max_bits + 1):
+        _, init, trans, prop = resetting_counter(n_bits)
+        times = []
+        for order in ['interleaved', 'dfs']:
+            t = time.perf_counter()
+            model = SymbolicModel(n_bits, init, trans, order)
+            proved = model.check_Gp(prop.child) is None
+            times.append('%s %.3f s, %d nodes'%(order, time.perf_counter() - t, model.mgr.size()))
+        t = time.perf_counter()
+        stats = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            K_induction(n_bits, parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits),
+                        parse_pred_z3_gen(prop.child, n_bits), stats)
+        print('  %2d bits  proved %-5s  BDD %s  k-induction depth %d %.3f s'%(n_bits, proved,
+                    ', '.join(times), stats['depth'], time.perf_counter() - t))
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
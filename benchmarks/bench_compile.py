@@ -0,0 +1,41 @@
+"""
+Measures the cost of instantiating a compiled transition relation for one step of an unrolling,
+against walking the ast again for each step, as was done before the relations were compiled.
+
+Usage:
+    python -m benchmarks.bench_compile [n_gates] [n_bits] [steps]
+"""
+
+import sys
+import time
+import z3
+from parse_to_z3 import parse_trans_z3_gen, compile_ast_z3
+from benchmarks.models import random_functional_trans, dag_size
+
+def main(n_gates = 100000, n_bits = 200, steps = 20):
+    ast = random_functional_trans(n_bits, n_gates)
+    print('Transition relation with %d bits and %d ast nodes'%(n_bits, dag_size(ast)))
+
+    t = time.perf_counter()
+    trans = parse_trans_z3_gen(ast, n_bits)
+    print('Compile once:                 %8.3f s'%(time.perf_counter() - t))
+
+    st = [[ z3.Bool('s_%d_%d'%(k, i)) for i in range(n_bits) ] for k in range(steps+1)]
+
+    t = time.perf_counter()
+    for k in range(steps):
+        trans(st[k], st[k+1])
+    subst = (time.perf_counter() - t) / steps
+    print('Instantiate by substitution:  %8.3f ms/step'%(1000*subst))
+
+    t = time.perf_counter()
+    for k in range(steps):
+        cur, nxt = st[k], st[k+1]
+        compile_ast_z3(ast, lambda name: (cur if name[0] == 'u' else nxt)[int(name[1:])],
+                        'Transition')
+    walk = (time.perf_counter() - t) / steps
+    print('Walk ast per step:            %8.3f ms/step'%(1000*walk))
+    print('Speedup:                      %8.1fx'%(walk / subst))
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
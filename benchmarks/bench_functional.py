@@ -0,0 +1,53 @@
+"""
+Compares the two ways of unrolling the transition relation in the BMC loops, substituting the
+definitions of the functional bits against fresh variables for all the bits constrained by the whole
+relation (see `unroll.py`), by the cumulative time spent in sat calls by each engine. The models are
+a binary counter, whose top bit is first set at the bound `2^(n_bits-1)`, and a random deterministic
+circuit, through which the engines go upto the threshold.
+
+Usage:
+    python -m benchmarks.bench_functional [n_bits] [threshold]
+"""
+
+import sys
+import unroll
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from benchmarks.models import counter, random_functional_trans, prop, neg, conj
+from benchmarks.bench_incremental import timed
+from Invariant_Liveness import Invariant_Check_Gp, Invariant_Check_Fp
+from K_induction import K_induction
+from reocc_diam import get_reocc_diam
+
+def run(name, n_bits, init, trans, threshold):
+    init, trans = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+    top = prop('v%d'%(n_bits-1))
+    p, not_p = parse_pred_z3_gen(top, n_bits), parse_pred_z3_gen(neg(top), n_bits)
+
+    engines = [
+        ('Invariant_Check_Gp', lambda: Invariant_Check_Gp(n_bits, threshold, init, trans, not_p)),
+        ('Invariant_Check_Fp', lambda: Invariant_Check_Fp(n_bits, threshold, init, trans, p)),
+        ('K_induction', lambda: K_induction(n_bits, init, trans, not_p)),
+        ('get_reocc_diam', lambda: get_reocc_diam(n_bits, init, trans)),
+    ]
+
+    print('%s, threshold %d, cumulative sat call time (total time):'%(name, threshold))
+    print('  %-20s %6s %20s %20s'%('', 'calls', 'functional', 'relational'))
+    for engine, f in engines:
+        res = {}
+        for mode in ['functional', 'relational']:
+            unroll.mode = mode
+            res[mode] = timed(f)
+        print('  %-20s %6d %9.3f s (%6.3f) %9.3f s (%6.3f)'%(engine, res['relational'][0],
+                    res['functional'][1], res['functional'][2],
+                    res['relational'][1], res['relational'][2]))
+    unroll.mode = 'functional'
+
+def main(n_bits = 7, threshold = 40):
+    run('%d bit counter'%n_bits, *counter(n_bits), threshold)
+    zero = conj([ neg(prop('v%d'%i)) for i in range(n_bits) ])
+    run('%d bit random circuit'%n_bits, n_bits, zero, random_functional_trans(n_bits, 40 * n_bits),
+        threshold)
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
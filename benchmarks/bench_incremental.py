@@ -0,0 +1,67 @@
+"""
+Compares the two ways of retiring temporary constraints in the BMC loops, activation literals passed
+as assumptions against the push/pop scopes of z3 (see `incremental.py`), by the cumulative time
+spent in sat calls by each engine. The model is a binary counter, and the properties are about its
+top bit, so that the engines go through many bounds without finding a counterexample (k-induction
+finds one at the bound `2^(n_bits-1)`).
+
+Usage:
+    python -m benchmarks.bench_incremental [n_bits] [threshold]
+"""
+
+import sys
+import io
+import time
+import contextlib
+import incremental
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from utils import ast_to_nnf
+from benchmarks.models import counter, prop, neg
+from Invariant_Liveness import Invariant_Check_Gp, Invariant_Check_Fp
+from K_induction import K_induction
+from BMC_LTL import BMC_LTL
+
+def timed(f):
+    """
+    Runs `f` with its output discarded, and returns the number of sat calls made, the time spent in
+    them and the total time taken.
+    """
+    incremental.totals['checks'] = 0
+    incremental.totals['check_time'] = 0.0
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        f()
+    t = time.perf_counter() - t
+    return incremental.totals['checks'], incremental.totals['check_time'], t
+
+def main(n_bits = 7, threshold = 40):
+    n_bits, init, trans = counter(n_bits)
+    init, trans = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+    top = prop('v%d'%(n_bits-1))
+    p, not_p = parse_pred_z3_gen(top, n_bits), parse_pred_z3_gen(neg(top), n_bits)
+    ast = ast_to_nnf(FormulaMonadic('NOT', FormulaMonadic('F', top)))
+
+    engines = [
+        ('Invariant_Check_Gp', lambda: Invariant_Check_Gp(n_bits, threshold, init, trans, not_p)),
+        ('Invariant_Check_Fp', lambda: Invariant_Check_Fp(n_bits, threshold, init, trans, p)),
+        ('K_induction', lambda: K_induction(n_bits, init, trans, not_p)),
+        ('BMC_LTL classic', lambda: BMC_LTL(n_bits, threshold, init, trans, ast)),
+        ('BMC_LTL selector', lambda: BMC_LTL(n_bits, threshold, init, trans, ast, 'selector')),
+        ('BMC_LTL linear', lambda: BMC_LTL(n_bits, threshold, init, trans, ast, encoder = 'linear')),
+    ]
+
+    print('%d bit counter, threshold %d, cumulative sat call time (total time):'%(n_bits, threshold))
+    print('  %-20s %6s %20s %20s'%('', 'calls', 'assumptions', 'scopes'))
+    for name, f in engines:
+        res = {}
+        for mode in ['assumptions', 'scopes']:
+            incremental.mode = mode
+            res[mode] = timed(f)
+        print('  %-20s %6d %9.3f s (%6.3f) %9.3f s (%6.3f)'%(name, res['scopes'][0],
+                    res['assumptions'][1], res['assumptions'][2],
+                    res['scopes'][1], res['scopes'][2]))
+    incremental.mode = 'assumptions'
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
@@ -0,0 +1,43 @@
+"""
+Compares the two ways of searching for lasso shaped counterexamples, one sat call per loop position
+against one sat call per bound with loop selector variables, on a binary counter whose properties
+have no counterexamples within the bound, so that all loop positions are tried.
+
+Usage:
+    python -m benchmarks.bench_loop_select [n_bits] [threshold]
+"""
+
+import sys
+import io
+import time
+import contextlib
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from utils import ast_to_nnf
+from benchmarks.models import counter, prop
+from Invariant_Liveness import Invariant_Check_Fp
+from BMC_LTL import BMC_LTL
+
+def timed(f):
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        f()
+    return time.perf_counter() - t
+
+def main(n_bits = 8, threshold = 40):
+    n_bits, init, trans = counter(n_bits)
+    init, trans = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+    top = prop('v%d'%(n_bits-1))
+    p = parse_pred_z3_gen(top, n_bits)
+    ast = ast_to_nnf(FormulaMonadic('NOT', FormulaMonadic('F', top)))
+
+    print('%d bit counter, F v%d, threshold %d:'%(n_bits, n_bits-1, threshold))
+    for loops in ['position', 'selector']:
+        t = timed(lambda: Invariant_Check_Fp(n_bits, threshold, init, trans, p, loops))
+        print('  Invariant_Check_Fp, %-8s %8.3f s'%(loops, t))
+    for loops in ['position', 'selector']:
+        t = timed(lambda: BMC_LTL(n_bits, threshold, init, trans, ast, loops))
+        print('  BMC_LTL, %-8s           %8.3f s'%(loops, t))
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
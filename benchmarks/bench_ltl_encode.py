@@ -0,0 +1,52 @@
+"""
+Measures the encodings of `ltl_encode.py` of a few properties, for all the lengths and loop
+positions upto a bound, as done by `BMC_LTL`, and the non looping encoding for a single long path,
+which the recursive encoders could not build within the recursion limit of python.
+
+Usage:
+    python -m benchmarks.bench_ltl_encode [k] [long_k]
+"""
+
+import sys
+import time
+from ltl_encode import nonLooping, ltl_looping_encode
+from parser.fast_parser import parser
+from parser.formulas import *
+from utils import ast_to_nnf
+
+PROPERTIES = [
+    'G (F v0)',
+    'G (v0 + (X (v1 + (X v2))))',
+    '(v0 U (v1 R v2))',
+    'F (G ((! v0) U v1))',
+]
+
+class CountingSolver():
+    # Stands in for the solver, so that only the encoding is measured
+    def __init__(self):
+        self.n = 0
+
+    def add(self, *args):
+        self.n += sum( len(a) if isinstance(a, list) else 1 for a in args )
+
+def main(k = 40, long_k = 3000):
+    print('Encodings upto the bound %d:'%k)
+    for prop in PROPERTIES:
+        ast = ast_to_nnf(FormulaMonadic('NOT', parser.parse(prop)))
+        s, mem = CountingSolver(), set()
+        t = time.perf_counter()
+        for j in range(k):
+            nonLooping(ast, 0, j, s, mem)
+            for l in range(j):
+                ltl_looping_encode(0, l, j, ast, s, mem)
+        print('  %-28s %8d constraints in %7.3f s'%(prop, s.n, time.perf_counter() - t))
+
+    ast = ast_to_nnf(FormulaMonadic('NOT', parser.parse(PROPERTIES[0])))
+    s = CountingSolver()
+    t = time.perf_counter()
+    nonLooping(ast, 0, long_k, s, set())
+    print('Non looping encoding of %s for the bound %d: %d constraints in %.3f s'%(PROPERTIES[0],
+                long_k, s.n, time.perf_counter() - t))
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
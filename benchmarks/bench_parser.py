@@ -0,0 +1,83 @@
+"""
+Compares the throughput of the hand written parser of `parser/fast_parser.py` with that of the PLY
+parser of `parser/ply_parser.py`, on machine generated transition relations of about `size_mb`
+megabytes. The relations are conjunctions of random definitions `(vi = ((uj . (! uk)) + (ul ^ um)))`,
+fully parenthesized, either nested to the left or balanced, and also written with the parentheses
+left out where the precedence of the operators allows, which only the hand written parser accepts.
+The left nested and the minimally parenthesized relations are the same formula.
+
+Usage:
+    python -m benchmarks.bench_parser [size_mb] [seed]
+"""
+
+import sys
+import time
+import random
+import gc
+from cache import ast_hash
+from parser.ply_parser import parser as ply_parser
+from parser.fast_parser import parser as fast_parser
+
+def definitions(size, rng, n_bits = 4096):
+    """
+    Returns the pairs of the fully parenthesized, and the minimally parenthesized, strings of random
+    definitions of next state bits, of about `size` characters in total
+    """
+    defs, total = [], 0
+    while total < size:
+        i, j, k, l, m = [ rng.randrange(n_bits) for _ in range(5) ]
+        full = '(v%d = ((u%d . (! u%d)) + (u%d ^ u%d)))'%(i, j, k, l, m)
+        defs.append((full, '(v%d = u%d . !u%d + (u%d ^ u%d))'%(i, j, k, l, m)))
+        total += len(full) + 5
+    return defs
+
+def left_nested(fs):
+    return '(' * (len(fs) - 1) + fs[0] + ''.join([ ' . %s)'%f for f in fs[1:] ])
+
+def balanced(fs):
+    while len(fs) > 1:
+        fs = [ '(%s . %s)'%(fs[i], fs[i+1]) if i+1 < len(fs) else fs[i]
+                                                    for i in range(0, len(fs), 2) ]
+    return fs[0]
+
+def timed(parser, text):
+    """
+    Parses `text` with `parser`, returns the time taken and the hash of the formula, see
+    `cache.ast_hash`. The formula is then freed, as its nodes would be shared with (and speed up)
+    the formula built by the next parser run.
+    """
+    t = time.perf_counter()
+    ast = parser.parse(text)
+    t = time.perf_counter() - t
+    h = ast_hash(ast)
+    del ast
+    gc.collect()
+    return h, t
+
+def main(size_mb = 10, seed = 0):
+    defs = definitions(int(size_mb * 2**20), random.Random(seed))
+    full = [ d[0] for d in defs ]
+    shapes = [ ('left nested', left_nested(full), True),
+               ('balanced', balanced(full), True),
+               ('precedence', ' . '.join([ d[1] for d in defs ]), False) ]
+
+    print('%d definitions, time (throughput):'%len(defs))
+    print('  %-12s %8s %22s %22s'%('', 'MB', 'fast_parser', 'ply_parser'))
+    expected = {}
+    for name, text, ply_too in shapes:
+        mb = len(text) / 2**20
+        fast, t_fast = timed(fast_parser, text)
+        line = '  %-12s %8.2f %9.2f s (%5.2f MB/s)'%(name, mb, t_fast, mb / t_fast)
+        if ply_too:
+            ply, t_ply = timed(ply_parser, text)
+            assert ply == fast, 'The parsers disagree on the %s relation'%name
+            line += ' %9.2f s (%5.2f MB/s)'%(t_ply, mb / t_ply)
+        else:
+            line += ' %22s'%'not accepted'
+        print(line)
+        # The left nested and minimally parenthesized relations are the same formula
+        expected.setdefault(name == 'balanced', fast)
+        assert expected[name == 'balanced'] == fast, 'The %s relation gives another formula'%name
+
+if __name__ == "__main__":
+    main(*[ float(a) if i == 0 else int(a) for i, a in enumerate(sys.argv[1:]) ])
@@ -0,0 +1,85 @@
+"""
+Checks that IC3 (see `PDR.py`) gives the same verdicts for random invariants on random models as the
+explicit state engine of `explicit.py`, that its counterexamples are paths of the model, and that the
+invariants it finds pass `check_invariant`. Then times proving an invariant of a counter that resets
+halfway, and of a counter with a guard (see `models.py`), with IC3 and with k-induction, which
+needs a depth exponential in the number of bits for both. The invariant of the guarded counter is
+small, while IC3 has to learn the reachable states of the resetting counter nearly one by one. Exits with status 1 if there are differences.
+
+Usage:
+    python -m benchmarks.bench_pdr [max_bits] [n_models] [seed]
+"""
+
+import io
+import sys
+import time
+import random
+import contextlib
+import numpy as np
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from benchmarks.models import random_model, random_pred, resetting_counter, guarded_counter
+from explicit import ExplicitModel, eval_pred
+from PDR import PDR, invariant_to_str, check_invariant
+from K_induction import K_induction
+
+def quiet(f, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return f(*args)
+
+def is_path(model, trace):
+    # Whether the states of the trace are a path of the `ExplicitModel` from an initial state
+    idx = [ int(model.states.searchsorted(sum( b << i for i, b in enumerate(s) )))
+                                                                        for s in trace.states ]
+    if any( i >= len(model.states) or model.bits(i) != s for i, s in zip(idx, trace.states) ):
+        return False
+    return bool(model.init[idx[0]]) and all( j in model.successors(i).tolist()
+                                                            for i, j in zip(idx, idx[1:]) )
+
+def p_holds(p, trace):
+    # Whether p holds at the last state of the trace
+    last = sum( b << i for i, b in enumerate(trace.states[-1]) )
+    return bool(eval_pred(p, np.array([last], dtype = np.uint64), len(trace.states[-1]))[0])
+
+def main(max_bits = 8, n_models = 40, seed = 0):
+    rng = random.Random(seed)
+    bad, checks = 0, 0
+    for _ in range(n_models):
+        n_bits, init, trans = random_model(rng.randint(1, 4), rng)
+        model = ExplicitModel(n_bits, init, trans)
+        init_z3, trans_z3 = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+        for _ in range(5):
+            p = random_pred(n_bits, 3, rng)
+            p_z3 = parse_pred_z3_gen(p, n_bits)
+            pdr = PDR(n_bits, init_z3, trans_z3, p_z3)
+            res, exp_res = quiet(pdr.run), model.check_Gp(p)
+            checks += 1
+            if res is None:
+                ok = exp_res is None and not check_invariant(n_bits, init_z3, trans_z3, p_z3,
+                                                             invariant_to_str(pdr.invariant))
+            else:
+                ok = exp_res is not None and is_path(model, res) and not p_holds(p, res)
+            if not ok:
+                bad += 1
+                print('Difference on G %s: IC3 %s, explicit %s'%(p, res, exp_res))
+    print('%d differences in %d checks'%(bad, checks))
+
+    for name, family in [('guarded counter', guarded_counter),
+                         ('resetting counter', resetting_counter)]:
+        for n_bits in range(4, max_bits + 1, 2):
+            nb, init, trans, prop = family(n_bits)
+            init, trans = parse_pred_z3_gen(init, nb), parse_trans_z3_gen(trans, nb)
+            p = parse_pred_z3_gen(prop.child, nb)
+            t = time.perf_counter()
+            stats = {}
+            pdr = PDR(nb, init, trans, p)
+            proved = quiet(pdr.run, stats) is None
+            t_pdr, frames = time.perf_counter() - t, stats['depth']
+            t = time.perf_counter()
+            quiet(K_induction, nb, init, trans, p, stats)
+            print('  %-18s %2d bits  proved %-5s  IC3 %3d frames %4d clauses %8.3f s  '
+                  'k-induction depth %4d %8.3f s'%(name, nb, proved, frames, len(pdr.invariant),
+                                                   t_pdr, stats['depth'], time.perf_counter() - t))
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
@@ -0,0 +1,44 @@
+"""
+Compares computing the reoccurrence diameter with all the distinctness constraints added upfront
+against adding them lazily, see `get_reocc_diam`. Checks that both give the same diameter on random
+models, and times both on a binary counter, whose reoccurrence diameter is `2^n_bits`, and on a
+random functional transition relation.
+
+Usage:
+    python -m benchmarks.bench_reocc [n_bits] [n_random]
+"""
+
+import sys
+import time
+import random
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from benchmarks.models import counter, random_model, random_functional_trans, cube
+from reocc_diam import get_reocc_diam
+
+def timed(n_bits, init, trans, lazy):
+    t = time.perf_counter()
+    rd = get_reocc_diam(n_bits, init, trans, lazy)
+    return rd, time.perf_counter() - t
+
+def main(n_bits = 7, n_random = 50):
+    rng = random.Random(0)
+    bad = 0
+    for _ in range(n_random):
+        nb, init, trans = random_model(rng.randint(1, 4), rng)
+        init, trans = parse_pred_z3_gen(init, nb), parse_trans_z3_gen(trans, nb)
+        if get_reocc_diam(nb, init, trans, False) != get_reocc_diam(nb, init, trans, True):
+            bad += 1
+    print('%d of %d random models with different diameters'%(bad, n_random))
+
+    circuit = (2*n_bits, cube([0]*(2*n_bits), 'v'), random_functional_trans(2*n_bits, 40*n_bits))
+    models = [ ('%d bit counter'%n_bits, counter(n_bits)),
+               ('%d bit random circuit'%(2*n_bits), circuit) ]
+    for name, (nb, init, trans) in models:
+        init, trans = parse_pred_z3_gen(init, nb), parse_trans_z3_gen(trans, nb)
+        for lazy in [False, True]:
+            rd, t = timed(nb, init, trans, lazy)
+            print('  %-24s %-6s diameter %5d %8.3f s'%(name, 'lazy' if lazy else 'eager', rd, t))
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
@@ -0,0 +1,79 @@
+"""
+Compares loading a specification in the original 4-tuple format with loading it in the sectioned
+format (see `spec_loader.py`), for a machine generated transition relation of about `size_mb`
+megabytes, the random definitions of `bench_parser.py`. For each format, the time taken to load the
+file, the memory held by the loaded formulas, and the peak memory while loading (both measured with
+`tracemalloc`, in a separate run), are reported. The peak of the sectioned format stays close to the
+memory held by the formulas, while that of the original format adds the whole text of the relation.
+
+Usage:
+    python -m benchmarks.bench_spec_loader [size_mb] [seed]
+"""
+
+import os
+import sys
+import gc
+import time
+import random
+import tempfile
+import tracemalloc
+from spec_loader import load_spec
+from benchmarks.bench_parser import definitions, balanced
+
+N_BITS = 4096
+
+def write_specs(dir, size, rng):
+    """
+    Writes the same specification in both formats in `dir`, returns the paths of the files
+    """
+    defs = [ d[0] for d in definitions(size, rng, N_BITS) ]
+    init = [ '(!v%d)'%i for i in range(0, N_BITS, 2) ]
+    props = [ 'G (v0 + v1)', 'F v2' ]
+    legacy, sectioned = os.path.join(dir, 'legacy'), os.path.join(dir, 'sectioned')
+    with open(legacy, 'w') as f:
+        f.write(repr((N_BITS, balanced(init), balanced(defs), props)))
+    with open(sectioned, 'w') as f:
+        f.write('bits = %d\n\n[init]\n'%N_BITS)
+        f.writelines([ i + '\n' for i in init ])
+        f.write('\n[trans]\n')
+        f.writelines([ d + '\n' for d in defs ])
+        f.write('\n[properties]\n')
+        f.writelines([ p + '\n' for p in props ])
+    return legacy, sectioned
+
+def measure(path):
+    """
+    Loads the specification at `path` twice, returns the time taken, the memory held by the
+    specification and the peak memory while loading it, and the size of the transition relation
+    """
+    t = time.perf_counter()
+    spec = load_spec(path)
+    t = time.perf_counter() - t
+    n = spec.trans.size
+    del spec
+    gc.collect()
+
+    tracemalloc.start()
+    spec = load_spec(path)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del spec
+    gc.collect()
+    return t, held, peak, n
+
+def main(size_mb = 2, seed = 0):
+    with tempfile.TemporaryDirectory() as dir:
+        paths = write_specs(dir, int(size_mb * 2**20), random.Random(seed))
+        print('Transition relation of %.1f MB:'%size_mb)
+        print('  %-10s %8s %10s %12s %12s'%('', 'file MB', 'time (s)', 'held (MB)', 'peak (MB)'))
+        sizes = set()
+        for name, path in zip(('legacy', 'sectioned'), paths):
+            t, held, peak, n = measure(path)
+            sizes.add(n)
+            print('  %-10s %8.2f %10.2f %12.1f %12.1f'%(name, os.path.getsize(path) / 2**20, t,
+                                                         held / 2**20, peak / 2**20))
+        # The conjuncts are joined in trees of different shapes, but of the same size
+        assert len(sizes) == 1, 'The formats give different transition relations'
+
+if __name__ == "__main__":
+    main(*[ float(a) if i == 0 else int(a) for i, a in enumerate(sys.argv[1:]) ])
@@ -0,0 +1,50 @@
+"""
+Measures the startup time of the scripts on a small specification, run directly and through the
+`boundedmc.py` entry point. Each run is a fresh process with `-X importtime`, and the median over
+the runs of the wall clock time, and of the total time spent importing modules, is reported, along
+with whether z3 and numpy were loaded.
+
+Usage:
+    python -m benchmarks.bench_startup [spec_file] [runs]
+"""
+
+import sys
+import time
+import subprocess
+from statistics import median
+from boundedmc import COMMANDS
+
+def run(cmd):
+    """
+    Runs `cmd` with `-X importtime`, returns the wall clock time, the total import time in seconds,
+    and the set of the modules imported
+    """
+    t = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + cmd, capture_output = True,
+                          text = True)
+    t = time.perf_counter() - t
+    if proc.returncode != 0:
+        raise RuntimeError('%s failed:\n%s'%(' '.join(cmd), proc.stderr[-2000:]))
+    total, modules = 0, set()
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('package'):
+            self_us, _, name = line[len('import time:'):].split('|')
+            total += int(self_us)
+            modules.add(name.strip())
+    return t, total / 1e6, modules
+
+def main(spec = 'examples/katoen02-kind', runs = 5):
+    print('Startup on %s, median of %d runs:'%(spec, runs))
+    print('  %-34s %10s %10s   %s'%('', 'wall (s)', 'import (s)', 'loaded'))
+    for command, module in COMMANDS.items():
+        if command == 'portfolio':
+            continue
+        for cmd in ([module + '.py', spec], ['-m', 'boundedmc', command, spec]):
+            res = [ run(cmd) for _ in range(runs) ]
+            loaded = [ name for name, probe in (('z3', 'z3.z3core'), ('numpy', 'numpy._core'))
+                                                                    if probe in res[0][2] ]
+            print('  %-34s %10.3f %10.3f   %s'%(' '.join(cmd[:-1]), median(r[0] for r in res),
+                        median(r[1] for r in res), ' '.join(loaded) or '-'))
+
+if __name__ == "__main__":
+    main(*[ int(a) if i == 1 else a for i, a in enumerate(sys.argv[1:]) ])
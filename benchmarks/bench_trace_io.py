@@ -0,0 +1,58 @@
+"""
+Measures reading a long counterexample from a z3 model, bit by bit as before and in bulk with
+`utils.eval_states`, and writing it in each of the formats of `trace_io.py`. The model fixes a
+random value for most of the bits of the states of a path of `length` states of `n_bits` bits,
+leaving the others free, and the binary file written is read back and checked.
+
+Usage:
+    python -m benchmarks.bench_trace_io [n_bits] [length] [seed]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import z3
+import trace_io
+from utils import Trace, eval_states
+from varpool import pool
+
+def timed(f):
+    t = time.perf_counter()
+    res = f()
+    return res, time.perf_counter() - t
+
+def main(n_bits = 500, length = 300, seed = 0):
+    rng = random.Random(seed)
+    states = [ pool.state(k, n_bits) for k in range(length) ]
+    s = z3.Solver()
+    s.add([ v if rng.random() < 0.5 else z3.Not(v) for st in states for v in st
+                                                        if rng.random() < 0.9 ])
+    assert s.check() == z3.sat
+    m = s.model()
+    print('Trace of %d states of %d bits:'%(length, n_bits))
+
+    old, t_old = timed(lambda: [ tuple( 1 if z3.is_true(m.eval(z3.Bool('s_%d_%d'%(k, i)),
+                                                model_completion = True)) else 0
+                                        for i in range(n_bits) ) for k in range(length) ])
+    new, t_new = timed(lambda: eval_states(m, states))
+    assert old == new, 'The bulk evaluation differs from the evaluation bit by bit'
+    print('  read bit by bit %8.3f s   in bulk %8.3f s'%(t_old, t_new))
+    packed, t = timed(lambda: trace_io.pack(new, n_bits))
+    print('  packed to %d bytes in %.3f s'%(packed.nbytes, t))
+
+    trace = Trace(new, length // 2)
+    with tempfile.TemporaryDirectory() as dir:
+        for fmt, (_, binary) in trace_io.WRITERS.items():
+            path = os.path.join(dir, 'trace.' + fmt)
+            with open(path, 'wb' if binary else 'w') as f:
+                _, t = timed(lambda: trace_io.write_trace(f, fmt, n_bits, trace))
+            print('  %-4s %10d bytes, written in %.3f s'%(fmt, os.path.getsize(path), t))
+        with open(os.path.join(dir, 'trace.bin'), 'rb') as f:
+            (back, _), t = timed(lambda: trace_io.read_bin(f))
+        assert back == trace, 'The binary trace read back differs'
+        print('  binary trace read back in %.3f s'%t)
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
@@ -0,0 +1,52 @@
+"""
+Measures the Python side cost of creating the variables of a large unrolling, by formatting names
+and calling `Bool` for every variable as the engines used to, against the shared variable pool, both
+when the pool is empty and when the variables are already in it (as for every property after the
+first one).
+
+Usage:
+    python -m benchmarks.bench_varpool [n_bits] [k]
+"""
+
+import sys
+import time
+import z3
+import varpool
+from varpool import VarPool
+from ltl_encode import nonLooping
+from parser.fast_parser import parser
+from utils import ast_to_nnf
+from parser.formulas import *
+
+class NullSolver():
+    # Stands in for the solver, so that only the encoding is measured
+    def add(self, *args):
+        pass
+
+def timed(f):
+    t = time.perf_counter()
+    f()
+    return time.perf_counter() - t
+
+def main(n_bits = 500, k = 200):
+    print('State variables for %d bits and %d steps:'%(n_bits, k))
+    old = timed(lambda: [[z3.Bool('s_%d_%d'%(j, i)) for i in range(n_bits)] for j in range(k)])
+    print('  Bool per variable:    %8.3f s'%old)
+    pool = VarPool()
+    cold = timed(lambda: [pool.state(j, n_bits) for j in range(k)])
+    print('  Pool, first use:      %8.3f s'%cold)
+    warm = timed(lambda: [pool.state(j, n_bits) for j in range(k)])
+    print('  Pool, reused:         %8.3f s'%warm)
+
+    ast = ast_to_nnf(FormulaMonadic('NOT', parser.parse('G ((!v0) + (X ((!v1) + (X (!v2)))))')))
+    def encode():
+        mem = set()
+        for j in range(k):
+            nonLooping(ast, 0, j, NullSolver(), mem)
+    print('Non looping encoding of a property for bounds upto %d:'%k)
+    varpool.pool.clear()
+    print('  Pool, first use:      %8.3f s'%timed(encode))
+    print('  Pool, reused:         %8.3f s'%timed(encode))
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
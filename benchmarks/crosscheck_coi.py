@@ -0,0 +1,65 @@
+"""
+Checks that the cone of influence reduction (see `coi.py`) does not change the verdicts of
+`Invariant_Liveness`, `K_induction` and `BMC_LTL`, on models made of two independent random
+models side by side, with properties over the bits of one of them, and that the counterexamples
+mapped back to the full model are paths of the full model, checked with the explicit state engine.
+Exits with status 1 if there are differences.
+
+Usage:
+    python -m benchmarks.crosscheck_coi [n_models] [seed]
+"""
+
+import io
+import sys
+import random
+import argparse
+import contextlib
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from benchmarks.models import random_model, random_pred, random_formula, conj
+from benchmarks.bench_pdr import is_path
+from explicit import ExplicitModel
+from coi import rename
+import Invariant_Liveness, K_induction, BMC_LTL
+
+def side_by_side(rng):
+    # Two random models, the bits of the second after those of the first
+    n1, init1, trans1 = random_model(rng.randint(1, 3), rng)
+    n2, init2, trans2 = random_model(rng.randint(1, 3), rng)
+    # `rename` numbers bit `bits[k]` as `k`, so this moves bit `k` of the second model to `n1 + k`
+    bits = list(range(-n1, n2))
+    return n1, n1 + n2, conj([init1, rename(init2, bits)]), conj([trans1, rename(trans2, bits)])
+
+def main(n_models = 30, seed = 0):
+    rng = random.Random(seed)
+    bad, checks = 0, 0
+    for _ in range(n_models):
+        n1, n_bits, init, trans = side_by_side(rng)
+        model = ExplicitModel(n_bits, init, trans)
+        init_z3, trans_z3 = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+        for _ in range(4):
+            p = random_pred(n1, 3, rng)
+            ltl = random_formula(n1, 2, rng)
+            for mod, prop in [(Invariant_Liveness, FormulaMonadic('G', p)),
+                              (Invariant_Liveness, FormulaMonadic('F', p)),
+                              (K_induction, FormulaMonadic('G', p)), (BMC_LTL, ltl)]:
+                res = []
+                for coi in [True, False]:
+                    args = argparse.Namespace(threshold = 8 if mod is BMC_LTL else None,
+                                              loops = 'position', encoder = 'classic',
+                                              explicit_limit = 0, coi = coi, simplify = True,
+                                              cache = None)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        res.append(mod.check_property(n_bits, init_z3, trans_z3, str(prop), prop,
+                                                      args))
+                checks += 1
+                if res[0].verdict != res[1].verdict or (res[0].trace is not None and
+                                                        not is_path(model, res[0].trace)):
+                    bad += 1
+                    print('Difference on %s %s: %s, without coi %s'%(mod.__name__, prop, res[0],
+                                                                      res[1]))
+    print('%d differences in %d checks'%(bad, checks))
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
@@ -0,0 +1,98 @@
+"""
+Cross checks the SAT based engines against the explicit state engine of `explicit.py`, which is
+exact, on random models. For each model, compares the reoccurrence diameters, and for random
+predicates `p`, the verdicts and counterexample lengths for `Gp` and `Fp` with the BMC loops run upto
+the reoccurrence diameter, and for random ltl formulas, the verdicts of `BMC_LTL` run upto the length
+of the counterexample found by the explicit engine. The random models have no states without
+successors, so the verdicts of `BMC_LTL.check_property` with and without the explicit engine are
+also compared on the models of `DEADLOCKS`, which have some. Exits with status 1 if there are
+differences.
+
+Usage:
+    python -m benchmarks.crosscheck_explicit [n_models] [seed]
+"""
+
+import sys
+import io
+import random
+import argparse
+import contextlib
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from parser.fast_parser import parser
+from utils import ast_to_nnf
+from benchmarks.models import random_model, random_formula, random_pred
+from explicit import ExplicitModel
+from reocc_diam import get_reocc_diam
+from Invariant_Liveness import Invariant_Check_Gp, Invariant_Check_Fp
+import BMC_LTL as bmc_ltl
+from BMC_LTL import BMC_LTL
+
+# Models with reachable states without successors, as `(n_bits, init, trans, props)`
+DEADLOCKS = [
+    (1, "(!v0)", "((!u0) . v0)", ["G (!v0)", "F v0"]),
+]
+
+def quiet(f, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return f(*args)
+
+def main(n_models = 40, seed = 0):
+    rng = random.Random(seed)
+    bad, checks = 0, 0
+
+    def report(what, sat_res, exp_res):
+        nonlocal bad
+        bad += 1
+        print('Difference on %s: SAT %s, explicit %s'%(what, sat_res, exp_res))
+
+    for _ in range(n_models):
+        n_bits, init, trans = random_model(rng.randint(1, 4), rng)
+        model = ExplicitModel(n_bits, init, trans)
+        init_z3, trans_z3 = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+        rd = get_reocc_diam(n_bits, init_z3, trans_z3)
+        checks += 1
+        if rd != model.reocc_diam():
+            report('reoccurrence diameter', rd, model.reocc_diam())
+
+        for _ in range(3):
+            p = random_pred(n_bits, 3, rng)
+            p_z3 = parse_pred_z3_gen(p, n_bits)
+            for name, sat_check, exp_check in [('G', Invariant_Check_Gp, model.check_Gp),
+                                               ('F', Invariant_Check_Fp, model.check_Fp)]:
+                checks += 1
+                sat_res = quiet(sat_check, n_bits, rd, init_z3, trans_z3, p_z3)
+                exp_res = exp_check(p)
+                sat_found, exp_found = sat_res is not None, exp_res is not None
+                if sat_found != exp_found or (name == 'G' and sat_found and
+                                              len(sat_res.states) != len(exp_res.states)):
+                    report('%s %s'%(name, p), sat_res, exp_res)
+
+        for _ in range(3):
+            ast = ast_to_nnf(FormulaMonadic('NOT', random_formula(n_bits, rng.randint(1, 3), rng)))
+            exp_res = model.check_ltl(ast)
+            threshold = 6 if exp_res is None else len(exp_res.states)
+            sat_res = quiet(BMC_LTL, n_bits, threshold, init_z3, trans_z3, ast)
+            checks += 1
+            if (sat_res is None) != (exp_res is None):
+                report('ltl %s'%ast, sat_res, exp_res)
+
+    for n_bits, init, trans, props in DEADLOCKS:
+        init_z3 = parse_pred_z3_gen(parser.parse(init), n_bits)
+        trans_z3 = parse_trans_z3_gen(parser.parse(trans), n_bits)
+        for prop in props:
+            verdicts = []
+            for limit in (n_bits, 0):
+                args = argparse.Namespace(threshold = 6, loops = 'position', encoder = 'classic',
+                                          explicit_limit = limit, coi = False, simplify = True)
+                verdicts.append(quiet(bmc_ltl.check_property, n_bits, init_z3, trans_z3, prop,
+                                      parser.parse(prop), args).verdict)
+            checks += 1
+            if verdicts[0] != verdicts[1]:
+                report('ltl %s on the model %s %s'%(prop, init, trans), verdicts[1], verdicts[0])
+
+    print('%d differences in %d checks'%(bad, checks))
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
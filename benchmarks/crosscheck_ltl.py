@@ -0,0 +1,46 @@
+"""
+Cross checks the two ltl encodings used by `BMC_LTL`, that of `ltl_encode.py` and the linear one of
+`ltl_linear_encode.py`, by checking random formulas on random small models with both, and comparing
+whether a counterexample is found within the threshold. Prints the disagreements, if any, and exits
+with a non zero status if there were some.
+
+Usage:
+    python -m benchmarks.crosscheck_ltl [n_formulas] [seed] [threshold]
+"""
+
+import sys
+import io
+import random
+import contextlib
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from utils import ast_to_nnf
+from benchmarks.models import random_model, random_formula
+from BMC_LTL import BMC_LTL
+
+def check(n_bits, init, trans, ast, threshold, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return BMC_LTL(n_bits, threshold, init, trans, ast, **kwargs) is not None
+
+def main(n_formulas = 200, seed = 0, threshold = 6):
+    rng = random.Random(seed)
+    modes = [ dict(encoder = 'classic', loops = 'position'),
+              dict(encoder = 'classic', loops = 'selector'),
+              dict(encoder = 'linear') ]
+    bad = 0
+    for i in range(n_formulas):
+        n_bits, init, trans = random_model(rng.randint(1, 3), rng)
+        init_z3, trans_z3 = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+        prop = random_formula(n_bits, rng.randint(1, 4), rng)
+        ast = ast_to_nnf(FormulaMonadic('NOT', prop))
+        found = [ check(n_bits, init_z3, trans_z3, ast, threshold, **mode) for mode in modes ]
+        if len(set(found)) > 1:
+            bad += 1
+            print('Disagreement on %s for model %s %s:'%(prop, init, trans))
+            for mode, f in zip(modes, found):
+                print('    %-45s %s'%(mode, 'cex' if f else 'no cex'))
+    print('%d of %d formulas checked with disagreements'%(bad, n_formulas))
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
@@ -0,0 +1,59 @@
+"""
+Cross checks the simplification of `ltl_simplify.py`, by checking random formulas on random small
+models with `BMC_LTL`, with each of its encodings, both as they are and simplified, and comparing
+the length of the shortest counterexample found, if any, within the threshold. As the
+simplification holds on the bounded semantics, these must be the same. Prints the disagreements, if any, along with
+how much smaller the formulas got, and exits with a non zero status if there were some.
+
+Usage:
+    python -m benchmarks.crosscheck_simplify [n_formulas] [seed] [threshold]
+"""
+
+import sys
+import io
+import random
+import contextlib
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from parser.formulas import *
+from utils import ast_to_nnf
+from ltl_simplify import simplify
+from benchmarks.models import random_model, random_formula, dag_size
+from BMC_LTL import BMC_LTL
+
+def check(n_bits, init, trans, ast, threshold, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        trace = BMC_LTL(n_bits, threshold, init, trans, ast, **kwargs)
+    return None if trace is None else len(trace.states)
+
+def main(n_formulas = 200, seed = 0, threshold = 6):
+    rng = random.Random(seed)
+    modes = [ dict(encoder = 'classic', loops = 'position'),
+              dict(encoder = 'classic', loops = 'selector'),
+              dict(encoder = 'linear') ]
+    bad = changed = before = after = 0
+    for i in range(n_formulas):
+        n_bits, init, trans = random_model(rng.randint(1, 3), rng)
+        init_z3, trans_z3 = parse_pred_z3_gen(init, n_bits), parse_trans_z3_gen(trans, n_bits)
+        prop = random_formula(n_bits, rng.randint(1, 5), rng)
+        ast = ast_to_nnf(FormulaMonadic('NOT', prop))
+        simple = simplify(ast)
+        before += dag_size(ast)
+        after += dag_size(simple)
+        if simple is ast:
+            continue
+        changed += 1
+        for mode in modes:
+            found = [ check(n_bits, init_z3, trans_z3, f, threshold, **mode)
+                                                                    for f in (ast, simple) ]
+            if found[0] != found[1]:
+                bad += 1
+                print('Disagreement on %s simplified to %s for model %s %s with %s:'%(ast, simple,
+                                                                            init, trans, mode))
+                print('    counterexample of %s states as it is, %s simplified'%tuple(found))
+    print('%d of %d formulas simplified, from %d to %d subformulas in all'%(changed, n_formulas,
+                                                                            before, after))
+    print('%d disagreements'%bad)
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*[ int(a) for a in sys.argv[1:] ]) else 0)
@@ -0,0 +1,139 @@
+"""
+Parameterized families of models for the benchmark suite of `suite.py`, written as specifications in
+the original format (see `spec_loader.py`), so that they go through the same parsing as the files
+given to the scripts. Each family is a function of the size `n` and of whether the variant is safe,
+which returns an `Instance`. The properties of an instance are given with whether they hold, so that
+the verdicts of the engines can be checked.
+
+The families are:
+
+  counter     an `n` bit binary counter from 0. The safe variant wraps around before reaching the
+              value with all bits set, so `G (! top)` holds and `F top` fails, while the unsafe one
+              reaches it after `2^n - 1` steps.
+  shift       two `n` bit shift registers fed with the same free input. In the unsafe variant the
+              second register gets the input one step late, so that their last bits differ after `n`
+              steps.
+  ring        a token ring of `n` stations. In the unsafe variant the token can be lost when it
+              wraps around, after `n` steps.
+  mutex       `n` processes entering a critical section guarded by a lock, one at a time. In the
+              unsafe variant the last process ignores the lock.
+  pipeline    an `n` stage pipeline filled from its first stage, which can stall. The safe property
+              needs an induction of depth `n / 2`, and the unsafe one has a counterexample of length
+              `n`.
+
+Usage:
+    python -m benchmarks.families <family> <n> [safe|unsafe] [spec_file]
+
+    Writes the specification of the instance to `spec_file`, or prints it.
+"""
+
+import sys
+from collections import namedtuple
+
+# An instance of a family. `init` and `trans` are the strings of the initial states and transition
+# relation, and `props` the list of the pairs of the string of each property and whether it holds.
+Instance = namedtuple('Instance', ['name', 'n_bits', 'init', 'trans', 'props'])
+
+def _join(op, fs, empty):
+    # The balanced, fully parenthesized, join of the strings `fs` by the binary operator `op`
+    if not fs:
+        return empty
+    while len(fs) > 1:
+        fs = [ '(%s %s %s)'%(fs[i], op, fs[i+1]) if i+1 < len(fs) else fs[i]
+                                                        for i in range(0, len(fs), 2) ]
+    return fs[0]
+
+def conj(fs):
+    return _join('.', fs, 'tru')
+
+def disj(fs):
+    return _join('+', fs, 'fls')
+
+def neg(f):
+    return '(! %s)'%f
+
+def iff(a, b):
+    return '(%s = %s)'%(a, b)
+
+def counter(n, safe):
+    bits = [ 'v%d'%i for i in range(n) ]
+    top = conj(bits)
+    # The value with all bits but bit 0 set, after which the safe variant goes back to 0
+    last = conj([neg('u0')] + [ 'u%d'%i for i in range(1, n) ])
+    trans = []
+    for i in range(n):
+        nxt = '(u%d ^ %s)'%(i, conj([ 'u%d'%j for j in range(i) ]))
+        trans.append(iff('v%d'%i, '(%s . %s)'%(neg(last), nxt) if safe else nxt))
+    return Instance('counter', n, conj([ neg(b) for b in bits ]), conj(trans),
+                    [ ('G %s'%neg(top), safe), ('F %s'%top, not safe) ])
+
+def shift(n, safe):
+    # Bits `0` to `n-1` are the first register, and `n` to `2n-1` the second one
+    trans = []
+    for i in range(1, n):
+        trans += [ iff('v%d'%i, 'u%d'%(i-1)), iff('v%d'%(n+i), 'u%d'%(n+i-1)) ]
+    trans.append(iff('v%d'%n, 'v0' if safe else 'u0'))
+    return Instance('shift', 2*n, conj([ neg('v%d'%i) for i in range(2*n) ]), conj(trans),
+                    [ ('G %s'%iff('v%d'%(n-1), 'v%d'%(2*n-1)), safe), ('F v%d'%(n-1), False) ])
+
+def ring(n, safe):
+    # Bit `n` is a free bit, which drops the token in the unsafe variant
+    trans = [ iff('v%d'%i, 'u%d'%(i-1)) for i in range(1, n) ]
+    trans.append(iff('v0', 'u%d'%(n-1) if safe else '(u%d . u%d)'%(n-1, n)))
+    init = conj(['v0'] + [ neg('v%d'%i) for i in range(1, n) ])
+    return Instance('ring', n+1, init, conj(trans),
+                    [ ('G %s'%disj([ 'v%d'%i for i in range(n) ]), safe), ('F v%d'%(n-1), True) ])
+
+def mutex(n, safe):
+    # Bit `i` is set while process `i` is in its critical section, and bit `n` is the lock
+    trans = []
+    for i in range(n):
+        if safe or i < n-1:
+            # A process only enters when the lock is free
+            trans.append(disj([ neg('v%d'%i), 'u%d'%i, neg('u%d'%n) ]))
+        for j in range(i+1, n):
+            trans.append(neg(conj([ 'v%d'%i, neg('u%d'%i), 'v%d'%j, neg('u%d'%j) ])))
+    trans.append(iff('v%d'%n, disj([ 'v%d'%i for i in range(n) ])))
+    exclusive = conj([ neg('(v%d . v%d)'%(i, j)) for i in range(n) for j in range(i+1, n) ])
+    return Instance('mutex', n+1, conj([ neg('v%d'%i) for i in range(n+1) ]), conj(trans),
+                    [ ('G %s'%exclusive, safe), ('F v0', False) ])
+
+def pipeline(n, safe):
+    # Bit `n` is a free bit, which stalls the pipeline
+    trans = [ iff('v0', 'tru') ]
+    for i in range(1, n):
+        trans.append(iff('v%d'%i, '((u%d . u%d) + (%s . u%d))'%(n, i, neg('u%d'%n), i-1)))
+    prop = '(%s + v%d)'%(neg('v%d'%(n-1)), n//2) if safe else neg('v%d'%(n-1))
+    return Instance('pipeline', n+1, conj([ neg('v%d'%i) for i in range(n) ]), conj(trans),
+                    [ ('G %s'%prop, safe), ('F v%d'%(n-1), False) ])
+
+# The families, and the sizes run by default
+FAMILIES = {
+    'counter': (counter, [3, 5, 7]),
+    'shift': (shift, [4, 8, 16]),
+    'ring': (ring, [4, 8, 16]),
+    'mutex': (mutex, [2, 4, 8]),
+    'pipeline': (pipeline, [8, 16, 32]),
+}
+
+def instance(family, n, safe):
+    """
+    Returns the `Instance` of the family named `family` of size `n`, safe or not
+    """
+    return FAMILIES[family][0](n, safe)
+
+def spec_text(inst):
+    """
+    The text of the specification file of the instance `inst`
+    """
+    return repr((inst.n_bits, inst.init, inst.trans, [ p for p, _ in inst.props ])) + '\n'
+
+if __name__ == "__main__":
+    family, n = sys.argv[1], int(sys.argv[2])
+    safe = len(sys.argv) < 4 or sys.argv[3] == 'safe'
+    text = spec_text(instance(family, n, safe))
+    if len(sys.argv) > 4:
+        with open(sys.argv[4], 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
@@ -0,0 +1,165 @@
+"""
+Generators for the models used by the benchmarks. The models are built directly as asts, see
+`parser/formulas.py`, so that large models do not have to go through the parser.
+"""
+
+import random
+from parser.formulas import *
+
+def prop(name):
+    return FormulaMonadic('PROP', name)
+
+def neg(f):
+    return FormulaMonadic('NOT', f)
+
+def conj(fs):
+    """
+    Balanced conjunction of the non empty list of formulas `fs`
+    """
+    while len(fs) > 1:
+        fs = [ FormulaDyadic('AND', fs[i], fs[i+1]) if i+1 < len(fs) else fs[i]
+                                                        for i in range(0, len(fs), 2) ]
+    return fs[0]
+
+def iff(a, b):
+    # The same shape that the parser produces for `(a = b)`
+    return FormulaDyadic('AND', FormulaDyadic('OR', neg(a), b), FormulaDyadic('OR', neg(b), a))
+
+def xor(a, b):
+    # The same shape that the parser produces for `(a ^ b)`
+    return neg(iff(a, b))
+
+def counter(n_bits):
+    """
+    Returns the `(n_bits, init, trans)` asts of an `n_bits` binary counter starting at 0, with bit 0
+    being the least significant one. The counter wraps around after `2^n_bits` steps.
+    """
+    init = conj([ neg(prop('v%d'%i)) for i in range(n_bits) ])
+    defs, carry = [], FormulaMonadic('LITERAL', 'tru')
+    for i in range(n_bits):
+        defs.append(iff(prop('v%d'%i), xor(prop('u%d'%i), carry)))
+        carry = FormulaDyadic('AND', carry, prop('u%d'%i))
+    return n_bits, init, conj(defs)
+
+def random_functional_trans(n_bits, n_gates, seed = 0):
+    """
+    Returns the ast of a transition relation over `n_bits` bits where each next state bit `vi` is
+    defined by a random and-inverter circuit over the `ui`, built from about `n_gates` gates in
+    total. Gates only use recent gates as inputs, so the circuit is deep, but shares a lot.
+    """
+    rng = random.Random(seed)
+    gates = [ prop('u%d'%i) for i in range(n_bits) ]
+    per_bit = max(1, n_gates // n_bits)
+    defs = []
+    for i in range(n_bits):
+        for _ in range(per_bit):
+            a, b = rng.choice(gates[-64:]), rng.choice(gates[-64:])
+            a = neg(a) if rng.random() < 0.5 else a
+            b = neg(b) if rng.random() < 0.5 else b
+            gates.append(FormulaDyadic('AND', a, b) if rng.random() < 0.5 
+                                                    else FormulaDyadic('OR', a, b))
+        defs.append(iff(prop('v%d'%i), gates[-1]))
+    return conj(defs)
+
+def dag_size(ast):
+    """
+    Number of distinct nodes in the formula `ast`
+    """
+    seen = set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Formula) or node in seen:
+            continue
+        seen.add(node)
+        if isinstance(node, FormulaMonadic):
+            stack.append(node.child)
+        else:
+            stack.extend((node.left, node.right))
+    return len(seen)
+
+def cube(bits, prefix):
+    """
+    The conjunction of literals over the variables `prefix0, prefix1 ...` true exactly for `bits`
+    """
+    return conj([ prop('%s%d'%(prefix, i)) if b else neg(prop('%s%d'%(prefix, i)))
+                                                                for i, b in enumerate(bits) ])
+
+def disj(fs):
+    """
+    Balanced disjunction of the non empty list of formulas `fs`
+    """
+    while len(fs) > 1:
+        fs = [ FormulaDyadic('OR', fs[i], fs[i+1]) if i+1 < len(fs) else fs[i]
+                                                        for i in range(0, len(fs), 2) ]
+    return fs[0]
+
+def random_model(n_bits, rng):
+    """
+    Returns the `(n_bits, init, trans)` asts of a random explicit model, with a random non empty set
+    of initial states, and each state having one or two random successors.
+    """
+    states = [ [ (s >> i) & 1 for i in range(n_bits) ] for s in range(2**n_bits) ]
+    init = disj([ cube(s, 'v') for s in rng.sample(states, rng.randint(1, len(states))) ])
+    edges = [ FormulaDyadic('AND', cube(s, 'u'), cube(t, 'v'))
+                        for s in states for t in rng.sample(states, min(len(states), rng.randint(1, 2))) ]
+    return n_bits, init, disj(edges)
+
+def random_formula(n_bits, depth, rng):
+    """
+    Returns a random ltl formula over the bits `v0 ... v(n_bits-1)` with nesting depth upto `depth`
+    """
+    if depth == 0 or rng.random() < 0.2:
+        if rng.random() < 0.1:
+            return FormulaMonadic('LITERAL', rng.choice(['tru', 'fls']))
+        return prop('v%d'%rng.randrange(n_bits))
+    op = rng.choice(['NOT', 'AND', 'OR', 'X', 'F', 'G', 'U', 'R'])
+    if op in ('NOT', 'X', 'F', 'G'):
+        return FormulaMonadic(op, random_formula(n_bits, depth-1, rng))
+    return FormulaDyadic(op, random_formula(n_bits, depth-1, rng),
+                             random_formula(n_bits, depth-1, rng))
+
+def random_pred(n_bits, depth, rng):
+    """
+    Returns a random formula without ltl operators over the bits `v0 ... v(n_bits-1)` with nesting
+    depth upto `depth`
+    """
+    if depth == 0 or rng.random() < 0.2:
+        return prop('v%d'%rng.randrange(n_bits))
+    op = rng.choice(['NOT', 'AND', 'OR'])
+    if op == 'NOT':
+        return FormulaMonadic(op, random_pred(n_bits, depth-1, rng))
+    return FormulaDyadic(op, random_pred(n_bits, depth-1, rng), random_pred(n_bits, depth-1, rng))
+
+def resetting_counter(n_bits):
+    """
+    Returns the `(n_bits, init, trans, prop)` asts of an `n_bits` binary counter starting at 0, which
+    goes back to 0 after reaching `2^(n_bits-1)`, and of the property that it never has all bits
+    set. The property holds, but the unreachable values above `2^(n_bits-1)` count up to the bad
+    state, so k-induction needs a depth of about `2^(n_bits-1)` to prove it.
+    """
+    at_reset = cube([0]*(n_bits-1) + [1], 'u')
+    init = conj([ neg(prop('v%d'%i)) for i in range(n_bits) ])
+    defs, carry = [], FormulaMonadic('LITERAL', 'tru')
+    for i in range(n_bits):
+        defs.append(iff(prop('v%d'%i), FormulaDyadic('AND', neg(at_reset),
+                                                            xor(prop('u%d'%i), carry))))
+        carry = FormulaDyadic('AND', carry, prop('u%d'%i))
+    return n_bits, init, conj(defs), FormulaMonadic('G', neg(cube([1]*n_bits, 'v')))
+
+def guarded_counter(n_bits):
+    """
+    Returns the `(n_bits + 2, init, trans, prop)` asts of an `n_bits` binary counter starting at 0,
+    with a guard bit `v(n_bits)` that stays 0, and a flag bit `v(n_bits+1)` that is set when the
+    counter has all bits set while the guard is set, and of the property that the flag is never set.
+    The property holds, but k-induction needs a depth of about `2^n_bits` to prove it, as does BMC
+    with the reoccurrence diameter as the threshold, while `Not guard and Not flag` is an inductive
+    invariant.
+    """
+    _, init, trans = counter(n_bits)
+    g, f = n_bits, n_bits + 1
+    init = conj([init, neg(prop('v%d'%g)), neg(prop('v%d'%f))])
+    fire = conj([prop('u%d'%g)] + [ prop('u%d'%i) for i in range(n_bits) ])
+    trans = conj([trans, iff(prop('v%d'%g), prop('u%d'%g)),
+                  iff(prop('v%d'%f), FormulaDyadic('OR', prop('u%d'%f), fire))])
+    return n_bits + 2, init, trans, FormulaMonadic('G', neg(prop('v%d'%f)))
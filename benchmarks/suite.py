@@ -0,0 +1,218 @@
+"""
+Runs the engines over the model families of `families.py`, with limits on time and memory, and
+records the results in a machine readable table, so that regressions and speedups can be tracked
+over time.
+
+Each engine is run on each property it applies to, in a fresh process, so that the runs do not share
+caches, and a run that goes over its limits does not take the others with it. The engines are:
+
+  gp          `Invariant_Check_Gp` on the `Gp` properties, upto the threshold
+  fp          `Invariant_Check_Fp` on the `Fp` properties, upto the threshold
+  kind        `K_induction` on the `Gp` properties
+  reocc       `get_reocc_diam`, once for each model
+  ltl         `BMC_LTL` on all the properties, upto the threshold
+
+Each run gives a row of the table, with the family, size, variant, engine and property, the status
+(`ok`, `timeout`, `memout` or `error`), the verdict (`cex`, `proved` or `bounded`, or the diameter
+for `reocc`), whether the verdict agrees with whether the property holds, the time taken by the
+engine, including the compilation of the model to z3, and the peak resident memory of the process.
+The rows are appended to the output file as JSON lines, along with the time of the suite run, the
+git revision, and the limits, and are also printed. `--compare` prints the change in time of each
+run between the last two suite runs recorded in a file.
+
+Usage:
+    python -m benchmarks.suite [--families F ...] [--engines E ...] [--sizes N ...]
+                               [--threshold K] [--timeout T] [--memory MB] [--out FILE]
+    python -m benchmarks.suite --compare FILE
+"""
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+from benchmarks.families import FAMILIES, instance
+
+ENGINES = ['gp', 'fp', 'kind', 'reocc', 'ltl']
+
+def runs(inst, engines):
+    """
+    Yields the pairs of the engine and the index of the property, None for `reocc`, of the runs on
+    the instance `inst`
+    """
+    for engine in engines:
+        if engine == 'reocc':
+            yield engine, None
+            continue
+        for i, (prop, _) in enumerate(inst.props):
+            kind = prop.split(None, 1)[0]
+            if engine == 'ltl' or (kind == 'G' and engine in ('gp', 'kind')) \
+                               or (kind == 'F' and engine == 'fp'):
+                yield engine, i
+
+def run_engine(inst, engine, index, threshold):
+    """
+    Runs `engine` on the property `index` of the instance `inst`, returns the verdict
+    """
+    # The engines are imported here, so that the parent process never loads z3
+    import io
+    import contextlib
+    from parser.formulas import FormulaMonadic
+    from parser.fast_parser import parser
+    from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+    from utils import ast_to_nnf
+    from Invariant_Liveness import Invariant_Check_Gp, Invariant_Check_Fp
+    from K_induction import K_induction
+    from reocc_diam import get_reocc_diam
+    from BMC_LTL import BMC_LTL
+
+    init = parse_pred_z3_gen(inst.init, inst.n_bits)
+    trans = parse_trans_z3_gen(inst.trans, inst.n_bits)
+    prop = None if index is None else parser.parse(inst.props[index][0])
+    with contextlib.redirect_stdout(io.StringIO()):
+        if engine == 'reocc':
+            return get_reocc_diam(inst.n_bits, init, trans)
+        if engine == 'ltl':
+            ast = ast_to_nnf(FormulaMonadic('NOT', prop))
+            trace = BMC_LTL(inst.n_bits, threshold, init, trans, ast)
+        else:
+            p = parse_pred_z3_gen(prop.child, inst.n_bits)
+            if engine == 'kind':
+                return 'proved' if K_induction(inst.n_bits, init, trans, p) is None else 'cex'
+            check = Invariant_Check_Gp if engine == 'gp' else Invariant_Check_Fp
+            trace = check(inst.n_bits, threshold, init, trans, p)
+    return 'bounded' if trace is None else 'cex'
+
+def worker(task):
+    # Runs one task in this process, and prints its verdict, time and peak memory as JSON
+    import resource
+    inst = instance(task['family'], task['n'], task['safe'])
+    t = time.perf_counter()
+    verdict = run_engine(inst, task['engine'], task['prop'], task['threshold'])
+    t = time.perf_counter() - t
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({ 'verdict': verdict, 'time': t, 'rss_mb': rss }))
+
+def agrees(verdict, holds):
+    """
+    Whether the verdict is possible for a property which holds or not, or None if not known
+    """
+    if holds is None or verdict is None or isinstance(verdict, int):
+        return None
+    return verdict != 'cex' if holds else verdict != 'proved'
+
+def spawn(task, timeout, memory):
+    """
+    Runs `task` in a fresh process limited to `timeout` seconds and `memory` megabytes, returns the
+    part of its row given by the run
+    """
+    def limit():
+        import resource
+        if memory:
+            resource.setrlimit(resource.RLIMIT_AS, (memory * 2**20, memory * 2**20))
+    try:
+        proc = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--worker',
+                               json.dumps(task)], capture_output = True, text = True,
+                              timeout = timeout, preexec_fn = limit)
+    except subprocess.TimeoutExpired:
+        return { 'status': 'timeout', 'verdict': None, 'time': None, 'rss_mb': None }
+    if proc.returncode != 0:
+        err = proc.stderr.strip().splitlines()[-1:] or ['exit code %d'%proc.returncode]
+        # z3 may crash rather than raise when it can not allocate memory
+        memout = 'MemoryError' in proc.stderr or 'out of memory' in proc.stderr \
+                                                or (memory and proc.returncode < 0)
+        status = 'memout' if memout else 'error'
+        return { 'status': status, 'verdict': None, 'time': None, 'rss_mb': None,
+                 'error': err[0] }
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    res['status'] = 'ok'
+    return res
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True,
+                              text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(args):
+    suite = { 'suite': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': revision(),
+              'threshold': args.threshold, 'timeout': args.timeout, 'memory_mb': args.memory }
+    fmt = '%-9s %4s %-7s %-6s %-40s %-8s %-8s %5s %9s %8s'
+    print(fmt%('family', 'n', 'variant', 'engine', 'property', 'status', 'verdict', 'agree',
+               'time (s)', 'rss (MB)'))
+    with open(args.out, 'a') as out:
+        for family in args.families:
+            for n in args.sizes or FAMILIES[family][1]:
+                for safe in (True, False):
+                    inst = instance(family, n, safe)
+                    for engine, index in runs(inst, args.engines):
+                        task = { 'family': family, 'n': n, 'safe': safe, 'engine': engine,
+                                 'prop': index, 'threshold': args.threshold }
+                        row = dict(suite, **task)
+                        row['property'] = None if index is None else inst.props[index][0]
+                        row.update(spawn(task, args.timeout, args.memory))
+                        row['agrees'] = agrees(row['verdict'],
+                                               None if index is None else inst.props[index][1])
+                        out.write(json.dumps(row) + '\n')
+                        out.flush()
+                        prop = row['property'] or '-'
+                        print(fmt%(family, n, 'safe' if safe else 'unsafe', engine,
+                                   prop if len(prop) <= 40 else prop[:37] + '...', row['status'],
+                                   '-' if row['verdict'] is None else row['verdict'],
+                                   {True: 'yes', False: 'NO', None: '-'}[row['agrees']],
+                                   '-' if row['time'] is None else '%.3f'%row['time'],
+                                   '-' if row['rss_mb'] is None else '%.0f'%row['rss_mb']))
+
+def compare(path):
+    """
+    Prints the ratio of the times of the runs of the last suite run recorded in the file at `path`
+    to those of the previous one
+    """
+    with open(path) as f:
+        rows = [ json.loads(line) for line in f if line.strip() ]
+    suites = sorted({ r['suite'] for r in rows })
+    if len(suites) < 2:
+        print('Need two suite runs to compare, found %d'%len(suites))
+        return
+    key = lambda r: (r['family'], r['n'], r['safe'], r['engine'], r['prop'])
+    old = { key(r): r for r in rows if r['suite'] == suites[-2] }
+    print('Time of %s relative to %s:'%(suites[-1], suites[-2]))
+    for r in rows:
+        if r['suite'] != suites[-1] or key(r) not in old:
+            continue
+        o = old[key(r)]
+        if r['time'] is None or o['time'] is None:
+            change = '%s -> %s'%(o['status'], r['status'])
+        else:
+            change = '%.2fx'%(r['time'] / max(o['time'], 1e-6))
+        print('  %-9s %4d %-7s %-6s %4s %s'%(r['family'], r['n'], 'safe' if r['safe'] else 'unsafe',
+                        r['engine'], '-' if r['prop'] is None else r['prop'], change))
+
+def main(argv):
+    argp = argparse.ArgumentParser(description = 'Runs the engines over the model families')
+    argp.add_argument('--families', nargs = '+', choices = list(FAMILIES), default = list(FAMILIES))
+    argp.add_argument('--engines', nargs = '+', choices = ENGINES, default = ENGINES)
+    argp.add_argument('--sizes', nargs = '+', type = int, metavar = 'N',
+                        help = 'the sizes of the models, instead of the default ones of each family')
+    argp.add_argument('--threshold', type = int, default = 20, metavar = 'K',
+                        help = 'the bound of the BMC engines')
+    argp.add_argument('--timeout', type = float, default = 60, metavar = 'T',
+                        help = 'the time limit of each run, in seconds')
+    argp.add_argument('--memory', type = int, default = 2048, metavar = 'MB',
+                        help = 'the memory limit of each run, in megabytes, 0 for none')
+    argp.add_argument('--out', default = 'suite_results.jsonl', metavar = 'FILE',
+                        help = 'the file the rows are appended to')
+    argp.add_argument('--compare', metavar = 'FILE',
+                        help = 'compare the last two suite runs recorded in FILE, and exit')
+    argp.add_argument('--worker', help = argparse.SUPPRESS)
+    args = argp.parse_args(argv)
+    if args.worker:
+        worker(json.loads(args.worker))
+    elif args.compare:
+        compare(args.compare)
+    else:
+        run_suite(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,88 @@
+"""
+A single entry point for all the scripts, set up to start quickly.
+
+Command line usage:
+    python -m boundedmc <command> <specification_file> [options]
+
+    where `<command>` is one of the keys of `COMMANDS`, and the options are those of the script
+    running it, which `python -m boundedmc <command> --help` lists.
+
+Loading z3 and numpy takes most of the startup time of the scripts. Before running the script, both
+are registered as lazily loaded modules, so that importing them only gives a placeholder, which
+loads the module when one of its attributes is first used, see `LazyModule`. So the
+engines that do not use z3, `explicit` and `bdd`, never load it (see `parse_to_z3.py`), and the SAT
+engines only load numpy for the models small enough for the explicit state engine. The formulas are
+parsed without PLY (see `parser/fast_parser.py`), and the process pool is only set up for more than
+one job (see `parallel.py`). The startup times are measured by `benchmarks/bench_startup.py`.
+"""
+
+import sys
+import types
+import runpy
+import importlib
+import importlib.util
+
+# The commands, and the modules of the scripts running them
+COMMANDS = {
+    'invariant': 'Invariant_Liveness',
+    'ltl': 'BMC_LTL',
+    'kind': 'K_induction',
+    'pdr': 'PDR',
+    'bdd': 'BDD_Reach',
+    'explicit': 'explicit',
+    'reocc': 'reocc_diam',
+    'portfolio': 'portfolio',
+}
+
+# The modules loaded on first use
+LAZY_MODULES = ['z3', 'numpy']
+
+class LazyModule(types.ModuleType):
+    """
+    A placeholder for a module, which loads the module when one of its attributes is first used,
+    and then takes all the attributes of the module
+    """
+    def __getattr__(self, attr):
+        # Only called for attributes the placeholder does not have, that is, before loading
+        if sys.modules.get(self.__name__) is self:
+            del sys.modules[self.__name__]
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+def lazy_import(name):
+    """
+    Registers the module `name`, so that importing it gives a `LazyModule` placeholder. Does
+    nothing if the module is already loaded, or is not installed, in which case importing it fails
+    as usual.
+    """
+    if name in sys.modules or importlib.util.find_spec(name) is None:
+        return
+    sys.modules[name] = LazyModule(name)
+
+def usage(out):
+    out.write('usage: python -m boundedmc <command> <specification_file> [options]\n\n'
+              'commands:\n')
+    for command, module in COMMANDS.items():
+        out.write('  %-10s %s.py\n'%(command, module))
+
+def main(argv):
+    """
+    Runs the script for the command given in `argv`, which is in the form of `sys.argv`
+    """
+    if len(argv) < 2 or argv[1] in ('-h', '--help'):
+        usage(sys.stdout if len(argv) >= 2 else sys.stderr)
+        return 0 if len(argv) >= 2 else 2
+    if argv[1] not in COMMANDS:
+        sys.stderr.write('Unknown command %s\n'%argv[1])
+        usage(sys.stderr)
+        return 2
+    for name in LAZY_MODULES:
+        lazy_import(name)
+    # The script sees the options after the command, and its own file name as `sys.argv[0]`
+    sys.argv = argv[1:]
+    runpy.run_module(COMMANDS[argv[1]], run_name = '__main__', alter_sys = True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,128 @@
+"""
+Defines a persistent cache of the results of the engines, stored in an SQLite database in a cache
+directory.
+
+Results are keyed by content: a model is identified by a hash of `n_bits` and of the asts of its
+initial states and transition relation, and a property by a hash of its ast. The hash of an ast
+(see `ast_hash`) only depends on its structure, so it does not change with the layout of the spec
+file, and is computed once per distinct subformula, as formulas are hash-consed DAGs (see
+`parser/formulas.py`). Along with the model and property, results are keyed by an engine string,
+which should name the engine and every option that changes its verdict, like the threshold.
+
+For each property, the cache stores its `CheckResult` (see `utils.py`), that is, the verdict, the
+depth and the counterexample trace, along with the output printed while checking it, which is
+printed again when the result is found in the cache. The reoccurrence diameter of each model is
+stored as well.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import weakref
+from parser.formulas import *
+from utils import Trace, CheckResult
+
+# Bumped whenever the engines change in a way that makes the results stored earlier wrong
+CACHE_VERSION = 1
+
+# The cache directory used if none is given
+DEFAULT_DIR = os.environ.get('BOUNDEDMC_CACHE_DIR',
+                             os.path.join(os.path.expanduser('~'), '.cache', 'boundedmc'))
+
+# The hashes of the formulas computed so far
+_hashes = weakref.WeakKeyDictionary()
+
+def ast_hash(ast):
+    """
+    Returns the hex sha256 digest identifying the structure of the formula `ast`
+    """
+    stack = [ast]
+    while stack:
+        node = stack[-1]
+        if node in _hashes:
+            stack.pop()
+            continue
+        if isinstance(node, FormulaMonadic):
+            children = [node.child]
+        else:
+            children = [node.left, node.right]
+        pending = [ c for c in children if isinstance(c, Formula) and c not in _hashes ]
+        if pending:
+            stack.extend(pending)
+            continue
+        h = hashlib.sha256(node.type.encode())
+        for c in children:
+            h.update(b'(' + (_hashes[c] if isinstance(c, Formula) else c).encode() + b')')
+        _hashes[node] = h.hexdigest()
+        stack.pop()
+    return _hashes[ast]
+
+def model_hash(n_bits, init_ast, trans_ast):
+    """
+    Returns the hex sha256 digest identifying the model with `n_bits` bits, and the given asts for
+    the initial states and the transition relation
+    """
+    return hashlib.sha256(('%d %s %s'%(n_bits, ast_hash(init_ast), ast_hash(trans_ast)))
+                                                                            .encode()).hexdigest()
+
+class ResultCache():
+    """
+    The cache of results stored in the SQLite database `results.sqlite` in the directory `path`,
+    which is created if needed.
+    """
+    def __init__(self, path = None):
+        self.path = DEFAULT_DIR if path is None else path
+        os.makedirs(self.path, exist_ok = True)
+        self.db = sqlite3.connect(os.path.join(self.path, 'results.sqlite'))
+        self.db.execute('CREATE TABLE IF NOT EXISTS results (version INTEGER, model TEXT, '
+                        'engine TEXT, prop TEXT, value TEXT, '
+                        'PRIMARY KEY (version, model, engine, prop))')
+        self.db.commit()
+
+    def _get(self, model, engine, prop):
+        row = self.db.execute('SELECT value FROM results WHERE version = ? AND model = ? AND '
+                              'engine = ? AND prop = ?',
+                              (CACHE_VERSION, model, engine, prop)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _put(self, model, engine, prop, value):
+        self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                        (CACHE_VERSION, model, engine, prop, json.dumps(value)))
+        self.db.commit()
+
+    def get_diam(self, model):
+        """
+        Returns the reoccurrence diameter stored for the model with hash `model`, or None
+        """
+        return self._get(model, 'reocc_diam', '')
+
+    def put_diam(self, model, rd):
+        """
+        Stores the reoccurrence diameter `rd` of the model with hash `model`
+        """
+        self._put(model, 'reocc_diam', '', rd)
+
+    def get(self, model, engine, prop_ast):
+        """
+        Returns the pair of the `CheckResult` and the output stored for the property `prop_ast` of
+        the model with hash `model`, checked by `engine`, or None if there is none.
+        """
+        value = self._get(model, engine, ast_hash(prop_ast))
+        if value is None:
+            return None
+        trace = value['trace']
+        if trace is not None:
+            trace = Trace([ tuple(state) for state in trace[0] ], trace[1])
+        return CheckResult(value['verdict'], trace, value['depth']), value['output']
+
+    def put(self, model, engine, prop_ast, result, output):
+        """
+        Stores the `CheckResult` `result`, and the `output` printed while checking the property
+        `prop_ast` of the model with hash `model` using `engine`
+        """
+        self._put(model, engine, ast_hash(prop_ast), {'verdict': result.verdict,
+                  'trace': result.trace, 'depth': result.depth, 'output': output})
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,306 @@
+"""
+Cone of influence reduction of a model for a property.
+
+The initial states and the transition relation are split into their top level conjuncts. A conjunct
+of the transition relation of the form `(vj = f)` or `(vj ^ f)`, where `f` only uses the `ui`, is a
+definition of bit `j`: the next value of bit `j` depends on the bits used by `f`, and the conjunct
+can be satisfied whatever the current state is. Any other conjunct is a constraint, which ties all
+the bits it uses together.
+
+The cone of influence of a property is the smallest set of bits containing those used by the
+property, the bits used by the definitions of its bits, and all the bits of the constraints and of
+the conjuncts of the initial states which use any of its bits. The reduced model only has the bits
+of the cone, numbered in their order, with the conjuncts over them. Every path of the full model is
+a path of the reduced model once the other bits are dropped, so a property which has no
+counterexamples (upto some length) in the reduced model has none in the full model.
+
+The converse fails only when the bits outside the cone cannot follow a counterexample, for example
+if their constraints leave some states without successors. So the counterexamples found on the
+reduced model are mapped back to the full model by a solver filling in the other bits (see
+`lift_trace`), and the property is checked again on the full model if this fails.
+"""
+
+from collections import namedtuple
+from z3 import *
+from parser.formulas import *
+from utils import Trace, CheckResult, print_trace, eval_states
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from varpool import pool
+
+# The maximum length of the traces of the full model that the counterexamples are mapped to
+MAX_LIFT = 1024
+
+# A reduced model. `bits[k]` is the bit of the full model that is bit `k` of the reduced model, and
+# `n_bits`, `init_ast`, `trans_ast` and `prop_ast` are the reduced model and property, over the
+# renumbered bits.
+Reduction = namedtuple('Reduction', ['bits', 'n_bits', 'init_ast', 'trans_ast', 'prop_ast'])
+
+def conjuncts(ast):
+    """
+    Returns the list of the top level conjuncts of `ast`, keeping the conjunctions made by the
+    parser for `=` whole
+    """
+    out, stack = [], [ast]
+    while stack:
+        node = stack.pop()
+        if node.type == 'AND' and _iff(node) is None:
+            stack.extend((node.right, node.left))
+        else:
+            out.append(node)
+    return out
+
+def _iff(node):
+    # The pair of the sides of `node` if it has the shape the parser produces for `(a = b)`
+    if node.type != 'AND' or node.left.type != 'OR' or node.right.type != 'OR':
+        return None
+    (na, b), (nb, a) = (node.left.left, node.left.right), (node.right.left, node.right.right)
+    if na.type == 'NOT' and nb.type == 'NOT' and na.child is a and nb.child is b:
+        return a, b
+    return None
+
+class Supports():
+    """
+    Finds the propositions used by asts sharing subformulas, walking each shared subformula only
+    once. The set of the propositions used by each node is kept as a bitmask, over the names of the
+    propositions numbered in the order they are met.
+    """
+    def __init__(self):
+        self.masks = {}
+        self.index = {}
+        self.names = []
+
+    def mask(self, ast):
+        masks = self.masks
+        stack = [ast]
+        while stack:
+            node = stack[-1]
+            if node in masks:
+                stack.pop()
+                continue
+            if node.type == 'PROP':
+                if node.child not in self.index:
+                    self.index[node.child] = len(self.names)
+                    self.names.append(node.child)
+                masks[node] = 1 << self.index[node.child]
+            elif node.type == 'LITERAL':
+                masks[node] = 0
+            elif isinstance(node, FormulaMonadic):
+                if node.child not in masks:
+                    stack.append(node.child)
+                    continue
+                masks[node] = masks[node.child]
+            else:
+                if node.left not in masks or node.right not in masks:
+                    stack.extend((node.left, node.right))
+                    continue
+                masks[node] = masks[node.left] | masks[node.right]
+            stack.pop()
+        return masks[ast]
+
+    def __call__(self, ast):
+        """
+        The set of the names of the propositions used in `ast`
+        """
+        m = self.mask(ast)
+        names, i = set(), 0
+        while m:
+            if m & 1:
+                names.add(self.names[i])
+            m >>= 1
+            i += 1
+        return names
+
+def props(ast, supports = None):
+    """
+    The set of the names of the propositions used in `ast`. The `Supports` object `supports`, if
+    given, is used to share the walks with other calls.
+    """
+    if supports is not None:
+        return supports(ast)
+    seen, names = set(), set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Formula) or node in seen:
+            continue
+        seen.add(node)
+        if node.type == 'PROP':
+            names.add(node.child)
+        elif isinstance(node, FormulaMonadic):
+            stack.append(node.child)
+        else:
+            stack.extend((node.left, node.right))
+    return names
+
+def definition(conj, supports = None):
+    """
+    If the conjunct `conj` of a transition relation is a definition `(vj = f)` or `(vj ^ f)`, where
+    `f` only uses the `ui`, returns the pair of `j` and the ast of the next value of bit `j`, that is
+    `f` or `(! f)`. Otherwise, returns None. `supports` is as for `props`.
+    """
+    neg = conj.type == 'NOT'
+    sides = _iff(conj.child if neg else conj)
+    if sides is None:
+        return None
+    for a, b in (sides, sides[::-1]):
+        if a.type == 'PROP' and a.child[0] == 'v' \
+                            and all( p[0] == 'u' for p in props(b, supports) ):
+            return int(a.child[1:]), FormulaMonadic('NOT', b) if neg else b
+    return None
+
+def _bits(names):
+    return { int(p[1:]) for p in names }
+
+def rename(ast, bits):
+    """
+    Returns `ast` with the bit `bits[k]` of each proposition renumbered to `k`
+    """
+    index = { b: k for k, b in enumerate(bits) }
+    done = {}
+    stack = [ast]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        if node.type == 'PROP':
+            done[node] = FormulaMonadic('PROP', '%s%d'%(node.child[0], index[int(node.child[1:])]))
+        elif node.type == 'LITERAL':
+            done[node] = node
+        elif isinstance(node, FormulaMonadic):
+            if node.child not in done:
+                stack.append(node.child)
+                continue
+            done[node] = FormulaMonadic(node.type, done[node.child])
+        else:
+            if node.left not in done or node.right not in done:
+                stack.extend((node.left, node.right))
+                continue
+            done[node] = FormulaDyadic(node.type, done[node.left], done[node.right])
+        stack.pop()
+    return done[ast]
+
+def conjunction(fs):
+    """
+    Returns the balanced conjunction of the list of asts `fs`, `tru` if it is empty
+    """
+    if not fs:
+        return FormulaMonadic('LITERAL', 'tru')
+    while len(fs) > 1:
+        fs = [ FormulaDyadic('AND', fs[i], fs[i+1]) if i+1 < len(fs) else fs[i]
+                                                        for i in range(0, len(fs), 2) ]
+    return fs[0]
+
+def cone(n_bits, init_ast, trans_ast, prop_ast):
+    """
+    Returns the sorted list of the bits in the cone of influence of the property `prop_ast`, for
+    the model with `n_bits` bits and the given asts for the initial states and transition relation.
+    A property using no bits gets the cone of bit 0. Raises the ValueError of `parse_to_z3` if the
+    property uses a variable other than the `vi` for `i < n_bits`, as it would not be checked on the
+    full model either.
+    """
+    supports = Supports()
+    defs, groups = {}, []
+    for c in conjuncts(trans_ast):
+        d = definition(c, supports)
+        if d is None:
+            groups.append(_bits(props(c, supports)))
+        else:
+            defs.setdefault(d[0], []).append(c)
+    for j, cs in list(defs.items()):
+        if len(cs) > 1:
+            # Several definitions of the same bit constrain the current state
+            groups += [ _bits(props(c, supports)) for c in cs ]
+            del defs[j]
+        else:
+            defs[j] = _bits( p for p in props(cs[0], supports) if p[0] == 'u' )
+    groups += [ _bits(props(c, supports)) for c in conjuncts(init_ast) ]
+
+    # The groups each bit belongs to
+    member = {}
+    for g in groups:
+        for b in g:
+            member.setdefault(b, []).append(g)
+
+    names = props(prop_ast, supports)
+    if any( p[0] != 'v' or int(p[1:]) >= n_bits for p in names ):
+        raise ValueError('ERROR: Variable in predicate must be of form vi, i < n_bits')
+    todo = list(_bits(names) or {0})
+    in_cone = set(todo)
+    while todo:
+        b = todo.pop()
+        for c in [defs.get(b, set())] + member.get(b, []):
+            for d in c - in_cone:
+                in_cone.add(d)
+                todo.append(d)
+    return sorted(in_cone)
+
+def reduce(n_bits, init_ast, trans_ast, prop_ast):
+    """
+    Returns the `Reduction` of the model with `n_bits` bits and the given asts for the initial
+    states and transition relation to the cone of influence of the property `prop_ast`
+    """
+    bits = cone(n_bits, init_ast, trans_ast, prop_ast)
+    keep, supports = set(bits), Supports()
+    trans = [ c for c in conjuncts(trans_ast) if _bits(props(c, supports)) <= keep ]
+    init = [ c for c in conjuncts(init_ast) if _bits(props(c, supports)) <= keep ]
+    return Reduction(bits, len(bits), rename(conjunction(init), bits),
+                     rename(conjunction(trans), bits), rename(prop_ast, bits))
+
+def lift_trace(red, trace, n_bits, init, trans):
+    """
+    Maps the counterexample `trace` of the reduced model `red` back to the full model with `n_bits`
+    bits, where `init` and `trans` are as in `parse_to_z3.py`, by solving for the values of the bits
+    outside the cone along a path of the full model. Returns the `Trace` of the full model, or None
+    if the trace does not extend to one.
+
+    The bits outside the cone may only come back to the same values after going around the loop of
+    a looping trace several times, so the loop is unrolled `1, 2, 4 ...` times, upto a length of
+    `MAX_LIFT` states, and the full trace may loop back to the start of any of the copies. The path
+    is over the state variables of `varpool.pool`, in a solver of its own.
+    """
+    head, loop = list(trace.states[:-1]), trace.loop
+    copies = 1
+    while True:
+        states = head + head[loop:] * (copies - 1) + [trace.states[-1]]
+        st = [ pool.state(k, n_bits) for k in range(len(states)) ]
+        s = Solver()
+        s.add(init(st[0]))
+        s.add([ trans(st[k], st[k+1]) for k in range(len(st) - 1) ])
+        s.add([ st[k][b] == bool(v) for k, state in enumerate(states)
+                                     for b, v in zip(red.bits, state) ])
+        starts = [ loop + j * (len(head) - loop) for j in range(copies) ] if loop >= 0 else []
+        if starts:
+            s.add(Or([ And([ a == b for a, b in zip(st[-1], st[l]) ]) for l in starts ]))
+        if s.check() == sat:
+            m = s.model()
+            full = eval_states(m, st)
+            loop = next(( l for l in starts if full[l] == full[-1] ), -1)
+            return Trace(full, loop)
+        copies *= 2
+        if loop < 0 or len(head) + (copies - 1) * (len(head) - loop) + 1 > MAX_LIFT:
+            return None
+
+def check_reduced(check, n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property on the reduced model for its cone of influence with the function `check`,
+    which has the signature of the `check_property` functions of the scripts, and maps the
+    counterexample found back to the full model, see `parallel.check_properties`. If the cone has
+    all the bits, or the counterexample does not extend to the full model, checks the full model.
+    """
+    red = reduce(n_bits, init.ast, trans.ast, prop_ast)
+    if red.n_bits == n_bits:
+        return check(n_bits, init, trans, prop_str, prop_ast, args)
+    print('Cone of influence of %s has %d of %d bits: %s'%(prop_str, red.n_bits, n_bits,
+                                                ' '.join([ 'v%d'%b for b in red.bits ])))
+    res = check(red.n_bits, parse_pred_z3_gen(red.init_ast, red.n_bits),
+                parse_trans_z3_gen(red.trans_ast, red.n_bits), prop_str, red.prop_ast, args)
+    if res.verdict != 'cex':
+        return res
+    trace = lift_trace(red, res.trace, n_bits, init, trans)
+    if trace is None:
+        print('The counterexample does not extend to the full model, checking the full model')
+        return check(n_bits, init, trans, prop_str, prop_ast, args)
+    print('Counterexample on the full model:')
+    print_trace(n_bits, trace)
+    return CheckResult('cex', trace, len(trace.states) - 1)
@@ -0,0 +1,716 @@
+"""
+An explicit state engine for small and medium models, using NumPy.
+
+States are packed into unsigned integers, bit `i` of a state being the value of `vi`. The asts of
+the initial states and the transition relation are evaluated directly on arrays of states, using
+the bitwise operations of NumPy, without going through z3. The successors of an array of states are
+enumerated bit by bit: after fixing the first `i` bits of the successor, the transition relation is
+evaluated in three valued logic, with the remaining bits unknown, and the partial successors for
+which it is already false are dropped. The initial states are enumerated the same way.
+
+The reachable states are found by a breadth first search from the initial states, which gives the
+graph of reachable states, with the successors of each state in compressed sparse row form. From
+this graph, we can answer:
+
+    - `check_Gp`, exactly, giving the shortest counterexample.
+    - `check_Fp`, exactly, by looking for a reachable cycle of states where `p` does not hold.
+    - `reocc_diam`, the length of the longest simple path from an initial state, by depth first
+      search. This is exponential in the worst case, but fast when the graph has few branches.
+    - `check_ltl`, whether some infinite path satisfies an ltl formula in NNF, by searching the
+      product of the graph with a tableau of the formula for a fair strongly connected component.
+      The size of the tableau is exponential in the number of temporal subformulas.
+
+These are exact, and do not depend on any threshold, so this also serves as an oracle to cross
+check the SAT based engines (see `benchmarks/crosscheck_explicit.py`). Note that only infinite paths
+are considered, so the answers for ltl properties agree with `BMC_LTL` only if every reachable state
+has a successor. `BMC_LTL` also finds counterexamples on finite paths ending in a state without a
+successor, so for ltl properties, `select` leaves models with such states to the SAT based engines.
+
+`Invariant_Liveness.py` and `reocc_diam.py` use this instead of their SAT based loops when the
+model has at most `EXPLICIT_LIMIT` bits, which can be changed by their `--explicit-limit` option,
+and when it does not have more than `MAX_EDGES` transitions, see `select`. As the answers are exact,
+a threshold given to them is then ignored. The lassos found by `check_ltl` are not the shortest
+counterexamples, while `BMC_LTL` finds shortest ones, so `BMC_LTL.py` only uses this when asked to
+with `--explicit-limit`.
+
+Command line usage:
+    python explicit.py <spec_file> [--diameter]
+
+    Checks all the properties in the given file with the explicit state engine. With `--diameter`,
+    also prints the reoccurrence diameter.
+"""
+
+import numpy as np
+from parser.formulas import *
+from utils import Trace, CheckResult, print_trace, is_temporal
+
+# The number of bits upto which the explicit engine is used by default
+EXPLICIT_LIMIT = 16
+
+# The number of states whose successors are enumerated at once
+CHUNK = 1 << 14
+
+# Upto this many bits, the successors of all the states are enumerated upfront, in large batches,
+# instead of those of each level of the breadth first search, which is slow for deep models
+FULL_BITS = 16
+
+# The maximum number of transitions enumerated, beyond which `ExplicitLimitError` is raised
+MAX_EDGES = 1 << 26
+
+class ExplicitLimitError(Exception):
+    """
+    Raised when the model has too many transitions for the explicit state engine
+    """
+    pass
+
+def _evaluate(ast, leaf, const, neg, conj, disj):
+    """
+    Evaluates the propositional formula `ast`, where `leaf` gives the value of a proposition given its
+    name, `const` that of a literal given whether it is true, and `neg`, `conj` and `disj` compute
+    the connectives. Shared subformulas are evaluated once.
+    """
+    done = {}
+    stack = [ast]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        if node.type == 'PROP':
+            done[node] = leaf(node.child)
+        elif node.type == 'LITERAL':
+            done[node] = const(node.child == 'tru')
+        elif node.type == 'NOT':
+            if node.child not in done:
+                stack.append(node.child)
+                continue
+            done[node] = neg(done[node.child])
+        elif node.type in ('AND', 'OR'):
+            if node.left not in done or node.right not in done:
+                stack.append(node.left)
+                stack.append(node.right)
+                continue
+            op = conj if node.type == 'AND' else disj
+            done[node] = op(done[node.left], done[node.right])
+        else:
+            raise ValueError('ERROR: Formula uses disallowed token %s'%node.type)
+        stack.pop()
+    return done[ast]
+
+def _bit(states, i):
+    return ((states >> np.uint64(i)) & np.uint64(1)).astype(bool)
+
+def _pred_bit(name, n_bits):
+    # The bit of the variable `name` of a predicate over `n_bits` bits, checked as in `parse_to_z3`
+    if name[0] != 'v' or int(name[1:]) >= n_bits:
+        raise ValueError('ERROR: Variable in predicate must be of form vi, i < n_bits')
+    return int(name[1:])
+
+def eval_pred(ast, states, n_bits):
+    """
+    Returns the boolean array of the values of the predicate `ast`, over the variables `vi` for
+    `i < n_bits`, on the array of packed `states`
+    """
+    def leaf(name):
+        return _bit(states, _pred_bit(name, n_bits))
+    res = _evaluate(ast, leaf, lambda b: np.full(len(states), b),
+                    np.logical_not, np.logical_and, np.logical_or)
+    return np.broadcast_to(res, states.shape)
+
+def _eval3(ast, leaf):
+    # Three valued evaluation, values are pairs of arrays (definitely true, definitely false)
+    return _evaluate(ast, leaf, lambda b: (np.bool_(b), np.bool_(not b)),
+                     lambda a: (a[1], a[0]),
+                     lambda a, b: (a[0] & b[0], a[1] | b[1]),
+                     lambda a, b: (a[0] | b[0], a[1] & b[1]))
+
+def _enumerate(ast, n_bits, src, prefix, trans = True):
+    """
+    Enumerates the states `t` over `n_bits` bits such that the formula `ast` holds, where the
+    variables `prefix`i refer to the bits of `t`, and the variables `ui` to the bits of the state of
+    the array `src` in the same row. Returns the pair of arrays of the rows of `src` and the states
+    `t`. Unless `trans`, `ast` is a predicate, and may only use the variables `prefix`i.
+    """
+    rows = np.arange(len(src))
+    part = np.zeros(len(src), dtype = np.uint64)
+    unknown = (np.bool_(False), np.bool_(False))
+    for level in range(n_bits + 1):
+        def leaf(name):
+            i = int(name[1:]) if trans else _pred_bit(name, n_bits)
+            if i >= n_bits:
+                raise ValueError('ERROR: Index of variable must not be more than n_bits')
+            if name[0] == 'u' and prefix != 'u':
+                b = _bit(src[rows], i)
+            elif name[0] == prefix:
+                if i >= level:
+                    return unknown
+                b = _bit(part, i)
+            else:
+                raise ValueError('ERROR: Variable must be `ui` or `vi`')
+            return (b, ~b)
+        t, f = _eval3(ast, leaf)
+        keep = ~np.broadcast_to(f, rows.shape) if level < n_bits else np.broadcast_to(t, rows.shape)
+        rows, part = rows[keep], part[keep]
+        if len(rows) > MAX_EDGES:
+            raise ExplicitLimitError('More than %d transitions to enumerate'%MAX_EDGES)
+        if level < n_bits:
+            rows = np.repeat(rows, 2)
+            part = np.repeat(part, 2)
+            part[1::2] |= np.uint64(1 << level)
+    return rows, part
+
+def _ranges(indptr, idx):
+    # The concatenation of the ranges indptr[i] ... indptr[i+1]-1 for i in idx, and the i of each
+    starts, ends = indptr[idx], indptr[idx + 1]
+    lens = ends - starts
+    owner = np.repeat(np.arange(len(idx)), lens)
+    offsets = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+    return np.repeat(starts, lens) + offsets, owner
+
+def _bfs(indptr, indices, sources, allowed = None):
+    """
+    Breadth first search from the nodes `sources` of the graph in compressed sparse row form, only
+    through the nodes in the mask `allowed` if it is given. Returns the arrays of the predecessor of
+    each node on a shortest path, -1 for sources and unreached nodes, and of the distance of each
+    node, -1 for unreached nodes.
+    """
+    n = len(indptr) - 1
+    parent = np.full(n, -1, dtype = np.int64)
+    depth = np.full(n, -1, dtype = np.int64)
+    frontier = sources if allowed is None else sources[allowed[sources]]
+    depth[frontier] = 0
+    d = 0
+    while len(frontier):
+        d += 1
+        pos, owner = _ranges(indptr, frontier)
+        succ = indices[pos]
+        ok = depth[succ] == -1
+        if allowed is not None:
+            ok &= allowed[succ]
+        succ, owner = succ[ok], owner[ok]
+        succ, first = np.unique(succ, return_index = True)
+        parent[succ] = frontier[owner[first]]
+        depth[succ] = d
+        frontier = succ
+    return parent, depth
+
+class ExplicitModel():
+    """
+    The graph of the reachable states of the model with `n_bits` bits, whose initial states and
+    transition relation are given by the asts `init_ast` and `trans_ast`.
+
+    `states` is the sorted array of the packed reachable states, and the other arrays are indexed
+    like it. `init` tells which states are initial, `depth` is the distance of each state from the
+    initial states, and `parent` the index of its predecessor on a shortest path, -1 for initial
+    states. The successors of the state `i` are `indices[indptr[i] : indptr[i+1]]`.
+    """
+    def __init__(self, n_bits, init_ast, trans_ast):
+        self.n_bits = n_bits
+        _, init = _enumerate(init_ast, n_bits, np.zeros(1, dtype = np.uint64), 'v',
+                             trans = False)
+        init = np.unique(init)
+
+        if n_bits <= FULL_BITS:
+            # Enumerate the successors of all the states, a state being its own index
+            n_all = 1 << n_bits
+            srcs, dsts, total = [], [], 0
+            for c in range(0, n_all, CHUNK):
+                src = np.arange(c, min(n_all, c + CHUNK), dtype = np.uint64)
+                rows, succ = _enumerate(trans_ast, n_bits, src, 'v')
+                total += len(rows)
+                if total > MAX_EDGES:
+                    raise ExplicitLimitError('More than %d transitions to enumerate'%MAX_EDGES)
+                srcs.append(src[rows].astype(np.int64))
+                dsts.append(succ.astype(np.int64))
+            src, dst = np.concatenate(srcs), np.concatenate(dsts)
+            parent, depth = _bfs(np.searchsorted(src, np.arange(n_all + 1)), dst,
+                                 init.astype(np.int64))
+            reached = np.nonzero(depth >= 0)[0]
+            self.states = reached.astype(np.uint64)
+            index = np.cumsum(depth >= 0) - 1
+            self.depth = depth[reached]
+            self.parent = np.where(parent[reached] >= 0, index[np.maximum(parent[reached], 0)], -1)
+            keep = depth[src] >= 0
+            src, dst = index[src[keep]], index[dst[keep]]
+
+        else:
+            # Breadth first search, enumerating the successors of each level
+            levels, parents, srcs, dsts = [init], [np.full(len(init), -1, np.int64)], [], []
+            seen, frontier, total = init, init, 0
+            while len(frontier):
+                new, new_parent = [], []
+                for c in range(0, len(frontier), CHUNK):
+                    src = frontier[c : c+CHUNK]
+                    rows, succ = _enumerate(trans_ast, n_bits, src, 'v')
+                    total += len(rows)
+                    if total > MAX_EDGES:
+                        raise ExplicitLimitError('More than %d transitions to enumerate'%MAX_EDGES)
+                    srcs.append(src[rows])
+                    dsts.append(succ)
+                    new.append(succ)
+                    new_parent.append(src[rows])
+                new, new_parent = np.concatenate(new), np.concatenate(new_parent)
+                new, first = np.unique(new, return_index = True)
+                fresh = ~np.isin(new, seen, assume_unique = True)
+                frontier = new[fresh]
+                levels.append(frontier)
+                parents.append(new_parent[first][fresh].astype(np.int64))
+                seen = np.union1d(seen, frontier)
+
+            order_states = np.concatenate(levels)
+            self.states = np.sort(order_states)
+            where = np.searchsorted(self.states, order_states)
+            self.depth = np.empty(len(self.states), dtype = np.int64)
+            self.depth[where] = np.repeat(np.arange(len(levels)), [ len(l) for l in levels ])
+            par = np.concatenate(parents)
+            self.parent = np.full(len(self.states), -1, dtype = np.int64)
+            has = par >= 0
+            self.parent[where[has]] = np.searchsorted(self.states, par[has].astype(np.uint64))
+            src = np.searchsorted(self.states, np.concatenate(srcs))
+            dst = np.searchsorted(self.states, np.concatenate(dsts))
+
+        n = len(self.states)
+        self.init = np.zeros(n, dtype = bool)
+        self.init[np.searchsorted(self.states, init)] = True
+        # Every state is expanded once, so there are no duplicate edges, they only need sorting
+        order = np.argsort(src, kind = 'stable')
+        self.indices = dst[order]
+        self.indptr = np.searchsorted(src[order], np.arange(n + 1))
+
+    def successors(self, i):
+        return self.indices[self.indptr[i] : self.indptr[i+1]]
+
+    def has_deadlocks(self):
+        """
+        Whether some reachable state has no successor
+        """
+        return bool(np.any(self.indptr[1:] == self.indptr[:-1]))
+
+    def bits(self, i):
+        """
+        Returns the tuple of the bits of the state with index `i`
+        """
+        s = int(self.states[i])
+        return tuple( (s >> b) & 1 for b in range(self.n_bits) )
+
+    def trace(self, path, loop = -1):
+        """
+        Returns the `Trace` of the states with the indices in `path`
+        """
+        return Trace([ self.bits(i) for i in path ], loop)
+
+    def path_to(self, i):
+        """
+        Returns the indices of the states on a shortest path from an initial state to the state `i`
+        """
+        path = [i]
+        while self.parent[path[-1]] >= 0:
+            path.append(int(self.parent[path[-1]]))
+        return path[::-1]
+
+    def check_Gp(self, p_ast):
+        """
+        Returns a shortest counterexample to `Gp` as a `Trace`, or None if `Gp` holds
+        """
+        bad = np.nonzero(~eval_pred(p_ast, self.states, self.n_bits))[0]
+        if len(bad) == 0:
+            return None
+        return self.trace(self.path_to(int(bad[np.argmin(self.depth[bad])])))
+
+    def check_Fp(self, p_ast):
+        """
+        Returns a counterexample to `Fp`, a lasso shaped `Trace` whose states do not satisfy `p`, or
+        None if `Fp` holds
+        """
+        n = len(self.states)
+        alive = ~eval_pred(p_ast, self.states, self.n_bits)
+        # Remove the states with no successors where p does not hold, until there are none, so
+        # that every state left has an infinite path through states where p does not hold
+        src_of = np.repeat(np.arange(n), np.diff(self.indptr))
+        count = np.bincount(src_of, weights = alive[self.indices], minlength = n)
+        order = np.argsort(self.indices, kind = 'stable')
+        rindptr = np.searchsorted(self.indices[order], np.arange(n + 1))
+        dead = np.nonzero(alive & (count == 0))[0]
+        while len(dead):
+            alive[dead] = False
+            pos, _ = _ranges(rindptr, dead)
+            preds = src_of[order[pos]]
+            np.subtract.at(count, preds, 1)
+            preds = np.unique(preds)
+            dead = preds[alive[preds] & (count[preds] == 0)]
+
+        # Find the nearest state left, from an initial state, through states where p does not hold
+        parent, depth = _bfs(self.indptr, self.indices, np.nonzero(self.init)[0],
+                             ~eval_pred(p_ast, self.states, self.n_bits))
+        reached = np.nonzero(alive & (depth >= 0))[0]
+        if len(reached) == 0:
+            return None
+        i = int(reached[np.argmin(depth[reached])])
+        path = [i]
+        while parent[path[-1]] >= 0:
+            path.append(int(parent[path[-1]]))
+        path = path[::-1]
+        # Follow states that are left until one repeats
+        pos = {i: len(path) - 1}
+        while True:
+            succ = self.successors(i)
+            i = int(succ[alive[succ]][0])
+            if i in pos:
+                return self.trace(path + [i], pos[i])
+            pos[i] = len(path)
+            path.append(i)
+
+    def reocc_diam(self):
+        """
+        Returns the reoccurrence diameter, the number of states in the longest simple path from an
+        initial state, computed by depth first search
+        """
+        n = len(self.states)
+        succs = [ self.successors(i).tolist() for i in range(n) ]
+        best = 1
+        on_path = np.zeros(n, dtype = bool)
+        for start in np.nonzero(self.init)[0].tolist():
+            stack = [(start, 0)]
+            on_path[start] = True
+            while stack:
+                node, k = stack[-1]
+                if k == len(succs[node]):
+                    stack.pop()
+                    on_path[node] = False
+                    continue
+                stack[-1] = (node, k + 1)
+                nxt = succs[node][k]
+                if not on_path[nxt]:
+                    on_path[nxt] = True
+                    stack.append((nxt, 0))
+                    best = max(best, len(stack))
+                    if best == n:
+                        return best
+        return best
+
+    def check_ltl(self, ast):
+        """
+        Returns a lasso shaped `Trace` satisfying the ltl formula `ast`, which must be in NNF, or None
+        if there is none.
+
+        The tableau has a state for each set of obligations, subformulas that must hold at the
+        current position, among the subformulas whose value at the next position is referred to,
+        and the formula itself. There is a transition from the pair of the model state `s` and the
+        obligations `O` to `(s', O')` if `s'` is a successor of `s`, and all of `O` hold at `s`
+        given that exactly `O'` hold at the next position. Such a transition fulfills an
+        eventuality `F g` or `f U g` if it is not in `O` or `g` holds. We look for a reachable
+        strongly connected component of the product with transitions fulfilling every
+        eventuality.
+        """
+        # Imported here, as the encoder module loads z3, which is not needed otherwise
+        from ltl_linear_encode import subformulas
+        nodes = subformulas(ast)
+        nexts = [ node for node in nodes if node.type in ('F', 'G', 'U', 'R') ]
+        nexts += [ node.child for node in nodes if node.type == 'X' and node.child not in nexts ]
+        events = [ (nexts.index(node), node.child if node.type == 'F' else node.right)
+                                                for node in nodes if node.type in ('F', 'U') ]
+        m = len(nexts)
+        n_obl = 1 << m
+        obl = np.arange(n_obl, dtype = np.int64)[None, :]
+        root = 1 << m               # The bit of the formula itself in the sets of obligations
+
+        # holds[node][s, O'], the value of node at the state s given that exactly O' hold next
+        holds = {}
+        nxt = lambda node: ((obl >> nexts.index(node)) & 1).astype(bool)
+        for node in nodes:
+            if node.type == 'PROP':
+                h = _bit(self.states, _pred_bit(node.child, self.n_bits))[:, None]
+            elif node.type == 'NEGPROP':
+                h = ~_bit(self.states, _pred_bit(node.child, self.n_bits))[:, None]
+            elif node.type == 'LITERAL':
+                h = np.full((1, 1), node.child == 'tru')
+            elif node.type == 'AND':
+                h = holds[node.left] & holds[node.right]
+            elif node.type == 'OR':
+                h = holds[node.left] | holds[node.right]
+            elif node.type == 'X':
+                h = nxt(node.child)
+            elif node.type == 'F':
+                h = holds[node.child] | nxt(node)
+            elif node.type == 'G':
+                h = holds[node.child] & nxt(node)
+            elif node.type == 'U':
+                h = holds[node.right] | (holds[node.left] & nxt(node))
+            elif node.type == 'R':
+                h = holds[node.right] & (holds[node.left] | nxt(node))
+            else:
+                raise ValueError('ERROR: Formula is not in NNF, found %s'%node.type)
+            holds[node] = h
+        shape = (len(self.states), n_obl)
+        req = [ np.broadcast_to(holds[node], shape) for node in nexts ] + \
+                                                    [ np.broadcast_to(holds[ast], shape) ]
+        fulfil = [ np.broadcast_to(holds[g], shape) for _, g in events ]
+
+        # Explore the product, whose nodes are numbered s * 2 * n_obl + O
+        ids = lambda s, o: s * (2 * n_obl) + o
+        start = ids(np.nonzero(self.init)[0], root)
+        parent = {int(v): -1 for v in start}
+        frontier = start
+        e_src, e_dst, e_acc = [], [], []
+        while len(frontier):
+            s_all, o_all = frontier // (2 * n_obl), frontier % (2 * n_obl)
+            new = []
+            for o in np.unique(o_all).tolist():
+                s = s_all[o_all == o]
+                ok = np.ones((len(s), n_obl), dtype = bool)
+                for j in range(m + 1):
+                    if o >> j & 1:
+                        ok &= req[j][s]
+                row, o2 = np.nonzero(ok)
+                acc = np.zeros(len(row), dtype = np.int64)
+                for k, (j, _) in enumerate(events):
+                    if not o >> j & 1:
+                        acc |= 1 << k
+                    else:
+                        acc |= fulfil[k][s[row], o2].astype(np.int64) << k
+                pos, owner = _ranges(self.indptr, s[row])
+                src = ids(s[row][owner], o)
+                dst = ids(self.indices[pos], o2[owner])
+                e_src.append(src)
+                e_dst.append(dst)
+                e_acc.append(acc[owner])
+                new.append(np.stack([src, dst], axis = 1))
+            new = np.concatenate(new) if new else np.zeros((0, 2), dtype = np.int64)
+            fresh = []
+            for a, b in new.tolist():
+                if b not in parent:
+                    parent[b] = a
+                    fresh.append(b)
+            frontier = np.array(fresh, dtype = np.int64)
+
+        if not e_src:
+            return None
+        e_src, e_dst, e_acc = np.concatenate(e_src), np.concatenate(e_dst), np.concatenate(e_acc)
+        keys = np.array(sorted(parent), dtype = np.int64)
+        src, dst = np.searchsorted(keys, e_src), np.searchsorted(keys, e_dst)
+        order = np.argsort(src, kind = 'stable')
+        src, dst, acc = src[order], dst[order], e_acc[order]
+        ptr = np.searchsorted(src, np.arange(len(keys) + 1))
+        adj = [ dst[ptr[i] : ptr[i+1]].tolist() for i in range(len(keys)) ]
+
+        comp = _sccs(adj)
+        internal = comp[src] == comp[dst]
+        full = (1 << len(events)) - 1
+        comp_acc = np.zeros(comp.max() + 1, dtype = np.int64)
+        np.bitwise_or.at(comp_acc, comp[src[internal]], acc[internal])
+        has_edge = np.zeros(comp.max() + 1, dtype = bool)
+        has_edge[comp[src[internal]]] = True
+        fair = has_edge & (comp_acc == full)
+        if not fair.any():
+            return None
+
+        # The path to the nearest node of a fair component, and a cycle in it fulfilling everything
+        by_key = {int(k): i for i, k in enumerate(keys)}
+        entry = min(( i for i in range(len(keys)) if fair[comp[i]] ),
+                    key = lambda i: _depth(parent, int(keys[i])))
+        prefix = []
+        v = int(keys[entry])
+        while v != -1:
+            prefix.append(by_key[v])
+            v = parent[v]
+        prefix = prefix[::-1]
+        c = comp[entry]
+        cycle, cur = [], entry
+        for k in range(len(events)):
+            if not (acc[ptr[cur] : ptr[cur+1]][comp[dst[ptr[cur] : ptr[cur+1]]] == c] >> k & 1).any():
+                targets = { int(src[e]) for e in np.nonzero(internal & (acc >> k & 1 == 1))[0] }
+                path = _path_in(adj, comp, c, cur, targets)
+                cycle += path[1:]
+                cur = path[-1]
+            e = next( e for e in range(ptr[cur], ptr[cur+1])
+                                            if comp[dst[e]] == c and acc[e] >> k & 1 )
+            cycle.append(int(dst[e]))
+            cur = int(dst[e])
+        if not cycle or cur != entry:
+            if not cycle:
+                nxt_node = next( d for d in adj[cur] if comp[d] == c )
+                cycle.append(nxt_node)
+                cur = nxt_node
+            cycle += _path_in(adj, comp, c, cur, {entry})[1:]
+        states = [ int(keys[i]) // (2 * n_obl) for i in prefix + cycle ]
+        return self.trace(states, len(prefix) - 1)
+
+def _depth(parent, v):
+    d = 0
+    while parent[v] != -1:
+        v = parent[v]
+        d += 1
+    return d
+
+def _path_in(adj, comp, c, start, targets):
+    # A shortest path from start to one of targets through the nodes of the component c
+    prev = {start: None}
+    queue = [start]
+    for v in queue:
+        if v in targets:
+            path = [v]
+            while prev[path[-1]] is not None:
+                path.append(prev[path[-1]])
+            return path[::-1]
+        for w in adj[v]:
+            if comp[w] == c and w not in prev:
+                prev[w] = v
+                queue.append(w)
+    raise AssertionError('No path in strongly connected component')
+
+def _sccs(adj):
+    """
+    Returns the array of the strongly connected components of the nodes of the graph with the
+    adjacency lists `adj`, by an iterative version of Tarjan's algorithm
+    """
+    n = len(adj)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = np.full(n, -1, dtype = np.int64)
+    stack, counter, n_comp = [], 0, 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            v, k = work[-1]
+            if k < len(adj[v]):
+                work[-1] = (v, k + 1)
+                w = adj[v][k]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = n_comp
+                    if w == v:
+                        break
+                n_comp += 1
+    return comp
+
+# The models built so far, by the asts they were built from, None for those too large
+_models = {}
+
+def get_model(n_bits, init_ast, trans_ast):
+    """
+    Returns the `ExplicitModel` for the given model, building it only the first time
+    """
+    key = (n_bits, init_ast, trans_ast)
+    if key not in _models:
+        _models[key] = ExplicitModel(n_bits, init_ast, trans_ast)
+    return _models[key]
+
+def select(n_bits, init, trans, limit, kind = None):
+    """
+    Returns the `ExplicitModel` for the model given as in `parallel.check_properties` if it has at
+    most `limit` bits, and not too many transitions for the explicit state engine. Otherwise,
+    returns None, and the SAT based engines should be used. If `kind` is 'LTL', None is also
+    returned when some reachable state has no successor, as `check_ltl` only considers infinite
+    paths, while the SAT based engines also find counterexamples ending in such states.
+    """
+    if n_bits > limit:
+        return None
+    try:
+        model = get_model(n_bits, init.ast, trans.ast)
+    except ExplicitLimitError:
+        _models[(n_bits, init.ast, trans.ast)] = None
+        return None
+    if model is None or (kind == 'LTL' and model.has_deadlocks()):
+        return None
+    return model
+
+def check(model, kind, ast):
+    """
+    Checks Gp or Fp on the `ExplicitModel` `model` if `kind` is 'G' or 'F', `ast` being p, or looks
+    for a path satisfying the ltl formula in NNF `ast` if `kind` is 'LTL'. Prints the result in the
+    same way as the SAT based engines, and returns the `CheckResult`. For 'LTL', only infinite paths
+    are searched, so when no path is found and some reachable state has no successor, the property
+    is not reported as proved, but as bounded, see `select`.
+    """
+    print('Explored %d reachable states'%len(model.states))
+    if kind == 'G':
+        trace = model.check_Gp(ast)
+        if trace is not None:
+            print("Invariant doesn't hold and there is a counterexample")
+    elif kind == 'F':
+        trace = model.check_Fp(ast)
+        if trace is not None:
+            print("Found CEX of length %d with last state being the same as %d"%(
+                                                            len(trace.states) - 1, trace.loop))
+        else:
+            print('The property holds, p is reached on every infinite path')
+            return CheckResult('proved', None, int(model.depth.max()))
+    else:
+        trace = model.check_ltl(ast)
+        if trace is not None:
+            print("FOUND looping CEX of size %d with last state equal to state at %d:"%(
+                                                            len(trace.states), trace.loop))
+        elif model.has_deadlocks():
+            print('No infinite path violates the property, but the paths ending in states without '
+                  'successors were not checked')
+            return CheckResult('bounded', None, int(model.depth.max()))
+        else:
+            print('The property holds on all infinite paths')
+            return CheckResult('proved', None, int(model.depth.max()))
+    if trace is None:
+        print('The property holds in all reachable states')
+        return CheckResult('proved', None, int(model.depth.max()))
+    print_trace(model.n_bits, trace)
+    return CheckResult('cex', trace, len(trace.states) - 1)
+
+def check_property(n_bits, init, trans, prop_str, prop_ast, args):
+    """
+    Checks the property with string `prop_str` and ast `prop_ast` with the explicit state engine,
+    see `parallel.check_properties`. Properties of the form Gp and Fp, where p has no LTL operators,
+    are checked directly, and the others by `check_ltl`.
+    """
+    from utils import ast_to_nnf
+    print('Checking property %s:'%prop_str)
+    model = get_model(n_bits, init.ast, trans.ast)
+    if prop_ast.type in ('G', 'F') and not is_temporal(prop_ast.child):
+        return check(model, prop_ast.type, prop_ast.child)
+    return check(model, 'LTL', ast_to_nnf(FormulaMonadic('NOT', prop_ast)))
+
+
+if __name__ == "__main__":
+
+    import argparse
+    from parse_to_z3 import *
+    from spec_loader import load_spec_or_exit
+
+    argp = argparse.ArgumentParser(description = 'Explicit state checking of LTL properties')
+    argp.add_argument('spec_file')
+    argp.add_argument('--diameter', action = 'store_true',
+                        help = 'also print the reoccurrence diameter')
+    args = argp.parse_args()
+
+    # Read spec file
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
+
+    # Parse system
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
+
+    if args.diameter:
+        model = get_model(n_bits, init_z3_gen.ast, trans_z3_gen.ast)
+        print('The reoccurrence diameter is %d'%model.reocc_diam())
+
+    for prop_str, prop_ast in props:
+        check_property(n_bits, init_z3_gen, trans_z3_gen, prop_str, prop_ast, args)
@@ -0,0 +1,122 @@
+"""
+Defines the incremental solvers used by the BMC loops.
+
+All the loops add some constraints permanently (the path, the encodings of the property), and some
+temporarily (the negated property at the last state, the lasso constraints), using `push` and `pop`
+around the temporary ones. In z3, this forces scope management in the solver, and lemmas learnt
+from the temporary constraints are thrown away on `pop`. The `AssumptionSolver` defined here has the
+same `push`/`pop` interface, but instead of opening a scope, `push` creates a fresh activation
+literal, and constraints added until the matching `pop` are added permanently, guarded by that
+literal. The literals of the open scopes are passed as assumptions to every `check`, and `pop`
+retires the literal by permanently asserting its negation, which the solver can then use to simplify
+the guarded constraints away.
+
+The `ScopedSolver` uses the z3 scopes directly, as the loops used to, and is kept to compare with.
+Which of the two the engines use is decided by `mode`, see `new_solver`.
+"""
+
+import time
+import z3
+
+# The kind of solver `new_solver` returns by default, either 'assumptions' or 'scopes'
+mode = 'assumptions'
+
+# Number of sat calls, and the time spent in them, over all the solvers created here
+totals = {'checks': 0, 'check_time': 0.0}
+
+def _flatten(cs):
+    # Same as what `z3.Solver.add` accepts, constraints or lists of constraints
+    out = []
+    for c in cs:
+        if isinstance(c, (list, tuple)):
+            out.extend(c)
+        else:
+            out.append(c)
+    return out
+
+class IncrementalSolver():
+    """
+    Common part of the incremental solvers, wraps a z3 solver, keeping track of the time spent in
+    the sat calls, and of the number of constraints added. Methods not defined here are those of
+    the wrapped z3 solver.
+    """
+    def __init__(self):
+        self.solver = z3.Solver()
+        self.checks = 0
+        self.check_time = 0.0
+        self.added = 0
+
+    def check(self, *assumptions):
+        """
+        Checks the constraints under the given assumption literals
+        """
+        t = time.perf_counter()
+        res = self._check(_flatten(assumptions))
+        t = time.perf_counter() - t
+        self.checks += 1
+        self.check_time += t
+        totals['checks'] += 1
+        totals['check_time'] += t
+        return res
+
+    def model(self):
+        return self.solver.model()
+
+    def __getattr__(self, name):
+        return getattr(self.solver, name)
+
+class ScopedSolver(IncrementalSolver):
+    """
+    An incremental solver using the scopes of z3 for `push` and `pop`
+    """
+    def add(self, *cs):
+        cs = _flatten(cs)
+        self.added += len(cs)
+        self.solver.add(cs)
+
+    def push(self):
+        self.solver.push()
+
+    def pop(self):
+        self.solver.pop()
+
+    def _check(self, assumptions):
+        return self.solver.check(assumptions)
+
+class AssumptionSolver(IncrementalSolver):
+    """
+    An incremental solver using activation literals for `push` and `pop`
+    """
+    def __init__(self):
+        IncrementalSolver.__init__(self)
+        self.acts = []          # The activation literals of the open scopes, innermost last
+
+    def add(self, *cs):
+        cs = _flatten(cs)
+        self.added += len(cs)
+        if not self.acts:
+            self.solver.add(cs)
+        elif cs:
+            # Guarding by the innermost literal is enough, as scopes are closed innermost first
+            self.solver.add(z3.Implies(self.acts[-1], z3.And(cs)))
+
+    def push(self):
+        self.acts.append(z3.FreshBool('act'))
+
+    def pop(self):
+        self.solver.add(z3.Not(self.acts.pop()))
+
+    def _check(self, assumptions):
+        return self.solver.check(self.acts + assumptions)
+
+def new_solver(kind = None):
+    """
+    Returns a new incremental solver of the given kind, 'assumptions' or 'scopes', defaulting to
+    `mode`.
+    """
+    kind = mode if kind is None else kind
+    if kind == 'assumptions':
+        return AssumptionSolver()
+    elif kind == 'scopes':
+        return ScopedSolver()
+    raise ValueError('Unknown kind of incremental solver %s'%kind)
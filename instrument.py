@@ -0,0 +1,149 @@
+"""
+Records where the time goes in each bound of the BMC, k-induction and reoccurrence diameter loops.
+
+When instrumentation is started (see `start`), each loop gets a `Loop` from `loop`, and calls its
+`bound` method at the start of each bound, and its `end` method when it returns. For each bound, a
+record is written to the file, as a line of JSON, with:
+
+  engine, property    the loop, and the string of the property being checked, see `prop`
+  bound               the bound, as numbered by the loop
+  time                the wall clock time spent on the bound
+  solve_time          the time spent in the sat calls, see `incremental.py`
+  encode_time         the rest of the time, spent in python building the constraints
+  checks              the number of sat calls
+  assertions          the number of constraints added to the solver
+  ...                 the sizes of the encodings given by the loop, like `mem` for `BMC_LTL`
+  conflicts, decisions, propagations, memory, max_memory
+                      the statistics of the solver after the bound, as reported by z3, which are
+                      totals since the solver was created, with the memory in megabytes
+
+When instrumentation is not started, `loop` returns a placeholder whose methods do nothing, so the
+loops cost nothing more. The records of a run are summed up for each loop by `report`.
+
+Command line usage:
+    python instrument.py <records_file>
+
+    Prints the summary of the records in the file.
+"""
+
+import sys
+import json
+import time
+from collections import OrderedDict
+
+# The file the records are written to, None when the loops are not instrumented
+_out = None
+
+# The path of that file, passed on to the worker processes, see `parallel.py`
+path = None
+
+# The string of the property being checked, set by `parallel.check_properties`
+prop = None
+
+# The statistics of z3 recorded, and the names they are recorded under
+STATISTICS = [('conflicts', 'conflicts'), ('decisions', 'decisions'),
+              ('propagations', 'propagations'), ('memory', 'memory'), ('max memory', 'max_memory')]
+
+def start(file_path, append = False):
+    """
+    Starts writing the records to the file at `file_path`, which is emptied first unless `append`
+    """
+    global _out, path
+    _out = open(file_path, 'a' if append else 'w', buffering = 1)
+    path = file_path
+
+class Loop():
+    """
+    Records the bounds of a loop named `engine`, using the solver `solver` (see `incremental.py`).
+    `sizes`, if given, is called at the end of each bound, and returns a dict of the sizes of the
+    encodings to record.
+    """
+    def __init__(self, engine, solver, sizes = None):
+        self.engine = engine
+        self.solver = solver
+        self.sizes = sizes
+        self.k = None
+
+    def _mark(self):
+        self.t = time.perf_counter()
+        self.check_time = self.solver.check_time
+        self.checks = self.solver.checks
+        self.added = self.solver.added
+
+    def _record(self):
+        t = time.perf_counter() - self.t
+        solve = self.solver.check_time - self.check_time
+        rec = OrderedDict([('engine', self.engine), ('property', prop), ('bound', self.k),
+                           ('time', t), ('solve_time', solve), ('encode_time', t - solve),
+                           ('checks', self.solver.checks - self.checks),
+                           ('assertions', self.solver.added - self.added)])
+        if self.sizes is not None:
+            rec.update(self.sizes())
+        st = self.solver.statistics()
+        values = { key: st.get_key_value(key) for key in st.keys() }
+        for key, name in STATISTICS:
+            rec[name] = values.get(key)
+        _out.write(json.dumps(rec) + '\n')
+
+    def bound(self, k):
+        """
+        Ends the current bound, if any, and starts the bound `k`
+        """
+        if self.k is not None:
+            self._record()
+        self.k = k
+        self._mark()
+
+    def end(self, result = None):
+        """
+        Ends the current bound, and returns `result`, so that the loop can return `end(result)`
+        """
+        if self.k is not None:
+            self._record()
+            self.k = None
+        return result
+
+class _NoLoop():
+    # What `loop` returns when the loops are not instrumented
+    def bound(self, k):
+        pass
+
+    def end(self, result = None):
+        return result
+
+_no_loop = _NoLoop()
+
+def loop(engine, solver, sizes = None):
+    """
+    Returns the `Loop` recording the bounds of a loop, see `Loop`, or a placeholder doing nothing
+    if instrumentation is not started
+    """
+    if _out is None:
+        return _no_loop
+    return Loop(engine, solver, sizes)
+
+def report(file_path, out = sys.stdout):
+    """
+    Prints, for each loop of each property in the records in the file at `file_path`, the number of
+    bounds, the time spent encoding and solving, the number of sat calls and constraints, and the
+    last statistics of the solver
+    """
+    loops = OrderedDict()
+    with open(file_path) as f:
+        for line in f:
+            rec = json.loads(line)
+            loops.setdefault((rec['engine'], rec['property']), []).append(rec)
+    out.write('%-20s %-30s %6s %10s %10s %6s %7s %10s %10s %9s\n'%('engine', 'property', 'bounds',
+                'encode (s)', 'solve (s)', 'solve%', 'checks', 'asserts', 'conflicts', 'mem (MB)'))
+    for (engine, prop_str), recs in loops.items():
+        encode = sum( r['encode_time'] for r in recs )
+        solve = sum( r['solve_time'] for r in recs )
+        prop_str = '-' if prop_str is None else prop_str
+        out.write('%-20s %-30s %6d %10.3f %10.3f %5.0f%% %7d %10d %10s %9s\n'%(engine,
+                    prop_str if len(prop_str) <= 30 else prop_str[:27] + '...', len(recs), encode,
+                    solve, 100 * solve / max(encode + solve, 1e-9),
+                    sum( r['checks'] for r in recs ), sum( r['assertions'] for r in recs ),
+                    recs[-1]['conflicts'], recs[-1]['max_memory']))
+
+if __name__ == "__main__":
+    report(sys.argv[1])
@@ -4,25 +4,30 @@ SMT.
 
 To make sure that the resulting formula is polynomial in the length of the path, we introduce
 one variable for each subexpression, i, k and l. If `ast` is the syntax tree for some
-expression, then `ast.vp` gives a string that is unique for that expression, and the non looping
-variable for i,k is encoded as `nl_ast.vp_k_i`, and the looping variable is encoded as
-`lp_ast.vp_k_i_l`. Then, the constraints added represent the relations between the various
+expression, then `ast.id` gives a small integer that is unique for that expression, and the non
+looping variable for i,k is encoded as `nl_<ast.id>_k_i`, and the looping variable is encoded as
+`lp_<ast.id>_k_i_l`. Then, the constraints added represent the relations between the various
 variables according to the translation rules given. There are upto k many variables of this kind
 for each subexpression. For each variable, we have exactly one constraint 'defining' that
 variable in terms of the others. For all operators, the size of this 'definition' is atmost
 linear in k. Thus, the total length of the encoding is atmost quadratic in k.
 
-We define prefixes that are unique for each unique subexpression in the formula (see
-`parser/formula.py`) so that we do not end up with seperate variables for the same
-subexpression. For each variable `var`, we have a constraint that 'defines' var, and is of the
+Formulas are hash-consed (see `parser/formulas.py`), so each unique subexpression in the
+formula, or in any other formula, is a single node with a single id, and we do not end up with
+seperate variables for the same subexpression. For each variable `var`, we have a constraint that 'defines' var, and is of the
 form `var == ....`. The functions defined here add this 'definition' for the top level
-expressoin to the solver passed, and recursively call the encoder functions to add the
-defintions for all the variables appearing in the rhs of the above constraint.
+expressoin to the solver passed, and then the defintions for all the variables appearing in the rhs
+of the above constraint, and so on. Rather than recursing, which runs into the recursion limit of
+python for long paths, they keep a stack of the variables left to define, and define them in the
+same order as the recursion would. The definitions are collected and added to the solver with a
+single call.
 
-If any of these functions are called twice with asts representing the same variable and for the
-same i, k, and l at some point during the recursion, we will end up with two copies of the exact
-same constraint. We prevent this by passing a set of all the variables already added, call it
-`def_vars`, and do not add constraints for these again.
+If a variable is reached twice, for the same subexpression and the same i, k, and l, we would end up
+with two copies of the exact same constraint. We prevent this by passing a set of all the variables already added, call it
+`def_vars`, and do not add constraints for these again. The variables are recorded in this set as
+tuples of the form `(prefix, ast.id, k, i[, l])`, which are much cheaper to build and hash than
+the variable names. The same tuples index the variables in the shared variable pool (see
+`varpool.py`), so each variable is created only once.
 
 Note that in the bmc loop, the `def_vars` is not cleared between iterations, and the constraints
 added to the solver for the translation are not removed. This will mean that the clauses derived
@@ -49,361 +54,271 @@ function.
 
 """
 
+import weakref
 from z3 import *
 from parser.formulas import *
+from varpool import pool
 
-def nonLooping(ast,i,k,solver,mem):
+# The formula `G g` whose looping translation is used in that of each formula `f R g`, kept for as
+# long as the formula lives, so that it keeps the same id, and so the same variables, for all the
+# positions and lengths
+_globally = weakref.WeakKeyDictionary()
+
+# The z3py `And`, `Or`, `Not` and `==` check all their arguments, which dominates the cost of the
+# encoding, so the definitions are built directly with the C api, as in `parse_to_z3.py`. The terms
+# built are the very same.
+def _app(mk, args):
+    ctx = main_ctx()
+    n = len(args)
+    return BoolRef(mk(ctx.ref(), n, (Ast * n)(*[ a.as_ast() for a in args ])), ctx)
+
+def _and(*args):
+    return _app(Z3_mk_and, args[0] if len(args) == 1 else args)
+
+def _or(*args):
+    return _app(Z3_mk_or, args[0] if len(args) == 1 else args)
+
+def _not(a):
+    ctx = main_ctx()
+    return BoolRef(Z3_mk_not(ctx.ref(), a.as_ast()), ctx)
+
+def _eq(a, b):
+    ctx = main_ctx()
+    if isinstance(b, bool):
+        b = BoolRef((Z3_mk_true if b else Z3_mk_false)(ctx.ref()), ctx)
+    return BoolRef(Z3_mk_eq(ctx.ref(), a.as_ast(), b.as_ast()), ctx)
+
+def _nl_definition(node, i, k):
     """
-    Given the `ast` of a formula, adds to the z3 `solver` constraints representing the partial
-    nonlooping translation of the formula starting at the position `i`, for a path of length `k`, 
-    according to the recursive relation given in class. 
+    Returns the 'definition' of the variable for the nonlooping translation of the subformula `node`
+    at the position `i`, for a path of length `k`, according to the recursive relation given in
+    class, along with the list of the pairs `(node, i)` of the variables the definition refers to,
+    which must be defined in turn.
     """
-    if 'nl_%s_%d_%d'%(ast.vp,k,i) in mem:
-        return
-    else:
-        mem.add('nl_%s_%d_%d'%(ast.vp,k,i))
-    
-    if ast.type == "PROP":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        p=Bool("s_%d_%d"%(i, int(ast.child[1:])))
-        solver.add(z==p)
-
-    elif ast.type == "NEGPROP":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        p=Bool("s_%d_%d"%(i, int(ast.child[1:])))
-        solver.add(z==Not(p))
+    z = pool.var(('nl', node.id, k, i))
 
-    elif ast.type == "LITERAL":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        solver.add(z==(True if ast.child == 'tru' else False))
-
-    elif ast.type =="OR":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        x = Bool("nl_%s_%d_%d"%(ast.left.vp,k,i))
-        y = Bool("nl_%s_%d_%d"%(ast.right.vp,k,i))
-        solver.add(z==Or(x,y))
-        nonLooping(ast.left,i,k,solver,mem)
-        nonLooping(ast.right,i,k,solver,mem)
-
-    elif ast.type =="AND":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        x = Bool("nl_%s_%d_%d"%(ast.left.vp,k,i))
-        y = Bool("nl_%s_%d_%d"%(ast.right.vp,k,i))
-        solver.add(z==And(x,y))
-        nonLooping(ast.left,i,k,solver,mem)
-        nonLooping(ast.right,i,k,solver,mem)
-
-    elif ast.type == "X":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        if(i < k):
-          x = Bool("nl_%s_%d_%d"%(ast.child.vp,k,i+1))
-          solver.add(z==x)
-        else:
-            solver.add(z==False)
-        nonLooping(ast.child,i+1,k,solver,mem)
+    if node.type == "PROP":
+        return _eq(z, pool.state_var(i, int(node.child[1:]))), ()
 
-    elif ast.type == "G":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        solver.add(z==False)
+    elif node.type == "NEGPROP":
+        return _eq(z, _not(pool.state_var(i, int(node.child[1:])))), ()
 
-    elif ast.type == "F":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        x = Bool("nl_%s_%d_%d"%(ast.child.vp,k,i))
-        z_next = Bool("nl_%s_%d_%d"%(ast.vp,k,i+1))
-        if i == k:
-          solver.add(z==x)
-        elif i < k:
-          solver.add(z==Or(x,z_next))
-          nonLooping(ast,i+1,k,solver,mem)
-        nonLooping(ast.child,i,k,solver,mem)
-    
-    elif ast.type == "U":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        g_ik = Bool("nl_%s_%d_%d"%(ast.right.vp,k,i))
-        f_ik = Bool("nl_%s_%d_%d"%(ast.left.vp,k,i))
-        z_next = Bool("nl_%s_%d_%d"%(ast.vp,k,i+1))
+    elif node.type == "LITERAL":
+        return _eq(z, node.child == 'tru'), ()
+
+    elif node.type == "OR":
+        x = pool.var(('nl', node.left.id, k, i))
+        y = pool.var(('nl', node.right.id, k, i))
+        return _eq(z, _or(x, y)), ((node.left, i), (node.right, i))
+
+    elif node.type == "AND":
+        x = pool.var(('nl', node.left.id, k, i))
+        y = pool.var(('nl', node.right.id, k, i))
+        return _eq(z, _and(x, y)), ((node.left, i), (node.right, i))
+
+    elif node.type == "X":
+        if i < k:
+            return _eq(z, pool.var(('nl', node.child.id, k, i+1))), ((node.child, i+1),)
+        return _eq(z, False), ()
+
+    elif node.type == "G":
+        return _eq(z, False), ()
+
+    elif node.type == "F":
+        x = pool.var(('nl', node.child.id, k, i))
         if i == k:
-          solver.add(z==g_ik)
-        else:
-          solver.add(z==Or(g_ik,And(f_ik,z_next)))
-          nonLooping(ast,i+1,k,solver,mem)
-          nonLooping(ast.left,i,k,solve,mem)
-        nonLooping(ast.right,i,k,solver,mem)
-        
-    elif ast.type == "R":
-        z = Bool("nl_%s_%d_%d"%(ast.vp,k,i))
-        g_ik = Bool("nl_%s_%d_%d"%(ast.right.vp,k,i))
-        f_ik = Bool("nl_%s_%d_%d"%(ast.left.vp,k,i))
-        z_next = Bool("nl_%s_%d_%d"%(ast.vp,k,i+1))
+            return _eq(z, x), ((node.child, i),)
+        return _eq(z, _or(x, pool.var(('nl', node.id, k, i+1)))), ((node, i+1), (node.child, i))
+
+    elif node.type == "U":
+        g_ik = pool.var(('nl', node.right.id, k, i))
+        f_ik = pool.var(('nl', node.left.id, k, i))
         if i == k:
-          solver.add(z==Or(g_ik,f_ik))
-        else:
-          solver.add(z==Or(f_ik,And(g_ik,z_next)))
-          nonLooping(ast,i+1,k,solver,mem)
-        nonLooping(ast.right,i,k,solver,mem)
-        nonLooping(ast.left,i,k,solve,mem)
+            return _eq(z, g_ik), ((node.right, i),)
+        return _eq(z, _or(g_ik, _and(f_ik, pool.var(('nl', node.id, k, i+1))))), \
+                    ((node, i+1), (node.left, i), (node.right, i))
 
+    elif node.type == "R":
+        g_ik = pool.var(('nl', node.right.id, k, i))
+        f_ik = pool.var(('nl', node.left.id, k, i))
+        if i == k:
+            return _eq(z, _and(g_ik, f_ik)), ((node.right, i), (node.left, i))
+        return _eq(z, _and(g_ik, _or(f_ik, pool.var(('nl', node.id, k, i+1))))), \
+                    ((node, i+1), (node.right, i), (node.left, i))
 
-def ltl_looping_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars):
+def nonLooping(ast,i,k,solver,mem):
     """
     Given the `ast` of a formula, adds to the z3 `solver` constraints representing the partial
-    looping translation of the formula starting at the position `start_pos` (i in the lecture
-    notation), for a path of length `end_pos` (k) looping at the position `loop_pos` (l), according
-    to the recursive relation given in class. 
+    nonlooping translation of the formula starting at the position `i`, for a path of length `k`,
+    according to the recursive relation given in class.
+
+    The variables are defined by a depth first walk with an explicit stack, in the same order as
+    recursive calls for each variable referred to would define them, and the definitions are added
+    to the solver together at the end.
     """
-    #def ltl_looping(start_pos, loop_pos, end_pos, ast, solver, def_vars):
+    defs = []
+    stack = [(ast, i)]
+    while stack:
+        node, j = stack.pop()
+        key = ('nl', node.id, k, j)
+        if key in mem:
+            continue
+        mem.add(key)
+        definition, deps = _nl_definition(node, j, k)
+        defs.append(definition)
+        stack.extend(reversed(deps))
+    if defs:
+        solver.add(defs)
 
-    # Sanity
-    assert isinstance(ast, Formula) and start_pos <= end_pos and loop_pos <= end_pos
-    
-    this_var = 'lp_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)
-    # Check def_vars, if variable is present, terminate.
-    if this_var in def_vars:
-        return
-    
-    # Add vp to def_vars
-    def_vars.add(this_var)
-
-    # Add constraints based on translation rules, and make recursive calls to include all relevant
-    # definitions
+
+def _lp_definition(kind, ast, i, l, k):
+    """
+    Returns the 'definition' of the variable with the prefix `kind` for the subformula `ast` at the
+    position `i` (start_pos), for a path of length `k` (end_pos) looping at the position `l`
+    (loop_pos), according to the recursive relation given in class, along with the list of the
+    triples `(kind, ast, i)` of the variables the definition refers to, which must be defined in
+    turn. `kind` is `'lp'` for the looping translation of the subformula, or one of the prefixes of
+    the helper variables for `U` and `R`, see below.
+    """
+    this_var = pool.var((kind, ast.id, k, i, l))
+    lp = lambda node, j: pool.var(('lp', node.id, k, j, l))
+
+    if kind == 'auxuik':
+        # auxuik_ast.id_k_i_l = \/j=i->k(l[g]j,k /\n=i->(j-1) l[f]n,k)
+        if i == k:
+            # Base case
+            return _eq(this_var, lp(ast.right, k)), (('lp', ast.right, k),)
+        # Recursive case
+        return _eq(this_var, _or( lp(ast.right, i),
+                                  _and( lp(ast.left, i), pool.var(('auxuik', ast.id, k, i+1, l))))), \
+                (('lp', ast.right, i), ('lp', ast.left, i), ('auxuik', ast, i+1))
+
+    elif kind == 'auxuli':
+        # auxuli_ast.id_k_i_l = \/j=l->(i-1)(l[g]j,k /\n=l->(j-1) l[f]n,k)
+        assert i>l      # Sanity check
+        if i == l+1:
+            # Base case
+            return _eq(this_var, lp(ast.right, l)), (('lp', ast.right, l),)
+        # Recursive case
+        return _eq(this_var, _or( pool.var(('auxuli', ast.id, k, i-1, l)),
+                                  _and( lp(ast.right, i-1),
+                                        _and([ lp(ast.left, n) for n in range(l, i-1) ])))), \
+                (('auxuli', ast, i-1), ('lp', ast.right, i-1)) \
+                    + tuple( ('lp', ast.left, n) for n in range(l, i-1) )
+
+    elif kind == 'auxrik':
+        # auxRik_ast.id_k_i_l = \/j=i->k (l[f]j,k /\n=i->j l[g]n,k)
+        if i == k:
+            # Base case
+            return _eq(this_var, _and( lp(ast.left, k), lp(ast.right, k))), \
+                    (('lp', ast.left, k), ('lp', ast.right, k))
+        # Recursive case
+        return _eq(this_var, _or( _and( lp(ast.left, i), lp(ast.right, i)),
+                                  _and( lp(ast.right, i), pool.var(('auxrik', ast.id, k, i+1, l))))), \
+                (('lp', ast.right, i), ('lp', ast.left, i), ('auxrik', ast, i+1))
+
+    elif kind == 'auxrli':
+        # auxRli_ast.id_k_i_l = \/j=l->(i-1) (l[f]j,k /\n=l->j l[g]n,k)
+        assert i>l      # Sanity check
+        if i == l+1:
+            # Base case
+            return _eq(this_var, _and( lp(ast.left, l), lp(ast.right, l))), \
+                    (('lp', ast.left, l), ('lp', ast.right, l))
+        # Recursive case
+        return _eq(this_var, _or( pool.var(('auxrli', ast.id, k, i-1, l)),
+                                  _and( lp(ast.left, i-1),
+                                        _and([ lp(ast.right, n) for n in range(l, i) ])))), \
+                (('auxrli', ast, i-1), ('lp', ast.left, i-1)) \
+                    + tuple( ('lp', ast.right, n) for n in range(l, i) )
+
+    # Add constraints based on translation rules
     if ast.type == 'PROP':
-        solver.add( Bool(this_var) ==
-                Bool('s_%d_%d'%(start_pos, int(ast.child[1:]))))
-    
-    
+        return _eq(this_var, pool.state_var(i, int(ast.child[1:]))), ()
+
     elif ast.type == 'NEGPROP':
-        solver.add( Bool(this_var) ==
-                Not( Bool('s_%d_%d'%(start_pos, int(ast.child[1:])))))
-    
+        return _eq(this_var, _not( pool.state_var(i, int(ast.child[1:])))), ()
 
     elif ast.type == "LITERAL":
-        solver.add( Bool(this_var) == (True if ast.child == 'tru' else False))
+        return _eq(this_var, ast.child == 'tru'), ()
 
-    
     elif ast.type == 'AND':
-        solver.add( Bool(this_var) ==
-                And( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, end_pos, start_pos, loop_pos)),
-                     Bool('lp_%s_%d_%d_%d'%(ast.right.vp, end_pos, start_pos, loop_pos))))
-        ltl_looping_encode(start_pos, loop_pos, end_pos, ast.left, solver, def_vars)
-        ltl_looping_encode(start_pos, loop_pos, end_pos, ast.right, solver, def_vars)
-    
-    
+        return _eq(this_var, _and( lp(ast.left, i), lp(ast.right, i))), \
+                (('lp', ast.left, i), ('lp', ast.right, i))
+
     elif ast.type == 'OR':
-        solver.add( Bool(this_var) ==
-                Or( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, end_pos, start_pos, loop_pos)),
-                     Bool('lp_%s_%d_%d_%d'%(ast.right.vp, end_pos, start_pos, loop_pos))))
-        ltl_looping_encode(start_pos, loop_pos, end_pos, ast.left, solver, def_vars)
-        ltl_looping_encode(start_pos, loop_pos, end_pos, ast.right, solver, def_vars)
-    
-    
+        return _eq(this_var, _or( lp(ast.left, i), lp(ast.right, i))), \
+                (('lp', ast.left, i), ('lp', ast.right, i))
+
     elif ast.type == 'X':
-        nxt_pos = start_pos+1 if start_pos<end_pos else loop_pos
-        solver.add( Bool(this_var) ==
-                Bool('lp_%s_%d_%d_%d'%(ast.child.vp, end_pos, nxt_pos, loop_pos)))
-        ltl_looping_encode(nxt_pos, loop_pos, end_pos, ast.child, solver, def_vars)
-    
-    
-    elif ast.type == 'G':
-        
-        if start_pos < loop_pos:
-            # l[Gf]i,k i<l = l[f]i,k /\ l[Gf](i+1),k
-            solver.add( Bool(this_var) ==
-                And( Bool('lp_%s_%d_%d_%d'%(ast.child.vp, end_pos, start_pos, loop_pos)),
-                     Bool('lp_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos+1, loop_pos))))
-            ltl_looping_encode(start_pos, loop_pos, end_pos, ast.child, solver, def_vars)
-            ltl_looping_encode(start_pos+1, loop_pos, end_pos, ast, solver, def_vars)
-        
-        elif start_pos == loop_pos:
+        nxt_pos = i+1 if i<k else l
+        return _eq(this_var, lp(ast.child, nxt_pos)), (('lp', ast.child, nxt_pos),)
+
+    elif ast.type in ('G', 'F'):
+        op = _and if ast.type == 'G' else _or
+        if i < l:
+            # l[Gf]i,k i<l = l[f]i,k /\ l[Gf](i+1),k, and the same with \/ for F
+            return _eq(this_var, op( lp(ast.child, i), lp(ast, i+1))), \
+                    (('lp', ast.child, i), ('lp', ast, i+1))
+        elif i == l:
             # In this case we loop-expand
-            solver.add( Bool(this_var) ==
-                And([ Bool('lp_%s_%d_%d_%d'%(ast.child.vp, end_pos, i, loop_pos))
-                                                    for i in range(loop_pos, end_pos+1) ]))
-            for i in range(loop_pos, end_pos+1):
-                ltl_looping_encode(i, loop_pos, end_pos, ast.child, solver, def_vars)
-        
+            return _eq(this_var, op([ lp(ast.child, j) for j in range(l, k+1) ])), \
+                    tuple( ('lp', ast.child, j) for j in range(l, k+1) )
         else:
             # l[Gf]i,k i>l = l[Gf]l,k
-            solver.add( Bool(this_var) ==
-                    Bool('lp_%s_%d_%d_%d'%(ast.vp, end_pos, loop_pos, loop_pos)))
-            ltl_looping_encode(loop_pos, loop_pos, end_pos, ast, solver, def_vars)
-
-    elif ast.type == 'F':
-        
-        if start_pos < loop_pos:
-            # l[Ff]i,k i<l = l[f]i,k \/ l[Ff](i+1),k
-            solver.add( Bool(this_var) ==
-                Or( Bool('lp_%s_%d_%d_%d'%(ast.child.vp, end_pos, start_pos, loop_pos)),
-                     Bool('lp_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos+1, loop_pos))))
-            ltl_looping_encode(start_pos, loop_pos, end_pos, ast.child, solver, def_vars)
-            ltl_looping_encode(start_pos+1, loop_pos, end_pos, ast, solver, def_vars)
-        
-        elif start_pos == loop_pos:
-            # In this case we loop-expand
-            solver.add( Bool(this_var) ==
-                Or([ Bool('lp_%s_%d_%d_%d'%(ast.child.vp, end_pos, i, loop_pos))
-                                                    for i in range(loop_pos, end_pos+1) ]))
-            for i in range(loop_pos, end_pos+1):
-                ltl_looping_encode(i, loop_pos, end_pos, ast.child, solver, def_vars)
-        
-        else:
-            # l[Ff]i,k i>l = l[Ff]l,k
-            solver.add( Bool(this_var) ==
-                    Bool('lp_%s_%d_%d_%d'%(ast.vp, end_pos, loop_pos, loop_pos)))
-            ltl_looping_encode(loop_pos, loop_pos, end_pos, ast, solver, def_vars)
-
+            return _eq(this_var, lp(ast, l)), (('lp', ast, l),)
 
     elif ast.type == 'U':
-        # Now, to encode U, we add two new sets of variables:
-        # auxuik_ast.vp_k_i_l = \/j=i->k(l[g]j,k /\n=i->(j-1) l[f]n,k)
-        # auxuli_ast.vp_k_i_l = \/j=l->(i-1)(l[g]j,k /\n=l->(j-1) l[f]n,k)
-        # then, we will have 
-        # l[fUg]i,k = auxuik_ast.vp_k_i_l \/ (auxuli_ast.vp_k_i_l /\n=i->k l[f]n,k) if i > l
-        # l[fUg]i,k = auxuik_ast.vp_k_i_l                                           otherwise
-        #
-        # We define helper functions to encode these variables
-        def auxuik_encode(i, l, k, ast, solver, def_vars):
-            this_vname = 'auxuik_%s_%d_%d_%d'%(ast.vp, k, i, l)
-            if this_vname in def_vars:
-                return
-            def_vars.add(this_vname)
-            
-            if i == k:
-                # Base case
-                solver.add( Bool(this_vname) ==  
-                        Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, k, l)))
-                ltl_looping_encode(k, l, k, ast.right, solver, def_vars)
-            else:
-                # Recursive case
-                solver.add( Bool(this_vname) ==
-                        Or( Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, i, l)),
-                           And( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, k, i, l)),
-                                Bool('auxuik_%s_%d_%d_%d'%(ast.vp, k, i+1, l)))))
-                ltl_looping_encode(i, l, k, ast.right, solver, def_vars)
-                ltl_looping_encode(i, l, k, ast.left, solver, def_vars)
-                auxuik_encode(i+1, l, k, ast, solver, def_vars)
-        
-        def auxuli_encode(i, l, k, ast, solver, def_vars):
-            assert i>l      # Sanity check
-
-            this_vname = 'auxuli_%s_%d_%d_%d'%(ast.vp, k, i, l)
-            if this_vname in def_vars:
-                return
-            def_vars.add(this_vname)
-            
-            if i == l+1:
-                # Base case
-                solver.add( Bool(this_vname) == 
-                        Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, l, l)))
-                ltl_looping_encode(l, l, k, ast.right, solver, def_vars)
-            else:
-                # Recursive case
-                solver.add( Bool(this_vname) ==
-                        Or( Bool('auxuli_%s_%d_%d_%d'%(ast.vp, k, i-1, l)),
-                            And( Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, i-1, l)),
-                            And([ Bool('lp_%s_%d_%d_%d'%(ast.left.vp, k, n, l))
-                                        for n in range(l, i-1) ]))))
-                auxuik_encode(i-1, l, k, ast, solver, def_vars)
-                ltl_looping_encode(i-1, l, k, ast.right, solver, def_vars)
-                for n in range(l, i-1):
-                    ltl_looping_encode(n, l, k, ast.left, solver, def_vars)
-        
-        # Now, we finally define l[fUg]i,k
-        if start_pos <= loop_pos:
-            solver.add( Bool(this_var) ==
-                    Bool('auxuik_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)))
-            auxuik_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars)
-        else:
-            solver.add( Bool(this_var) ==
-                    Or( Bool('auxuik_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)), 
-                        And( Bool('auxuli_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)),
-                        And([ Bool('lp_%s_%d_%d_%d'%(ast.left.vp, end_pos, n, loop_pos))
-                                            for n in range(start_pos, end_pos+1) ]))))
-            auxuik_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars)
-            auxuli_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars)
-            for n in range(start_pos, end_pos+1):
-                ltl_looping_encode(n, loop_pos, end_pos, ast.left, solver, def_vars)
-                           
+        # To encode U, we use the two sets of helper variables auxuik and auxuli, and then, we have
+        # l[fUg]i,k = auxuik_ast.id_k_i_l \/ (auxuli_ast.id_k_i_l /\n=i->k l[f]n,k) if i > l
+        # l[fUg]i,k = auxuik_ast.id_k_i_l                                           otherwise
+        uik = pool.var(('auxuik', ast.id, k, i, l))
+        if i <= l:
+            return _eq(this_var, uik), (('auxuik', ast, i),)
+        return _eq(this_var, _or( uik, _and( pool.var(('auxuli', ast.id, k, i, l)),
+                                             _and([ lp(ast.left, n) for n in range(i, k+1) ])))), \
+                (('auxuik', ast, i), ('auxuli', ast, i)) \
+                    + tuple( ('lp', ast.left, n) for n in range(i, k+1) )
 
     elif ast.type == 'R':
-        # Now, to encode R, we add two new sets of variables:
-        # auxRik_ast.vp_k_i_l = \/j=i->k (l[f]j,k /\n=i->j l[g]n,k)
-        # auxRli_ast.vp_k_i_l = \/j=l->(i-1) (l[f]j,k /\n=l->j l[g]n,k)
-        # then, we will have 
-        # l[fRg]i,k = auxrik_ast.vp_k_i_l \/ (auxrli_ast.vp_k_i_l /\n=i->k l[g]n,k) \/ l[Gg]i,k if i > l
-        # l[fRg]i,k = auxrik_ast.vp_k_i_l \/ l[Gg]i,k                                          otherwise
-        #
-        # We define helper functions to encode these variables
-        def auxrik_encode(i, l, k, ast, solver, def_vars):
-            this_vname = 'auxrik_%s_%d_%d_%d'%(ast.vp, k, i, l)
-            if this_vname in def_vars:
-                return
-            def_vars.add(this_vname)
-            
-            if i == k:
-                # Base case
-                solver.add( Bool(this_vname) ==
-                        And( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, k, k, l)),
-                            Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, k, l))))
-                ltl_looping_encode(k, l, k, ast.left, solver, def_vars)
-                ltl_looping_encode(k, l, k, ast.right, solver, def_vars)
-            else:
-                # Recursive case
-                solver.add( Bool(this_vname) ==
-                        Or(And( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, k, i, l)),
-                                Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, i, l))),
-                           And( Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, i, l)),
-                                Bool('auxrik_%s_%d_%d_%d'%(ast.vp, k, i+1, l)))))
-                ltl_looping_encode(i, l, k, ast.right, solver, def_vars)
-                ltl_looping_encode(i, l, k, ast.left, solver, def_vars)
-                auxrik_encode(i+1, l, k, ast, solver, def_vars)
-        
-        def auxrli_encode(i, l, k, ast, solver, def_vars):
-            assert i>l      # Sanity check
-
-            this_vname = 'auxrli_%s_%d_%d_%d'%(ast.vp, k, i, l)
-            if this_vname in def_vars:
-                return
-            def_vars.add(this_vname)
-            
-            if i == l+1:
-                # Base case
-                solver.add( Bool(this_vname) ==
-                        And( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, k, l, l)), 
-                            Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, l, l))))
-                ltl_looping_encode(l, l, k, ast.left, solver, def_vars)
-                ltl_looping_encode(l, l, k, ast.right, solver, def_vars)
-            else:
-                # Recursive case
-                solver.add( Bool(this_vname) ==
-                        Or( Bool('auxrli_%s_%d_%d_%d'%(ast.vp, k, i-1, l)),
-                            And( Bool('lp_%s_%d_%d_%d'%(ast.left.vp, k, i-1, l)),
-                            And([ Bool('lp_%s_%d_%d_%d'%(ast.right.vp, k, n, l))
-                                        for n in range(l, i) ]))))
-                auxrik_encode(i-1, l, k, ast, solver, def_vars)
-                ltl_looping_encode(i-1, l, k, ast.left, solver, def_vars)
-                for n in range(l, i):
-                    ltl_looping_encode(n, l, k, ast.right, solver, def_vars)
-        
-        # Now, we finally define l[fUg]i,k
-        gg_ast = FormulaMonadic('G', ast.right)
-        gg_var = Bool('lp_%s_%d_%d_%d'%(gg_ast.vp, end_pos, start_pos, loop_pos))
-        if start_pos <= loop_pos:
-            # l[fRg]i,k = auxrik_ast.vp_k_i_l \/ l[Gg]i,k                                          
-            solver.add( Bool(this_var) ==
-                    Or( Bool('auxrik_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)),
-                        gg_var))
-            auxrik_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars)
-            ltl_looping_encode(start_pos, loop_pos, end_pos, gg_ast, solver, def_vars)
-        else:
-            # l[fRg]i,k = auxrik_ast.vp_k_i_l \/ (auxrli_ast.vp_k_i_l /\n=i->k l[g]n,k) \/ l[Gg]i,k
-            solver.add( Bool(this_var) == 
-                    Or( Bool('auxrik_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)), gg_var, 
-                        And( Bool('auxrli_%s_%d_%d_%d'%(ast.vp, end_pos, start_pos, loop_pos)),
-                        And([ Bool('lp_%s_%d_%d_%d'%(ast.left.vp, end_pos, n, loop_pos))
-                                            for n in range(start_pos, end_pos+1) ]))))
-            auxrik_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars)
-            auxrli_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars)
-            ltl_looping_encode(start_pos, loop_pos, end_pos, gg_ast, solver, def_vars)
-            for n in range(start_pos, end_pos+1):
-                ltl_looping_encode(n, loop_pos, end_pos, ast.left, solver, def_vars)
-     
+        # To encode R, we use the two sets of helper variables auxrik and auxrli, and then, we have
+        # l[fRg]i,k = auxrik_ast.id_k_i_l \/ (auxrli_ast.id_k_i_l /\n=i->k l[g]n,k) \/ l[Gg]i,k if i > l
+        # l[fRg]i,k = auxrik_ast.id_k_i_l \/ l[Gg]i,k                                          otherwise
+        gg_ast = _globally.get(ast)
+        if gg_ast is None:
+            gg_ast = _globally[ast] = FormulaMonadic('G', ast.right)
+        rik = pool.var(('auxrik', ast.id, k, i, l))
+        if i <= l:
+            return _eq(this_var, _or( rik, lp(gg_ast, i))), (('auxrik', ast, i), ('lp', gg_ast, i))
+        return _eq(this_var, _or( rik, lp(gg_ast, i),
+                                  _and( pool.var(('auxrli', ast.id, k, i, l)),
+                                        _and([ lp(ast.right, n) for n in range(i, k+1) ])))), \
+                (('auxrik', ast, i), ('auxrli', ast, i), ('lp', gg_ast, i)) \
+                    + tuple( ('lp', ast.right, n) for n in range(i, k+1) )
+
+def ltl_looping_encode(start_pos, loop_pos, end_pos, ast, solver, def_vars):
+    """
+    Given the `ast` of a formula, adds to the z3 `solver` constraints representing the partial
+    looping translation of the formula starting at the position `start_pos` (i in the lecture
+    notation), for a path of length `end_pos` (k) looping at the position `loop_pos` (l), according
+    to the recursive relation given in class.
+
+    As in `nonLooping`, the variables are defined by a depth first walk with an explicit stack, and
+    the definitions are added to the solver together at the end.
+    """
+    # Sanity
+    assert isinstance(ast, Formula) and start_pos <= end_pos and loop_pos <= end_pos
+
+    defs = []
+    stack = [('lp', ast, start_pos)]
+    while stack:
+        kind, node, i = stack.pop()
+        key = (kind, node.id, end_pos, i, loop_pos)
+        # Check def_vars, if variable is present, it is already defined
+        if key in def_vars:
+            continue
+        def_vars.add(key)
+        definition, deps = _lp_definition(kind, node, i, loop_pos, end_pos)
+        defs.append(definition)
+        stack.extend(reversed(deps))
+    if defs:
+        solver.add(defs)
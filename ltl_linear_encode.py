@@ -0,0 +1,184 @@
+"""
+Defines an incremental encoding of the bounded semantics of LTL whose size is linear in the bound
+and the size of the formula. This is an alternative to the encoding in `ltl_encode.py`, which
+introduces separate variables for every triple of position, length and loop position.
+
+The encoding follows the linear encodings of Biere, Heljanko, Junttila, Latvala and Schuppan, in
+their incremental form. The formula, which must be in NNF, is translated over a path `s_0 ... s_k`
+whose last state `s_k` may be a copy of some earlier state `s_(l-1)`, making the path a lasso which
+continues from `s_k` to `s_l`. We have the following variables:
+
+    - `linl_i`, for `1 <= i`, the loop selectors. `linl_i` means that `s_(i-1)` is the same as the
+      state `linE`, which is made to be the same as the last state `s_k` if there is a loop.
+    - `linin_i`, true iff there is a loop that starts at or before `i`, that is, `i` is in the loop.
+    - `lin_<id>_i`, for each subformula with id `id`, the truth of the subformula at position `i`.
+      The position `k+1` stands for the successor of `s_k`.
+    - `linL_<id>`, the truth of the subformula at the position the loop goes back to.
+    - `linev_<id>_i`, for each subformula of the form `F g` or `f U g`, true iff `g` holds at some
+      position upto `i` which is in the loop.
+
+The constraints for a position `i` only refer to the positions `i` and `i+1` (and `i-1` for the
+loop and eventuality variables), and do not depend on the bound `k`. So, when going from the bound
+`k-1` to `k`, we only add the constraints for the position `k`. The constraints that depend on `k`,
+that is, those relating the position `k+1` to the loop position, or forcing it to false if there is
+no loop, and those making sure that eventualities are fulfilled in the loop, are a small 'closing'
+part that is added inside a `push`/`pop` of the incremental solver (see `incremental.py`), that is,
+under a fresh activation literal that is passed as an assumption to the sat call for the bound `k`,
+and then retired.
+"""
+
+from z3 import *
+from parser.formulas import *
+from varpool import pool
+
+# The types of subformulas whose truth at a position depends on their truth at the next position
+_TEMPORAL = ('F', 'G', 'U', 'R')
+
+def subformulas(ast):
+    """
+    Returns the list of the distinct subformulas of `ast`, with every formula after its children
+    """
+    order, seen, stack = [], set(), [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if node in seen:
+            continue
+        seen.add(node)
+        stack.append((node, True))
+        if node.type in ('PROP', 'NEGPROP', 'LITERAL'):
+            continue
+        if isinstance(node, FormulaMonadic):
+            stack.append((node.child, False))
+        else:
+            stack.extend([(node.right, False), (node.left, False)])
+    return order
+
+class LinearLTLEncoder():
+    """
+    Incrementally encodes the ltl formula `ast`, which must be in NNF, over the states of a path of
+    a model with `n_bits` bits into the incremental `solver`. After the positions `0 ... k` have been
+    added using `add_position`, adding the constraints of `close(k)` makes the solver have a model
+    iff there is a path of length `k+1` (possibly looping) satisfying the formula, assuming the
+    solver has the constraints for the path itself. The top level formula is asserted when the
+    encoder is created.
+    """
+    def __init__(self, ast, n_bits, solver):
+        self.ast = ast
+        self.n_bits = n_bits
+        self.solver = solver
+        self.nodes = subformulas(ast)
+        # The subformulas whose truth at the next position is referred to
+        self.nexts = [ node for node in self.nodes if node.type in _TEMPORAL ]
+        self.nexts += [ node.child for node in self.nodes if node.type == 'X'
+                                                            and node.child not in self.nexts ]
+        # The eventualities, the subformulas that must eventually be fulfilled in the loop
+        self.events = [ (node, node.child if node.type == 'F' else node.right)
+                                            for node in self.nodes if node.type in ('F', 'U') ]
+        self.k = -1
+        solver.add(self.var(ast, 0))
+
+    def var(self, node, i):
+        """
+        The variable for the truth of the subformula `node` at the position `i`
+        """
+        return pool.var(('lin', node.id, i))
+
+    def loop_sel(self, i):
+        """
+        The variable that is true iff `s_(i-1)` is the same as the last state, the loop goes to `i`
+        """
+        return pool.var(('linl', i))
+
+    def in_loop(self, i):
+        """
+        The variable that is true iff the position `i` is in the loop
+        """
+        return BoolVal(False) if i == 0 else pool.var(('linin', i))
+
+    def add_position(self, i):
+        """
+        Adds the constraints for the position `i`, which must be the position after the last one
+        added.
+        """
+        assert i == self.k + 1
+        self.k = i
+        x = lambda node: self.var(node, i)
+        nx = lambda node: self.var(node, i+1)
+        cons = []
+
+        # The translation of the subformulas
+        for node in self.nodes:
+            if node.type == 'PROP':
+                d = pool.state_var(i, int(node.child[1:]))
+            elif node.type == 'NEGPROP':
+                d = Not(pool.state_var(i, int(node.child[1:])))
+            elif node.type == 'LITERAL':
+                d = BoolVal(node.child == 'tru')
+            elif node.type == 'AND':
+                d = And(x(node.left), x(node.right))
+            elif node.type == 'OR':
+                d = Or(x(node.left), x(node.right))
+            elif node.type == 'X':
+                d = nx(node.child)
+            elif node.type == 'F':
+                d = Or(x(node.child), nx(node))
+            elif node.type == 'G':
+                d = And(x(node.child), nx(node))
+            elif node.type == 'U':
+                d = Or(x(node.right), And(x(node.left), nx(node)))
+            elif node.type == 'R':
+                d = And(x(node.right), Or(x(node.left), nx(node)))
+            else:
+                raise ValueError('ERROR: Formula is not in NNF, found %s'%node.type)
+            cons.append(x(node) == d)
+
+        # The loop structure, the loop can go back to `i` if `s_(i-1)` is the last state
+        if i > 0:
+            sel = self.loop_sel(i)
+            cons.append(Implies(sel, And([ pool.state_var(i-1, b) == pool.var(('linE', b))
+                                                                for b in range(self.n_bits) ])))
+            cons.append(self.in_loop(i) == Or(self.in_loop(i-1), sel))
+            cons.append(Implies(self.in_loop(i-1), Not(sel)))
+            cons.extend([ Implies(sel, pool.var(('linL', node.id)) == x(node))
+                                                                    for node in self.nexts ])
+
+        # The eventualities seen in the loop so far
+        for node, g in self.events:
+            ev = pool.var(('linev', node.id, i))
+            if i == 0:
+                cons.append(ev == False)
+            else:
+                cons.append(ev == Or(pool.var(('linev', node.id, i-1)),
+                                     And(self.in_loop(i), x(g))))
+
+        self.solver.add(cons)
+
+    def close(self, k):
+        """
+        Adds the constraints closing the path at the last position added, `k`. These only hold for
+        the bound `k`, so they should be added between a `push` and a `pop` of the solver.
+        """
+        assert k == self.k
+        loop = self.in_loop(k)
+        cons = [ Implies(loop, And([ pool.state_var(k, b) == pool.var(('linE', b))
+                                                                for b in range(self.n_bits) ])) ]
+        for node in self.nexts:
+            nxt = self.var(node, k+1)
+            cons.append(Implies(loop, nxt == pool.var(('linL', node.id))))
+            cons.append(Implies(Not(loop), Not(nxt)))
+        for node, g in self.events:
+            cons.append(Implies(And(loop, self.var(node, k)), pool.var(('linev', node.id, k))))
+        self.solver.add(cons)
+
+    def get_loop(self, model, k):
+        """
+        Given a model for the bound `k`, returns the position `l` such that the last state is the
+        same as the state at `l`, or `-1` if the path does not loop.
+        """
+        for i in range(1, k+1):
+            if is_true(model.eval(self.loop_sel(i))):
+                return i-1
+        return -1
@@ -0,0 +1,122 @@
+"""
+Simplifies LTL formulas in NNF before they are encoded, so that `BMC_LTL` encodes fewer
+subformulas, and the exponential threshold, which grows with the size of the formula, is smaller.
+
+The formula is rewritten bottom up, each distinct subformula once, by the constructors below, which
+apply these rules, and the symmetric ones, when building each node from its simplified children:
+
+  constants       p & tru = p, p & fls = fls, X fls = fls, F tru = tru, G fls = fls, f U tru = tru,
+                  tru U g = F g, fls U g = g, fls R g = G g, tru R g = g, f R fls = fls, and duals
+  idempotence     p & p = p, p | p = p, f U f = f, f R f = f
+  complements     a & !a = fls, a | !a = tru, for propositions `a`
+  absorption      p & q = p and p | q = q when p implies q syntactically, as in p & (p | q),
+                  p | (p & q), p | F p = F p, p & G p = G p
+  nesting         F F p = F p, G G p = G p, F G F p = G F p, G F G p = F G p
+  distribution    F p | F q = F (p | q), G p & G q = G (p & q), X p & X q = X (p & q),
+                  X p | X q = X (p | q)
+
+Every rule holds on the bounded semantics of the encodings (see `ltl_encode.py`) as well as on
+infinite paths, so that the counterexamples found for a formula are exactly those found for its
+simplification. In particular, `G tru`, `X tru` and `f R tru` are kept, as they are false on paths
+which do not loop, and at the last state of a path, respectively.
+
+Since formulas are shared (see `parser/formulas.py`), the rules compare subformulas by identity.
+"""
+
+from parser.formulas import *
+
+TRUE = FormulaMonadic('LITERAL', 'tru')
+FALSE = FormulaMonadic('LITERAL', 'fls')
+
+def _complements(a, b):
+    # Whether `a` and `b` are a proposition and its negation
+    return {a.type, b.type} == {'PROP', 'NEGPROP'} and a.child == b.child
+
+def _implies(a, b):
+    # Whether `a` implies `b` by their syntax alone
+    return a is b or a is FALSE or b is TRUE \
+            or (b.type == 'OR' and (b.left is a or b.right is a)) \
+            or (a.type == 'AND' and (a.left is b or a.right is b)) \
+            or (b.type == 'F' and b.child is a) \
+            or (a.type == 'G' and a.child is b)
+
+def mk_and(a, b):
+    if _implies(a, b):
+        return a
+    if _implies(b, a):
+        return b
+    if a is FALSE or b is FALSE or _complements(a, b):
+        return FALSE
+    if a.type == b.type and a.type in ('G', 'X'):
+        return _MONADIC[a.type](mk_and(a.child, b.child))
+    return FormulaDyadic('AND', a, b)
+
+def mk_or(a, b):
+    if _implies(a, b):
+        return b
+    if _implies(b, a):
+        return a
+    if a is TRUE or b is TRUE or _complements(a, b):
+        return TRUE
+    if a.type == b.type and a.type in ('F', 'X'):
+        return _MONADIC[a.type](mk_or(a.child, b.child))
+    return FormulaDyadic('OR', a, b)
+
+def mk_x(a):
+    if a is FALSE:
+        return FALSE
+    return FormulaMonadic('X', a)
+
+def mk_f(a):
+    if a.type in ('LITERAL', 'F') or (a.type == 'G' and a.child.type == 'F'):
+        return a
+    return FormulaMonadic('F', a)
+
+def mk_g(a):
+    if a is FALSE or a.type == 'G' or (a.type == 'F' and a.child.type == 'G'):
+        return a
+    return FormulaMonadic('G', a)
+
+def mk_u(a, b):
+    if b.type == 'LITERAL' or a is b or a is FALSE:
+        return b
+    if a is TRUE:
+        return mk_f(b)
+    return FormulaDyadic('U', a, b)
+
+def mk_r(a, b):
+    if b is FALSE or a is b or a is TRUE:
+        return b
+    if a is FALSE:
+        return mk_g(b)
+    return FormulaDyadic('R', a, b)
+
+_MONADIC = { 'X': mk_x, 'F': mk_f, 'G': mk_g }
+_DYADIC = { 'AND': mk_and, 'OR': mk_or, 'U': mk_u, 'R': mk_r }
+
+def simplify(ast):
+    """
+    Returns the simplification of the ast `ast` of an LTL formula in NNF, see `utils.ast_to_nnf`.
+    The formula is walked as a DAG without recursion, so deep formulas can be simplified.
+    """
+    done = {}
+    stack = [ast]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        if node.type in ('PROP', 'NEGPROP', 'LITERAL'):
+            done[node] = node
+        elif isinstance(node, FormulaMonadic):
+            if node.child not in done:
+                stack.append(node.child)
+                continue
+            done[node] = _MONADIC[node.type](done[node.child])
+        else:
+            if node.left not in done or node.right not in done:
+                stack.extend((node.right, node.left))
+                continue
+            done[node] = _DYADIC[node.type](done[node.left], done[node.right])
+        stack.pop()
+    return done[ast]
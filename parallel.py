@@ -0,0 +1,145 @@
+"""
+Defines a function to check all the properties of a specification in parallel using a pool of worker
+processes.
+
+The specification is parsed only once, in the main process. Since z3 expressions can not be sent to
+other processes, the asts of the initial states and the transition relation (see `Z3Template`) are
+sent to each worker when it starts, and compiled there once to z3 templates, which are then used for
+all the properties checked by that worker. Each property is sent as its ast. The output printed
+while checking a property is captured in the worker, and is printed by the main process along with
+the outputs for the other properties in the order of the properties in the specification, so that
+the output is the same as when checking the properties one by one. Results can also be taken from,
+and stored in, the persistent cache of `cache.py`. The workers append their records to the file of
+`instrument.py`, if the main process writes to one, and write the counterexamples they find to files
+if the main process does, see `trace_io.py`.
+"""
+
+import io
+import sys
+import contextlib
+import incremental
+import instrument
+import trace_io
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+from cache import model_hash
+from varpool import pool
+
+# The state of a worker process, set up by `_init_worker`
+_worker = {}
+
+def _init_worker(check, n_bits, init_ast, trans_ast, args, mode, unroll_mode, records, traces):
+    import unroll
+    incremental.mode = mode
+    unroll.mode = unroll_mode
+    if records is not None:
+        instrument.start(records, append = True)
+    trace_io.start(*traces)
+    _worker['check'] = check
+    _worker['n_bits'] = n_bits
+    _worker['init'] = parse_pred_z3_gen(init_ast, n_bits)
+    _worker['trans'] = parse_trans_z3_gen(trans_ast, n_bits)
+    _worker['args'] = args
+
+def _check_one(index, prop):
+    prop_str, prop_ast = prop
+    instrument.prop = prop_str
+    pool.clear_aux()
+    out = io.StringIO()
+    # Errors are sent back along with what was printed before them, and raised by the main process
+    try:
+        with contextlib.redirect_stdout(out):
+            res = _worker['check'](_worker['n_bits'], _worker['init'], _worker['trans'],
+                                    prop_str, prop_ast, _worker['args'])
+        path = trace_io.write_result(index, _worker['n_bits'], res)
+    except Exception as e:
+        return out.getvalue(), None, None, e
+    return out.getvalue(), res, path, None
+
+def _wrote(path):
+    # Says where the counterexample was written, if it was, see `trace_io.write_result`
+    if path is not None:
+        print('Wrote the counterexample to %s'%path)
+
+class _Tee(io.StringIO):
+    # Keeps what is written, and passes it on to `out`
+    def __init__(self, out):
+        io.StringIO.__init__(self)
+        self.out = out
+
+    def write(self, s):
+        self.out.write(s)
+        return io.StringIO.write(self, s)
+
+    def flush(self):
+        self.out.flush()
+
+def check_properties(check, n_bits, init, trans, props, args, jobs = 1, cache = None, engine = ''):
+    """
+    Calls `check(n_bits, init, trans, prop_str, prop_ast, args)` for each pair `(prop_str, prop_ast)`
+    in `props`, where `init` and `trans` are the z3 templates (see `parse_to_z3.py`) of the initial
+    states and transition relation of a model with `n_bits` bits, and `args` are the command line
+    arguments. `check` must be a function defined at the top level of a module, and should print
+    what it finds and return a `CheckResult`. If `jobs` is more than 1, the properties are checked
+    by a pool of that many worker processes. Returns the list of the results of `check`, in the order
+    of `props`.
+
+    If a `ResultCache` `cache` is given (see `cache.py`), the results for the properties checked
+    earlier by `engine` are taken from it, printing the stored output, and only the other
+    properties are checked, and their results stored.
+
+    If writing traces is started (see `trace_io.py`), the counterexample found for each property, or
+    taken from the cache, is written to a file. The auxiliary variables of the pool are dropped
+    before checking each property, see `varpool.py`.
+    """
+    model = None if cache is None else model_hash(n_bits, init.ast, trans.ast)
+    cached = [ None if cache is None else cache.get(model, engine, prop_ast)
+                                                                    for _, prop_ast in props ]
+    todo = [ (i, prop) for i, (prop, hit) in enumerate(zip(props, cached)) if hit is None ]
+
+    def store(prop_ast, res, out):
+        if cache is not None:
+            cache.put(model, engine, prop_ast, res, out)
+
+    results = []
+    if jobs <= 1 or len(todo) <= 1:
+        for i, ((prop_str, prop_ast), hit) in enumerate(zip(props, cached)):
+            if hit is not None:
+                sys.stdout.write(hit[1])
+                _wrote(trace_io.write_result(i, n_bits, hit[0]))
+                results.append(hit[0])
+                continue
+            out = _Tee(sys.stdout)
+            instrument.prop = prop_str
+            pool.clear_aux()
+            with contextlib.redirect_stdout(out):
+                res = check(n_bits, init, trans, prop_str, prop_ast, args)
+            store(prop_ast, res, out.getvalue())
+            _wrote(trace_io.write_result(i, n_bits, res))
+            results.append(res)
+        return results
+
+    # Only imported here, as most runs check the properties one by one, see `boundedmc.py`
+    import concurrent.futures
+    import unroll
+    with concurrent.futures.ProcessPoolExecutor(max_workers = min(jobs, len(todo)),
+                    initializer = _init_worker,
+                    initargs = (check, n_bits, init.ast, trans.ast, args, incremental.mode,
+                                unroll.mode, instrument.path, trace_io.options())) as ex:
+        futures = { i: ex.submit(_check_one, i, prop) for i, prop in todo }
+        # Results are printed in order, each as soon as all the earlier ones are done
+        for i, (prop, hit) in enumerate(zip(props, cached)):
+            if hit is not None:
+                sys.stdout.write(hit[1])
+                _wrote(trace_io.write_result(i, n_bits, hit[0]))
+                results.append(hit[0])
+                continue
+            out, res, path, err = futures[i].result()
+            sys.stdout.write(out)
+            sys.stdout.flush()
+            if err is not None:
+                ex.shutdown(cancel_futures = True)
+                raise err
+            store(prop[1], res, out)
+            _wrote(path)
+            results.append(res)
+    return results
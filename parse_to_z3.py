@@ -1,56 +1,157 @@
 """
 Defines functions to convert string representations of predicates and transitions to functions from
-lists of (pairs of lists of) z3 variables to z3 expressions. 
+lists of (pairs of lists of) z3 variables to z3 expressions.
+
+The ast is walked only once, when the predicate or transition is parsed. This builds a single z3
+template expression over canonical variables, which are the free (de Bruijn) variables `Var(i)` of
+z3. The returned function then instantiates the template for the given lists of z3 variables by a
+single bulk substitution, so calling `trans(st[k], st[k+1])` in a BMC loop does not walk the ast
+again, and costs one call into z3 irrespective of the size of the relation.
+
+The variables used, and the connectives, are checked when the predicate or transition is parsed, but
+the template is only built when it is first used, so that engines which only use the ast (see
+`explicit.py` and `bdd.py`) never load z3, see `boundedmc.py`.
 """
 
-from parser.ply_parser import parser
+from parser.fast_parser import parser
 
 from parser.formulas import *
 import z3
 
-def parse_pred_z3_gen(pred, n_bits):
+class Z3Template():
     """
-    Parses the given string or ast representation of a predicate over `n_bits` to a function generating a
-    z3 expression from a set of given z3 variables. The predicate must be a not use any LTL
-    operators, and the propositional variables used must be of the form `vi`, referring to the
-    predicate where `i`-th bit is true. All other connectives allowed in the LTL expression grammar
-    may be used. Note that `i` must not exceed `n_bits`. Also, the returned function expects a list
-    of length exactly `n_bits`, any other length will result in index errors.
+    A z3 expression `expr` over the canonical variables `Var(0) ... Var(n_args*n_bits - 1)`. Calling
+    this with `n_args` lists of z3 expressions, each of length `n_bits`, substitutes the `i`-th
+    element of the `j`-th list for `Var(j*n_bits + i)` and returns the result. `ast` is the ast the
+    template was compiled from. If `expr` is None, it is built by calling `compile` when it is first
+    used.
     """
+    def __init__(self, expr, ast, n_bits, n_args, compile = None):
+        self._expr = expr
+        self._compile = compile
+        self.ast = ast
+        self.n_bits = n_bits
+        self.n_args = n_args
+
+    @property
+    def expr(self):
+        if self._expr is None:
+            self._expr = self._compile()
+        return self._expr
 
+    def __call__(self, *z3_vars):
+        assert len(z3_vars) == self.n_args
+        subs = [ v for vs in z3_vars for v in vs ]
+        if len(subs) != self.n_args * self.n_bits:
+            raise IndexError('Expected %d lists of %d z3 variables'%(self.n_args, self.n_bits))
+        return z3.substitute_vars(self.expr, *subs)
+
+def _get_ast(pred):
     if type(pred) == str:
-        ast = parser.parse(pred)
+        return parser.parse(pred)
     elif isinstance(pred, Formula):
-        ast = pred
+        return pred
     else:
-        raise "Can only parse strings and ast to z3 expression generators"
-    
-    # Recursively generate the [z3_var] -> z3_expr function from an ast
-    def rec_get_z3_gen(node):
+        raise TypeError("Can only parse strings and ast to z3 expression generators")
+
+def compile_ast_z3(ast, get_var, kind, done = None):
+    """
+    Builds the z3 expression for the propositional formula `ast`, where `get_var` maps the name of a
+    proposition to the z3 expression standing for it. Shared subformulas are translated only once,
+    and the ast is walked iteratively so that deep formulas do not run into the recursion limit.
+    `kind` names what the formula is for error messages. The translations of the subformulas are
+    kept in the dict `done`, if given, so that they can be shared by several calls.
+    """
+    # The z3py `And`, `Or` and `Not` do a lot of argument checking that dominates the cost of
+    # building large expressions, so we directly use the C api for these.
+    ctx = z3.main_ctx()
+    ref = ctx.ref()
+    pair = z3.Ast * 2
+
+    done = {} if done is None else done
+    stack = [ast]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
         if isinstance(node, FormulaMonadic):
             if node.type == 'PROP':
-                if node.child[0] != 'v' or int(node.child[1:]) >= n_bits:
-                    raise 'ERROR: Variable in predicate must be of form vi, i < n_bits'
-                return lambda z3_vars: z3_vars[int(node.child[1:])]
+                done[node] = get_var(node.child)
             elif node.type == 'LITERAL':
-                return lambda z3_vars: z3.BoolVal(True if node.child == 'tru' else False)
+                done[node] = z3.BoolVal(True if node.child == 'tru' else False)
             elif node.type == 'NOT':
-                return lambda z3_vars: z3.Not(rec_get_z3_gen(node.child)(z3_vars))
+                if node.child not in done:
+                    stack.append(node.child)
+                    continue
+                done[node] = z3.BoolRef(z3.Z3_mk_not(ref, done[node.child].as_ast()), ctx)
             else:
-                raise 'ERROR: Predicate uses disallowed unary token'
+                raise ValueError('ERROR: %s uses disallowed unary token'%kind)
         elif isinstance(node, FormulaDyadic):
+            if node.type not in ('OR', 'AND'):
+                raise ValueError('ERROR: %s uses disallowed binary connective'%kind)
+            if node.left not in done or node.right not in done:
+                stack.append(node.left)
+                stack.append(node.right)
+                continue
+            args = pair(done[node.left].as_ast(), done[node.right].as_ast())
             if node.type == 'OR':
-                return lambda z3_vars: z3.Or(rec_get_z3_gen(node.left)(z3_vars), 
-                                                rec_get_z3_gen(node.right)(z3_vars))
-            elif node.type == 'AND':
-                return lambda z3_vars: z3.And(rec_get_z3_gen(node.left)(z3_vars), 
-                                                rec_get_z3_gen(node.right)(z3_vars))
+                done[node] = z3.BoolRef(z3.Z3_mk_or(ref, 2, args), ctx)
             else:
-                raise 'ERROR: Predicate uses disallowed binary connective'
+                done[node] = z3.BoolRef(z3.Z3_mk_and(ref, 2, args), ctx)
         else:
-            raise "ERROR: Ast node is not monadic or dyadic"
+            raise ValueError("ERROR: Ast node is not monadic or dyadic")
+        stack.pop()
+    return done[ast]
 
-    return rec_get_z3_gen(ast)
+def check_ast(ast, check_var, kind):
+    """
+    Raises the errors that `compile_ast_z3` would raise for `ast`, without building anything.
+    `check_var` is called with the name of each proposition, and raises if it is not allowed.
+    """
+    seen, stack = set(), [ast]
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        if isinstance(node, FormulaMonadic):
+            if node.type == 'PROP':
+                check_var(node.child)
+            elif node.type == 'NOT':
+                stack.append(node.child)
+            elif node.type != 'LITERAL':
+                raise ValueError('ERROR: %s uses disallowed unary token'%kind)
+        elif isinstance(node, FormulaDyadic):
+            if node.type not in ('OR', 'AND'):
+                raise ValueError('ERROR: %s uses disallowed binary connective'%kind)
+            stack.append(node.left)
+            stack.append(node.right)
+        else:
+            raise ValueError("ERROR: Ast node is not monadic or dyadic")
+
+def parse_pred_z3_gen(pred, n_bits):
+    """
+    Parses the given string or ast representation of a predicate over `n_bits` to a function generating a
+    z3 expression from a set of given z3 variables. The predicate must be a not use any LTL
+    operators, and the propositional variables used must be of the form `vi`, referring to the
+    predicate where `i`-th bit is true. All other connectives allowed in the LTL expression grammar
+    may be used. Note that `i` must not exceed `n_bits`. Also, the returned function expects a list
+    of length exactly `n_bits`, any other length will result in index errors.
+    """
+
+    ast = _get_ast(pred)
+
+    def check_var(name):
+        if name[0] != 'v' or int(name[1:]) >= n_bits:
+            raise ValueError('ERROR: Variable in predicate must be of form vi, i < n_bits')
+
+    def compile():
+        canon = [ z3.Var(i, z3.BoolSort()) for i in range(n_bits) ]
+        return compile_ast_z3(ast, lambda name: canon[int(name[1:])], 'Predicate')
+
+    check_ast(ast, check_var, 'Predicate')
+    return Z3Template(None, ast, n_bits, 1, compile)
 
 def parse_trans_z3_gen(pred, n_bits):
     """
@@ -64,43 +165,18 @@ def parse_trans_z3_gen(pred, n_bits):
     any other length will result in index errors.
     """
 
-    if type(pred) == str:
-        ast = parser.parse(pred)
-    elif isinstance(pred, Formula):
-        ast = pred
-    else:
-        raise "Can only parse strings and ast to z3 expression generators"
-    
-    
-    # Recursively generate the [z3_var] -> z3_expr function from an ast
-    def rec_get_z3_gen(node):
-        if isinstance(node, FormulaMonadic):
-            if node.type == 'PROP':
-                if int(node.child[1:]) >= n_bits:
-                    raise 'ERROR: Index of variable must not be more than n_bits'
-                if node.child[0] == 'u':
-                    return lambda z3_l, z3_r: z3_l[int(node.child[1:])]
-                elif node.child[0] == 'v':
-                    return lambda z3_l, z3_r: z3_r[int(node.child[1:])]
-                else:
-                    raise 'ERROR: Variable must be `ui` or `vi`'
-            elif node.type == 'LITERAL':
-                return lambda z3_l, z3_r: z3.BoolVal(True if node.child == 'tru' else False)
-            elif node.type == 'NOT':
-                return lambda z3_l, z3_r: z3.Not(rec_get_z3_gen(node.child)(z3_l, z3_r))
-            else:
-                raise 'ERROR: Transition uses disallowed unary token'
-        elif isinstance(node, FormulaDyadic):
-            if node.type == 'OR':
-                return lambda z3_l, z3_r: z3.Or(rec_get_z3_gen(node.left)(z3_l, z3_r), 
-                                                rec_get_z3_gen(node.right)(z3_l, z3_r))
-            elif node.type == 'AND':
-                return lambda z3_l, z3_r: z3.And(rec_get_z3_gen(node.left)(z3_l, z3_r), 
-                                                rec_get_z3_gen(node.right)(z3_l, z3_r))
-            else:
-                raise 'ERROR: Transition uses disallowed binary connective'
-        else:
-            raise 'ERROR: Ast node is not monadic or dyadic'
+    ast = _get_ast(pred)
+
+    def check_var(name):
+        if int(name[1:]) >= n_bits:
+            raise ValueError('ERROR: Index of variable must not be more than n_bits')
+        if name[0] not in ('u', 'v'):
+            raise ValueError('ERROR: Variable must be `ui` or `vi`')
 
-    return rec_get_z3_gen(ast)
+    def compile():
+        canon = [ z3.Var(i, z3.BoolSort()) for i in range(2*n_bits) ]
+        get_var = lambda name: canon[int(name[1:]) + (n_bits if name[0] == 'v' else 0)]
+        return compile_ast_z3(ast, get_var, 'Transition')
 
+    check_ast(ast, check_var, 'Transition')
+    return Z3Template(None, ast, n_bits, 2, compile)
@@ -1 +1 @@
-__all__ = ['formulas', 'ply_parser', 'ply_lexer']
+__all__ = ['formulas', 'fast_parser', 'ply_parser', 'ply_lexer']
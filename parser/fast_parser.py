@@ -0,0 +1,145 @@
+'''
+A hand written parser for the same formulas as `ply_parser.py`, building the same (hash-consed)
+`Formula` objects, see `formulas.py`.
+
+The formulas are parsed by operator precedence, with an explicit stack of operators and one of
+operands (the shunting-yard algorithm), so nothing is recursive, and formulas nested to any depth,
+like the machine generated transition relations of several megabytes, can be parsed. The tokens are
+matched by a single regular expression as they are consumed, and no token list is built.
+
+Binary operators need not be parenthesized. From the loosest binding to the tightest, they are:
+
+  =       iff                     left associative
+  ^       xor                     left associative
+  +       or                      left associative
+  .       and                     left associative
+  U, R    until, release          right associative
+
+and the prefix operators `!`, `X`, `F` and `G` bind tighter than all of them, so that
+`G ! a . b + c U d` is `((G (! a)) . b) + (c U d)`. Fully parenthesized formulas, as accepted by
+`ply_parser.py`, give the same trees as there. Errors are raised as `ParseError`s, which give the
+position in the input where the error was found.
+
+Note that, as in `ply_lexer.py`, `tru` and `fls` are matched before proposition names, so that
+`trux` is the literal `tru` followed by the proposition `x`.
+'''
+
+import re
+import gc
+from parser.formulas import *
+
+class ParseError(ValueError):
+  '''
+  A syntax error in a formula, `pos` is the offset in the input of the token it was found at
+  '''
+  def __init__(self, msg, text, pos):
+    snippet = text[max(0, pos - 20):pos + 20].replace('\n', ' ')
+    ValueError.__init__(self, 'Syntax error at position %d: %s, near %r'%(pos, msg, snippet))
+    self.pos = pos
+
+# The tokens, each in its own group, in the order the groups are numbered: literals, propositions,
+# temporal operators, other operators and parentheses, and any other character, which is an error
+_TOKEN = re.compile(r"\s*(?:(tru|fls)|([a-z][a-z0-9]*'?)|([XFGUR])|([+.!^=()])|(\S))")
+_LITERAL, _PROP, _TEMPORAL, _SYMBOL, _BAD = range(1, 6)
+
+# The binding power of the binary operators, and whether they are right associative
+_BINARY = { '=': (1, False), '^': (2, False), '+': (3, False), '.': (4, False),
+            'U': (5, True), 'R': (5, True) }
+
+# The prefix operators, which bind tighter than all binary operators, and their node types
+_UNARY = { '!': 'NOT', 'X': 'X', 'F': 'F', 'G': 'G' }
+_UNARY_POWER = 6
+
+def _binary(op, left, right):
+  # The node for a binary operator, `^` and `=` are expanded as by `ply_parser.py`
+  if op == '.':
+    return FormulaDyadic('AND', left, right)
+  if op == '+':
+    return FormulaDyadic('OR', left, right)
+  if op == 'U' or op == 'R':
+    return FormulaDyadic(op, left, right)
+  iff = FormulaDyadic('AND', FormulaDyadic('OR', FormulaMonadic('NOT', left), right),
+                             FormulaDyadic('OR', FormulaMonadic('NOT', right), left))
+  return iff if op == '=' else FormulaMonadic('NOT', iff)
+
+def _power(op):
+  return _UNARY_POWER if op in _UNARY else _BINARY[op][0]
+
+class Parser():
+  '''
+  Parses formulas given as strings, `parse` has the same interface as the parser of
+  `ply_parser.py`
+  '''
+  def parse(self, text):
+    '''
+    Returns the `Formula` for the string `text`, raises `ParseError` if it is not a formula
+    '''
+    # All the nodes built are kept alive, so the garbage collector would only scan the growing heap
+    # again and again, and is paused while parsing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+      return self._parse(text)
+    finally:
+      if enabled:
+        gc.enable()
+
+  def _parse(self, text):
+    out, ops = [], []       # The operands, and the operators and open parentheses not yet applied
+    expect_operand = True
+
+    def reduce(power, right):
+      # Applies the operators on the stack binding tighter than a binary operator of the given
+      # power, stopping at an open parenthesis
+      while ops and ops[-1] != '(':
+        p = _power(ops[-1])
+        if p < power or (p == power and right):
+          return
+        op = ops.pop()
+        if op in _UNARY:
+          out[-1] = FormulaMonadic(_UNARY[op], out[-1])
+        else:
+          r = out.pop()
+          out[-1] = _binary(op, out[-1], r)
+
+    for m in _TOKEN.finditer(text):
+      kind = m.lastindex
+      tok = m.group(kind)
+      if expect_operand:
+        if kind == _PROP:
+          out.append(FormulaMonadic('PROP', tok))
+          expect_operand = False
+        elif kind == _LITERAL:
+          out.append(FormulaMonadic('LITERAL', tok))
+          expect_operand = False
+        elif tok in _UNARY or tok == '(':
+          ops.append(tok)
+        else:
+          raise ParseError('expected a formula, found %r'%tok, text, m.start(kind))
+      elif tok == ')':
+        reduce(0, False)
+        if not ops:
+          raise ParseError("unbalanced ')'", text, m.start(kind))
+        ops.pop()
+      elif tok in _BINARY:
+        power, right = _BINARY[tok]
+        reduce(power, right)
+        ops.append(tok)
+        expect_operand = True
+      else:
+        raise ParseError("expected an operator or ')', found %r"%tok, text, m.start(kind))
+
+    if expect_operand:
+      raise ParseError('unexpected end of input', text, len(text))
+    reduce(0, False)
+    if ops:
+      raise ParseError("missing ')'", text, len(text))
+    return out[0]
+
+parser = Parser()
+
+def parse(text):
+  '''
+  Returns the `Formula` for the string `text`, see `Parser.parse`
+  '''
+  return parser.parse(text)
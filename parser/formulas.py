@@ -1,17 +1,51 @@
 # from z3 import *
+import itertools
+import weakref
 
 #Could simply use namedtuples from collections instead if making these classes by hand.
+#
+# Formulas are hash-consed: constructing a formula that is structurally equal to one that is still
+# alive returns that very same object. Thus, structurally equal subformulas, even across different
+# properties of a spec, are shared, the formula trees are really DAGs, and formulas can be compared
+# and hashed by identity. Each distinct formula also gets a small integer `id`, unique for the
+# lifetime of the process, that the encoders use to name the variables for the subformula.
 class Formula():
+  # The unique table, maps (class, type, children...) to the formula representing it. Children are
+  # either strings or formulas, which are already unique, so the keys are cheap to hash. Entries go
+  # away with the formula, but the ids are never reused.
+  _table = weakref.WeakValueDictionary()
+  _ids = itertools.count()
+
   def __str__(self):
     return str( self.to_tuple())
 
+  def __reduce__(self):
+    # Re-intern on unpickling or copying, so that sharing survives being shipped elsewhere
+    return (type(self), self._key[1:])
+
+  @classmethod
+  def _intern(cls, key):
+    # Returns the (node, is_new) pair for the given key, a new node is not yet initialized
+    node = Formula._table.get(key)
+    if node is not None:
+      return node, False
+    node = object.__new__(cls)
+    node._key = key
+    node.id = next(Formula._ids)
+    Formula._table[key] = node
+    return node, True
+
 class FormulaMonadic(Formula): #Note that even ('PROP','p') is of type monadic
+  def __new__(cls, typ, child):
+    self, new = cls._intern((cls, typ, child))
+    if new:
+      self.type = typ
+      self.child = child
+      self.size = 1 + (self.child.size if isinstance(child, Formula) else 0)
+    return self
+
   def __init__(self, typ, child):
-    self.type = typ
-    self.child = child
-    # A string that is unique for the expr represented
-    self.vp = "b_%s_%s_c"%(typ, child.vp if isinstance(child, Formula) else child)
-    self.size = 1 + (self.child.size if isinstance(child, Formula) else 0)
+    pass    # Everything is set up in __new__, as the node may be an existing one
 
   def to_tuple(self):
     if self.type in ['PROP', 'NEGPROP', 'LITERAL']: # NOTE: NEGPROP is not a token, just a special
@@ -20,15 +54,18 @@ class FormulaMonadic(Formula): #Note that even ('PROP','p') is of type monadic
     return (self.type, self.child.to_tuple())
 
 class FormulaDyadic(Formula):
+  def __new__(cls, typ, left, right):
+    self, new = cls._intern((cls, typ, left, right))
+    if new:
+      self.type = typ
+      self.left = left
+      self.right = right
+      self.size = 1 + (self.left.size  if isinstance(left,  Formula) else 0) \
+                    + (self.right.size if isinstance(right, Formula) else 0)
+    return self
+
   def __init__(self, typ, left, right):
-    self.type = typ
-    self.left = left
-    self.right = right
-    # A string that is unique for the expr represented
-    self.vp = "b_%s_%s_%s_c"%(typ, left.vp if isinstance(left, Formula) else left,
-                                    right.vp if isinstance(right, Formula) else right)
-    self.size = 1 + (self.left.size  if isinstance(left,  Formula) else 0) \
-                  + (self.right.size if isinstance(right, Formula) else 0)
+    pass    # Everything is set up in __new__, as the node may be an existing one
 
   def to_tuple(self):
     if self.type in ['PROP', 'NEGPROP', 'LITERAL']:
@@ -39,6 +76,7 @@ class FormulaDyadic(Formula):
 
 # print FormulaDyadic('U', FormulaMonadic('PROP', 'p'), FormulaMonadic('PROP', 'p'))
 # print FormulaMonadic('PROP', 'p')
+# assert FormulaMonadic('PROP', 'p') is FormulaMonadic('PROP', 'p')
 
 # print nnf(FormulaDyadic('U', FormulaMonadic('PROP', 'p'), FormulaMonadic('PROP', 'p')))
 # print nnf(FormulaMonadic('NOT', FormulaMonadic('PROP', 'p')))
@@ -75,5 +75,7 @@ def p_formula_par(p):
 def p_error(p):
   sys.exit("Syntax Error! Check your formula.")
 
-parser = yacc.yacc()
+# The tables are loaded from `parsetab.py`. If they are out of date, they are regenerated in memory,
+# and nothing is written, so that importing the parser never writes files
+parser = yacc.yacc(write_tables = False, debug = False)
 
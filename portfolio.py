@@ -0,0 +1,151 @@
+"""
+A portfolio checker for simple safety properties, that is, properties of the form Gp, where p has no
+LTL operators. Several strategies are started in parallel worker processes, and the answer of the
+first one to give a definitive answer is taken, after which the others are terminated. The
+strategies are:
+
+    - `bmc`: the BMC loop of `Invariant_Check_Gp`, with the threshold `2^n_bits`, which is an upper
+      bound on the reoccurrence diameter. This finds short counterexamples quickly, and can prove
+      the property only for small models.
+    - `kind`: k-induction, see `K_induction.py`.
+    - `diam`: computes the reoccurrence diameter, see `reocc_diam.py`, and then runs the BMC loop
+      upto it, which gives a counterexample or a proof.
+
+As z3 expressions can not be sent to other processes, the asts of the model and of `p` are sent to
+the workers, which compile them (see `parallel.py`). The output printed by each strategy is captured
+in its worker, and only that of the strategy whose answer is taken is printed.
+
+Command line usage:
+    python portfolio.py <spec_file> [--strategies STRATEGIES] [--timeout T]
+
+    Checks the properties of the form Gp in the given file. `--strategies` is a comma separated
+    list of the strategies to run, all of them by default. If `--timeout` is given, gives up on a
+    property after `T` seconds.
+"""
+
+import io
+import time
+import contextlib
+import multiprocessing
+from collections import namedtuple
+import queue
+import incremental
+from parse_to_z3 import parse_pred_z3_gen, parse_trans_z3_gen
+
+# The answer of a strategy, `verdict` is 'cex' if a counterexample `trace` was found, 'proved' if
+# the property was proved, and None if no answer was found. `output` is what the strategy printed,
+# and `time` the time in seconds it took.
+PortfolioResult = namedtuple('PortfolioResult', ['strategy', 'verdict', 'trace', 'output', 'time'])
+
+def _bmc(n_bits, init, trans, p):
+    from Invariant_Liveness import Invariant_Check_Gp
+    trace = Invariant_Check_Gp(n_bits, 2**n_bits, init, trans, p)
+    if trace is None:
+        print('The threshold 2^%d bounds the reoccurrence diameter, so the property holds'%n_bits)
+    return ('proved' if trace is None else 'cex'), trace
+
+def _kind(n_bits, init, trans, p):
+    from K_induction import K_induction
+    trace = K_induction(n_bits, init, trans, p)
+    return ('proved' if trace is None else 'cex'), trace
+
+def _diam(n_bits, init, trans, p):
+    from reocc_diam import get_reocc_diam
+    from Invariant_Liveness import Invariant_Check_Gp
+    rd = get_reocc_diam(n_bits, init, trans)
+    print('Using reoccurrence diameter %d as threshold'%rd)
+    trace = Invariant_Check_Gp(n_bits, rd, init, trans, p)
+    if trace is None:
+        print('The threshold is the reoccurrence diameter, so the property holds')
+    return ('proved' if trace is None else 'cex'), trace
+
+STRATEGIES = {'bmc': _bmc, 'kind': _kind, 'diam': _diam}
+
+def _worker(name, n_bits, init_ast, trans_ast, p_ast, mode, results):
+    incremental.mode = mode
+    t = time.perf_counter()
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            init = parse_pred_z3_gen(init_ast, n_bits)
+            trans = parse_trans_z3_gen(trans_ast, n_bits)
+            p = parse_pred_z3_gen(p_ast, n_bits)
+            verdict, trace = STRATEGIES[name](n_bits, init, trans, p)
+    except Exception as e:
+        out.write('%s failed: %r\n'%(name, e))
+        verdict, trace = None, None
+    results.put(PortfolioResult(name, verdict, trace, out.getvalue(), time.perf_counter() - t))
+
+def portfolio_Gp(n_bits, init, trans, p, strategies = ('bmc', 'kind', 'diam'), timeout = None):
+    """
+    Checks `Gp` by running the given `strategies` in parallel, where `init`, `trans` and `p` are the
+    z3 templates (see `parse_to_z3.py`) of the initial states, transition relation and `p` over
+    `n_bits` bits. Returns the `PortfolioResult` of the first strategy to give a definitive answer,
+    or None if none did within `timeout` seconds. The other strategies are terminated.
+    """
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue()
+    procs = [ ctx.Process(target = _worker, daemon = True,
+                          args = (name, n_bits, init.ast, trans.ast, p.ast, incremental.mode,
+                                  results))
+              for name in strategies ]
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        for proc in procs:
+            proc.start()
+        for _ in procs:
+            try:
+                res = results.get(timeout = None if deadline is None
+                                                 else max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                return None
+            if res.verdict is not None:
+                return res
+        return None
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs:
+            proc.join()
+
+
+if __name__ == "__main__":
+
+    import argparse
+    from spec_loader import load_spec_or_exit
+    from parser.formulas import *
+    from utils import is_temporal
+
+    argp = argparse.ArgumentParser(description = 'Portfolio checking of properties of the form Gp')
+    argp.add_argument('spec_file')
+    argp.add_argument('--strategies', default = ','.join(STRATEGIES),
+                        help = 'comma separated strategies to run, of %s'%', '.join(STRATEGIES))
+    argp.add_argument('--timeout', type = float,
+                        help = 'seconds after which to give up on a property')
+    args = argp.parse_args()
+    strategies = args.strategies.split(',')
+    for name in strategies:
+        if name not in STRATEGIES:
+            argp.error('unknown strategy %s'%name)
+
+    # Read spec file
+    n_bits, init_ast, trans_ast, props = load_spec_or_exit(args.spec_file)
+
+    # Parse system
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
+
+    # Parse and check properties
+    for prop_str, prop_ast in props:
+        print('Checking property %s:'%prop_str)
+        if prop_ast.type != 'G' or is_temporal(prop_ast.child):
+            print('Property is not of Gp form, ignoring')
+            continue
+        res = portfolio_Gp(n_bits, init_z3_gen, trans_z3_gen,
+                            parse_pred_z3_gen(prop_ast.child, n_bits), strategies, args.timeout)
+        if res is None:
+            print('No strategy could check the property')
+        else:
+            print('Strategy %s answered first, in %.3f s:'%(res.strategy, res.time))
+            print(res.output, end = '')
@@ -2,55 +2,120 @@
 Defines functions to find the reoccurrence diameter of a given Kripke model.
 
 Command line usage:
-    python reocc_diam.py <specification_file>
+    python reocc_diam.py <specification_file> [--eager] [--explicit-limit N]
+                                              [--unroll {functional,relational}] [--stats FILE]
+
+    By default, the constraints making the states of the path distinct are added lazily, see
+    `get_reocc_diam`. With `--eager`, all of them are added upfront. If the model has at most `N`
+    bits, 16 by default, and is small enough, the diameter is found by the explicit state engine of
+    `explicit.py` instead. `--explicit-limit 0` always uses SAT. `--unroll` selects how the
+    transition relation is unrolled, see `unroll.py`. With `--stats FILE`, the time spent encoding and solving, and
+    the statistics of the solver, for each bound are written to `FILE`, and summed up at the end,
+    see `instrument.py`.
 """
 
 from z3 import *
+from varpool import pool
+from utils import distinct_states, repeated_states
+from unroll import Unroller
+from incremental import new_solver
+import instrument
 
-def get_reocc_diam(n_bits, init, trans):
+def get_reocc_diam(n_bits, init, trans, lazy = True):
     """
     Given a Kripke model with `n_bits`, where `init` takes a list of z3 variables and returns a z3
     expression representing the initial states, and `trans` takes two lists of z3 variables and returns a
     z3 expression representing the transition relation, this function returns the reoccurrence
     diamter of the kripke model
+
+    If `lazy` is False, each new state of the path is asserted to be distinct from all the earlier
+    ones, which takes a number of constraints quadratic in the length of the path. If it is True, the
+    path is first searched for without these, and if some state repeats in the path found, only the
+    constraints that states which are the same in it differ are added, and the search is repeated,
+    until either there is no path, or a path without repeated states is found.
+
+    The path is unrolled as given by `unroll.mode`, see `Unroller`.
     """
 
-    s = Solver()
+    s = new_solver('scopes')
+    it = instrument.loop('get_reocc_diam', s)
+    unroller = Unroller(n_bits, trans)
 
-    # Introduce variables
-    st = [[Bool('s_0_%d'%i) for i in range(n_bits)], [Bool('s_1_%d'%i) for i in range(n_bits)]]
+    # Introduce the states
+    st = [pool.state(0, n_bits)]
+    nxt, step = unroller.step(st[0], 1)
+    st.append(nxt)
 
     # Assert non repeating path of length 2
-    s.add(And(init(st[0]), trans(st[0], st[1]), Or([ Xor(a, b) for a, b in zip(st[0], st[1]) ])))
+    s.add(And(init(st[0]), step, distinct_states(st[0], st[1])))
 
     rd = 1
+    it.bound(rd)
     while True:
         # Check if there is a non repeating path of length of rd+1
         if s.check() == unsat:
-            return rd
+            return it.end(rd)
+        if lazy:
+            # Make the states repeated in the path found distinct, until there are none
+            pairs = repeated_states(s.model(), st)
+            if pairs:
+                s.add([ distinct_states(st[i], st[j]) for i, j in pairs ])
+                continue
 
         # Set up check for rd++
         rd += 1
-        # Make new state
-        st.append([Bool('s_%d_%d'%(rd,i)) for i in range(n_bits)])
-        # New state belongs to a length rd path
-        s.add(trans(st[rd-1], st[rd]))
+        it.bound(rd)
+        # Make new state, which belongs to a length rd path
+        nxt, step = unroller.step(st[rd-1], rd)
+        st.append(nxt)
+        s.add(step)
         # New state is unique
-        s.add(And([ Or([ Xor(a, b) for a, b in zip(sti, st[rd]) ]) for sti in st[:-1] ]))
-        
+        if not lazy:
+            s.add(And([ distinct_states(sti, st[rd]) for sti in st[:-1] ]))
+
 if __name__ == "__main__":
-    import sys
+    import argparse
     from parse_to_z3 import *
-    from parser.ply_parser import *
+    from spec_loader import load_spec_or_exit
     from parser.formulas import *
+    import unroll
+    try:
+        import explicit
+    except ImportError:
+        # NumPy is not installed, so only the SAT based computation is available
+        explicit = None
+
+    argp = argparse.ArgumentParser(description = 'Computes the reoccurrence diameter of a model')
+    argp.add_argument('spec_file')
+    argp.add_argument('--eager', action = 'store_true',
+                        help = 'add all the constraints making states distinct upfront')
+    argp.add_argument('--explicit-limit', type = int, metavar = 'N',
+                        default = 0 if explicit is None else explicit.EXPLICIT_LIMIT,
+                        help = 'use the explicit state engine for models with at most N bits')
+    argp.add_argument('--unroll', choices = ['functional', 'relational'], default = 'functional',
+                        help = 'build the next state bits defined as functions of the current state '
+                               'by substitution, or always use fresh variables, see unroll.py')
+    argp.add_argument('--stats', metavar = 'FILE',
+                        help = 'write a record of the time spent encoding and solving for each '
+                               'bound to FILE, as JSON lines, see instrument.py')
+    args = argp.parse_args()
+    unroll.mode = args.unroll
+    if args.stats:
+        instrument.start(args.stats)
 
        # Read spec file
-    n_bits, init_str, trans_str, prop_strs = 0, '', '', []
-    with open(sys.argv[1]) as f:
-        n_bits, init_str, trans_str, prop_strs = eval(f.read())
-    
+    n_bits, init_ast, trans_ast, _ = load_spec_or_exit(args.spec_file)
+
     # Parse system
-    init_z3_gen = parse_pred_z3_gen(init_str, n_bits)
-    trans_z3_gen = parse_trans_z3_gen(trans_str, n_bits)
+    init_z3_gen = parse_pred_z3_gen(init_ast, n_bits)
+    trans_z3_gen = parse_trans_z3_gen(trans_ast, n_bits)
 
-    print("The reoccurrence diameter is %d"%get_reocc_diam(n_bits, init_z3_gen, trans_z3_gen))
+    model = None if explicit is None else explicit.select(n_bits, init_z3_gen, trans_z3_gen,
+                                                          args.explicit_limit)
+    if model is not None:
+        rd = model.reocc_diam()
+    else:
+        rd = get_reocc_diam(n_bits, init_z3_gen, trans_z3_gen, not args.eager)
+    print("The reoccurrence diameter is %d"%rd)
+    if args.stats:
+        instrument.report(args.stats)
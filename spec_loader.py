@@ -0,0 +1,229 @@
+"""
+Loads specification files, either in the original format, a python 4-tuple
+
+    (n_bits, initial, transition, [property1, property2, ... ])
+
+or in a sectioned format, which is read line by line:
+
+    # Comments start with '#', and run to the end of the line
+    bits = 2
+
+    [init]
+    (!v0)
+    (!v1)
+
+    [trans]
+    (v0 = (! u0))
+    (v1 = (u1 ^ u0))
+
+    [properties]
+    G ((!v0) + (!v1))
+    G tru
+
+In the sectioned format, the `[init]` and `[trans]` sections are conjunctions, each line of which is
+a conjunct. A formula which does not fit on a line goes on until its parentheses are balanced. Each
+conjunct is parsed as soon as it has been read (see `parser/fast_parser.py`), and the conjuncts are
+joined in a balanced tree as they come, so a specification is loaded in memory proportional to the
+size of its formulas, whatever the length of the file, and without ever holding the whole text of
+the transition relation. Each line of `[properties]` is a property, in the same way. An empty or
+missing `[init]` or `[trans]` section is `tru`.
+
+A file in the original format is recognized by its first character being `(`. It is read as a whole,
+with `ast.literal_eval` rather than `eval`, so that loading a specification cannot run code. AIGER
+files are recognized by their header, and read by `aiger.py`.
+
+Command line usage:
+    python spec_loader.py <spec_file>
+
+    Loads the specification, and prints the number of bits, the sizes of the initial states and of
+    the transition relation, and the properties.
+"""
+
+import re
+import sys
+import gc
+import ast
+from collections import namedtuple
+from parser.formulas import *
+from parser.fast_parser import parser, ParseError
+
+# A loaded specification, `init` and `trans` are the asts of the initial states and the transition
+# relation, and `props` is the list of the pairs of the string and the ast of each property
+Spec = namedtuple('Spec', ['n_bits', 'init', 'trans', 'props'])
+
+# The sections of the sectioned format
+SECTIONS = ('init', 'trans', 'properties')
+
+# A setting, which can not be confused with a formula, as the propositions are all `ui` or `vi`
+_SETTING = re.compile(r'bits\s*=')
+
+class SpecError(ValueError):
+    """
+    An error in a specification file, giving the file and the line where it was found
+    """
+    def __init__(self, path, line, msg):
+        ValueError.__init__(self, '%s:%d: %s'%(path, line, msg))
+        self.path = path
+        self.line = line
+
+class Conjunction():
+    """
+    Builds the balanced conjunction of the asts added to it one by one, keeping only the roots of
+    the complete subtrees built so far, as in a binary counter
+    """
+    def __init__(self):
+        self.stack = []     # Pairs of the height and the root of complete subtrees
+
+    def add(self, f):
+        height = 0
+        while self.stack and self.stack[-1][0] == height:
+            f = FormulaDyadic('AND', self.stack.pop()[1], f)
+            height += 1
+        self.stack.append((height, f))
+
+    def result(self):
+        """
+        Returns the conjunction of the asts added, `tru` if there are none
+        """
+        if not self.stack:
+            return FormulaMonadic('LITERAL', 'tru')
+        f = self.stack[-1][1]
+        for _, g in reversed(self.stack[:-1]):
+            f = FormulaDyadic('AND', g, f)
+        return f
+
+def _formulas(lines, path):
+    # Yields the triples of the line number at which each formula starts, its text, and the section
+    # it is in, or the pairs `(line number, None, header)` for the other lines that are not blank
+    chunk, depth, start = [], 0, 0
+    for lineno, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if not chunk:
+            if line.startswith('[') or _SETTING.match(line):
+                yield lineno, None, line
+                continue
+            start = lineno
+        chunk.append(line)
+        depth += line.count('(') - line.count(')')
+        if depth < 0:
+            raise SpecError(path, lineno, "unbalanced ')'")
+        if depth == 0:
+            yield start, ' '.join(chunk), None
+            chunk = []
+    if chunk:
+        raise SpecError(path, start, "missing ')' in the formula starting here")
+
+def _parse(text, path, line):
+    try:
+        return parser.parse(text)
+    except ParseError as e:
+        raise SpecError(path, line, str(e))
+
+def load_sectioned(lines, path = '<spec>'):
+    """
+    Loads a specification in the sectioned format from the iterable of its `lines`, see above
+    """
+    # As when parsing a single formula, the garbage collector is paused, as it would otherwise scan
+    # all the formulas loaded so far again and again
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _load_sectioned(lines, path)
+    finally:
+        if enabled:
+            gc.enable()
+
+def _load_sectioned(lines, path):
+    n_bits, section, seen = None, None, set()
+    init, trans, props = Conjunction(), Conjunction(), []
+    for lineno, text, header in _formulas(lines, path):
+        if text is None:
+            if header.startswith('['):
+                section = header[1:-1].strip() if header.endswith(']') else None
+                if section not in SECTIONS:
+                    raise SpecError(path, lineno, 'unknown section %s'%header)
+                if section in seen:
+                    raise SpecError(path, lineno, 'section [%s] given twice'%section)
+                seen.add(section)
+                continue
+            value = header.split('=', 1)[1].strip()
+            if section is not None:
+                raise SpecError(path, lineno, 'bits must be given before the sections')
+            if not value.isdigit():
+                raise SpecError(path, lineno, 'bits must be a number')
+            n_bits = int(value)
+        elif section is None:
+            raise SpecError(path, lineno, 'formula outside of the sections')
+        elif section == 'properties':
+            props.append((text, _parse(text, path, lineno)))
+        else:
+            (init if section == 'init' else trans).add(_parse(text, path, lineno))
+    if n_bits is None:
+        raise SpecError(path, 1, 'the number of bits is not given')
+    return Spec(n_bits, init.result(), trans.result(), props)
+
+def load_legacy(text, path = '<spec>'):
+    """
+    Loads a specification in the original 4-tuple format from its `text`
+    """
+    try:
+        spec = ast.literal_eval(text)
+    except (ValueError, SyntaxError) as e:
+        raise SpecError(path, getattr(e, 'lineno', None) or 1, 'not a python literal: %s'%e)
+    if not (isinstance(spec, tuple) and len(spec) == 4 and isinstance(spec[0], int)
+            and isinstance(spec[1], str) and isinstance(spec[2], str)
+            and isinstance(spec[3], (list, tuple)) and all( isinstance(p, str) for p in spec[3] )):
+        raise SpecError(path, 1, 'expected a tuple of the number of bits, the initial states, the '
+                                 'transition relation and a list of properties')
+    n_bits, init_str, trans_str, prop_strs = spec
+    return Spec(n_bits, _parse(init_str, path, 1), _parse(trans_str, path, 1),
+                [ (p, _parse(p, path, 1)) for p in prop_strs ])
+
+def load_spec(path):
+    """
+    Loads the specification file at `path`, in either format or in the AIGER format (see
+    `aiger.py`), and returns its `Spec`. Raises `SpecError` if the file is not a specification.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic in (b'aag ', b'aig '):
+        import aiger
+        return aiger.load_aiger(path)
+    with open(path) as f:
+        line = ''
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                break
+        f.seek(0)
+        if line.startswith('('):
+            return load_legacy(f.read(), path)
+        return load_sectioned(f, path)
+
+def load_spec_or_exit(path):
+    """
+    Loads the specification file at `path` as `load_spec` does, for the command line scripts. If it
+    is not a specification, prints the `SpecError` to stderr and exits with status 1.
+    """
+    try:
+        return load_spec(path)
+    except SpecError as e:
+        print(str(e), file = sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    argp = argparse.ArgumentParser(description = 'Loads a specification file')
+    argp.add_argument('spec_file')
+    args = argp.parse_args()
+
+    spec = load_spec_or_exit(args.spec_file)
+    print('%d bits, initial states of size %d, transition relation of size %d'%(spec.n_bits,
+                spec.init.size, spec.trans.size))
+    for prop_str, _ in spec.props:
+        print(prop_str)
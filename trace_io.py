@@ -0,0 +1,307 @@
+"""
+Writes counterexamples to files, for waveform viewers and other tools.
+
+A trace is written state by state by one of the writers of `WRITERS`, so that the text of a long
+trace is never built up in memory:
+
+  vcd         a value change dump, as read by waveform viewers like GTKWave, with one signal for
+              each bit, and one time step for each state
+  json        a JSON object, with the number of bits, the loop, the formulas of the annotations and
+              the list of the states, each with its bits as a string of 0s and 1s
+  csv         one row for each state, with the step, the bits, and the annotations
+  bin         a compact binary file, with a header, followed by the states packed 8 bits to a byte,
+              see `BinWriter` and `read_bin`
+
+Besides the bits, the writers mark the state that the last state of a looping trace is the same as,
+where the trace loops back to, with a `loop` signal or column. They can also annotate each state
+with the values in the model of the variables of the encoding for the truth of the subformulas of
+the LTL property, the `nl_*`/`lp_*` variables of `ltl_encode.py`, or the `lin_*` variables of
+`ltl_linear_encode.py`. These are captured from the
+model when the trace is read from it, see `utils.trace_print` and `capture`, and are named like the
+variables, without the positions, as `nl_<id>`, `lp_<id>` or `lin_<id>`, where `<id>` is the `id` of
+the subformula. The formulas of the annotations are those of the property as checked, so in the
+numbering of the bits of the cone of influence if the model was reduced, see `coi.py`. Values not
+in the model are unknown.
+
+When writing traces is started (see `start`), `parallel.check_properties` writes the trace of each
+property found to have a counterexample to `<prefix>_<index>.<format>`, where `<index>` is the index
+of the property in the specification.
+
+NumPy is only needed for the binary format.
+
+Command line usage:
+    python trace_io.py <bin_file> [vcd|json|csv] [out_file]
+
+    Converts the binary trace file `bin_file` to another format, printing it or writing it to
+    `out_file`.
+"""
+
+import sys
+import json
+import struct
+from collections import OrderedDict
+
+# The prefix of the files the traces are written to, None when they are not written, their format,
+# and whether the states are annotated, see `start`
+prefix = None
+fmt = 'vcd'
+annotate = False
+
+# The annotations captured by `capture` for the last trace read from a model
+_captured = None
+
+def start(file_prefix, trace_format = 'vcd', annotations = False):
+    """
+    Starts writing the traces found to files starting with `file_prefix`, in the format
+    `trace_format`, with the annotations captured from the models if `annotations`
+    """
+    global prefix, fmt, annotate
+    prefix, fmt, annotate = file_prefix, trace_format, annotations
+
+def options():
+    """
+    The options given to `start`, passed on to the worker processes, see `parallel.py`
+    """
+    return prefix, fmt, annotate
+
+def capture(model, length, loop, ast = None):
+    """
+    Captures the annotations of the trace of `length` states looping back to `loop` (see
+    `utils.Trace`) found in the z3 `model`, if annotations are on, for the subformulas of the ast
+    `ast` of the property checked, if given. The captured annotations are written with the trace, see
+    `write_result`.
+    """
+    global _captured
+    _captured = None
+    if not annotate or ast is None:
+        return
+    from utils import eval_states
+    from varpool import pool
+    from ltl_linear_encode import subformulas
+    k = length - 1
+    annotations = OrderedDict()
+    for node in subformulas(ast):
+        if loop >= 0:
+            classic = ('lp', [ ('lp', node.id, k, i, loop) for i in range(length) ])
+        else:
+            classic = ('nl', [ ('nl', node.id, k, i) for i in range(length) ])
+        for name, keys in (classic, ('lin', [ ('lin', node.id, i) for i in range(length) ])):
+            variables = [ pool.lookup(key) for key in keys ]
+            known = [ v for v in variables if v is not None ]
+            if not known:
+                continue
+            vals = iter(eval_states(model, [known])[0])
+            annotations['%s_%d'%(name, node.id)] = (str(node),
+                                    [ None if v is None else next(vals) for v in variables ])
+    _captured = annotations
+
+class Writer():
+    """
+    Writes a trace of `length` states of `n_bits` bits looping back to `loop` (see `utils.Trace`),
+    with the annotations `annotations`, a dict from the name of each annotation to the pair of its
+    formula and the list of its values (0, 1 or None) in the states, to the file `f`. The states are
+    passed one by one to `state`, and `end` finishes the file.
+    """
+    def __init__(self, f, n_bits, length, loop, annotations):
+        self.f = f
+        self.n_bits = n_bits
+        self.length = length
+        self.loop = loop
+        self.annotations = annotations
+        self.k = 0
+        self.begin()
+
+    def begin(self):
+        pass
+
+    def state(self, bits):
+        """
+        Writes the next state, with the values (0 or 1) of the bits `bits`
+        """
+        self.write_state(self.k, bits, [ vals[self.k] for _, vals in self.annotations.values() ])
+        self.k += 1
+
+    def end(self):
+        pass
+
+def _vcd_id(i):
+    # The identifier code of the `i`-th signal, in the printable characters `!` to `~`
+    code = ''
+    while True:
+        code += chr(33 + i % 94)
+        i //= 94
+        if i == 0:
+            return code
+
+class VcdWriter(Writer):
+    # Only the changes of the signals are written at each time step
+    def begin(self):
+        names = [ 'v%d'%i for i in range(self.n_bits) ] + ['loop'] + list(self.annotations)
+        self.ids = [ _vcd_id(i) for i in range(len(names)) ]
+        self.last = None
+        w = self.f.write
+        w('$version BoundedMC $end\n')
+        if self.loop >= 0:
+            w('$comment The last state is the same as the state at time %d $end\n'%self.loop)
+        for name, (formula, _) in self.annotations.items():
+            w('$comment %s is %s $end\n'%(name, formula))
+        w('$timescale 1 ns $end\n$scope module trace $end\n')
+        for code, name in zip(self.ids, names):
+            w('$var wire 1 %s %s $end\n'%(code, name))
+        w('$upscope $end\n$enddefinitions $end\n')
+
+    def write_state(self, k, bits, extra):
+        vals = [ str(b) for b in bits ] + ['1' if k == self.loop else '0'] \
+                        + [ 'x' if v is None else str(v) for v in extra ]
+        if self.last is None:
+            changes = [ v + c for v, c in zip(vals, self.ids) ]
+            self.f.write('#0\n$dumpvars\n%s\n$end\n'%'\n'.join(changes))
+        else:
+            changes = [ v + c for v, c, u in zip(vals, self.ids, self.last) if v != u ]
+            self.f.write('#%d\n'%k + ''.join( ch + '\n' for ch in changes ))
+        self.last = vals
+
+    def end(self):
+        self.f.write('#%d\n'%self.k)
+
+class JsonWriter(Writer):
+    # The states are written one to a line, so that the object is never built up
+    def begin(self):
+        head = OrderedDict([('n_bits', self.n_bits), ('length', self.length), ('loop', self.loop),
+                    ('annotations', OrderedDict( (name, formula) for name, (formula, _)
+                                                                in self.annotations.items() ))])
+        self.f.write(json.dumps(head)[:-1] + ', "states": [\n')
+
+    def write_state(self, k, bits, extra):
+        st = OrderedDict([('bits', ''.join(map(str, bits)))])
+        st.update(zip(self.annotations, extra))
+        self.f.write(('' if k == 0 else ',\n') + json.dumps(st))
+
+    def end(self):
+        self.f.write('\n]}\n')
+
+class CsvWriter(Writer):
+    def begin(self):
+        self.f.write(','.join(['step'] + [ 'v%d'%i for i in range(self.n_bits) ] + ['loop']
+                                + list(self.annotations)) + '\n')
+
+    def write_state(self, k, bits, extra):
+        self.f.write(','.join([str(k)] + [ str(b) for b in bits ] + ['1' if k == self.loop else '0']
+                                + [ '' if v is None else str(v) for v in extra ]) + '\n')
+
+# The magic number of the binary format, and its header, with the number of bits, the number of
+# states, the loop, and the number of annotations
+MAGIC = b'BMCTRACE'
+_HEADER = struct.Struct('<IIiI')
+
+def pack(states, n_bits):
+    """
+    Returns the states with the bits `states`, a list of the tuples of the bits of each state or a 2d
+    array, as a NumPy array of bytes, with a row of `ceil(n_bits / 8)` bytes for each state, holding
+    the bits from the least significant bit of the first byte
+    """
+    import numpy as np
+    bits = np.asarray(states, dtype = np.uint8).reshape(-1, n_bits)
+    return np.packbits(bits, axis = 1, bitorder = 'little')
+
+def unpack(packed, n_bits):
+    """
+    The inverse of `pack`, returns the 2d array of the bits of the states
+    """
+    import numpy as np
+    return np.unpackbits(packed, axis = 1, count = n_bits, bitorder = 'little')
+
+class BinWriter(Writer):
+    """
+    The binary format is the magic number `MAGIC`, the header `_HEADER`, the name and the formula of
+    each annotation, each as a 32 bit length followed by the UTF-8 text, and then, for each state,
+    its bits packed as by `pack`, followed by the values of the annotations, one signed byte for
+    each, -1 if unknown.
+    """
+    def begin(self):
+        self.f.write(MAGIC + _HEADER.pack(self.n_bits, self.length, self.loop,
+                                          len(self.annotations)))
+        for name, (formula, _) in self.annotations.items():
+            for text in (name, formula):
+                data = text.encode()
+                self.f.write(struct.pack('<I', len(data)) + data)
+
+    def write_state(self, k, bits, extra):
+        import numpy as np
+        self.f.write(pack(bits, self.n_bits).tobytes())
+        if extra:
+            self.f.write(np.array([ -1 if v is None else v for v in extra ], np.int8).tobytes())
+
+def read_bin(f):
+    """
+    Reads the trace in the binary format from the binary file `f`, returns the `Trace` and the
+    annotations, as given to `Writer`
+    """
+    import numpy as np
+    from utils import Trace
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a binary trace file')
+    n_bits, length, loop, n_annotations = _HEADER.unpack(f.read(_HEADER.size))
+    def text():
+        size, = struct.unpack('<I', f.read(4))
+        return f.read(size).decode()
+    names = [ (text(), text()) for _ in range(n_annotations) ]
+    row = (n_bits + 7) // 8
+    data = np.frombuffer(f.read(), dtype = np.uint8).reshape(length, row + n_annotations)
+    bits = unpack(np.ascontiguousarray(data[:, :row]), n_bits)
+    extra = data[:, row:].view(np.int8)
+    annotations = OrderedDict( (name, (formula, [ None if v < 0 else int(v) for v in extra[:, j] ]))
+                                        for j, (name, formula) in enumerate(names) )
+    return Trace([ tuple(state) for state in bits.tolist() ], loop), annotations
+
+# The writers of the formats, and whether they write binary files
+WRITERS = {
+    'vcd': (VcdWriter, False),
+    'json': (JsonWriter, False),
+    'csv': (CsvWriter, False),
+    'bin': (BinWriter, True),
+}
+
+def write_trace(f, trace_format, n_bits, trace, annotations = None):
+    """
+    Writes the `Trace` `trace` of a model with `n_bits` bits, with the `annotations`, if any, as in
+    `Writer`, to the file `f`, opened in binary mode for the `bin` format, in the format
+    `trace_format`
+    """
+    writer = WRITERS[trace_format][0](f, n_bits, len(trace.states), trace.loop,
+                             OrderedDict() if annotations is None else annotations)
+    for state in trace.states:
+        writer.state(state)
+    writer.end()
+
+def write_result(index, n_bits, res):
+    """
+    Writes the counterexample of the `CheckResult` `res` for the property at the index `index` of a
+    model with `n_bits` bits, if there is one and writing traces is started, along with the captured
+    annotations, see `capture`. Returns the path of the file written, or None. Called after checking
+    each property, so that the annotations captured are always those of the last property.
+    """
+    global _captured
+    annotations, _captured = _captured, None
+    if prefix is None or res is None or res.trace is None:
+        return None
+    # The annotations are dropped if the trace was changed after being read from the model
+    if annotations is None or any( len(vals) != len(res.trace.states)
+                                                    for _, vals in annotations.values() ):
+        annotations = None
+    path = '%s_%d.%s'%(prefix, index, fmt)
+    with open(path, 'wb' if WRITERS[fmt][1] else 'w') as f:
+        write_trace(f, fmt, n_bits, res.trace, annotations)
+    return path
+
+if __name__ == "__main__":
+    with open(sys.argv[1], 'rb') as f:
+        trace, annotations = read_bin(f)
+    out_format = sys.argv[2] if len(sys.argv) > 2 else 'vcd'
+    n_bits = len(trace.states[0]) if trace.states else 0
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'wb' if WRITERS[out_format][1] else 'w') as out:
+            write_trace(out, out_format, n_bits, trace, annotations)
+    else:
+        out = sys.stdout.buffer if WRITERS[out_format][1] else sys.stdout
+        write_trace(out, out_format, n_bits, trace, annotations)
@@ -0,0 +1,102 @@
+"""
+Defines the unrolling of the transition relation used by the BMC loops.
+
+Transition relations are often deterministic, with each bit of the next state given as a function
+of the current state by a conjunct `(vj = f)` or `(vj ^ f)` of the relation, where `f` only uses the
+`ui` (see `coi.definition`). Unrolling `trans(st[k], st[k+1])` over fresh variables for the next
+state leaves the solver to propagate these definitions through equality constraints at every step.
+Instead, the `Unroller` substitutes the current state into `f` to get the expression for bit `j` of
+the next state directly, so such bits need neither variables nor constraints. Only the bits that
+are not defined this way, or are defined more than once, get the variables `s_k_j` of the shared
+pool, and only the conjuncts of the relation which are not definitions are added as constraints,
+over the mix of expressions and variables that makes up the next state.
+
+z3 rewrites each formula asserted to a solver in full, so the expressions for the states cannot be
+allowed to grow along the whole path, as the cost of the assertions would then be quadratic in its
+length. Every `ANCHOR`-th state is built relationally instead, with variables for all its bits, so
+that the substituted expressions only span the few steps since the last such state.
+
+The states of a path unrolled in this way are lists of z3 expressions rather than of variables, so
+the traces are read from the models by evaluating them, see `utils.trace_print`. The `'relational'`
+kind of unroller adds the whole relation over fresh variables, as the loops used to, and is kept to
+compare with. Which of the two the engines use is decided by `mode`, see `Unroller`.
+"""
+
+import z3
+from varpool import pool
+from parse_to_z3 import compile_ast_z3, Z3Template
+from coi import conjuncts, definition, conjunction, Supports
+
+# The kind of unrolling used by default, either 'functional' or 'relational'
+mode = 'functional'
+
+# The functional bits of every `ANCHOR`-th state of a path get variables, see `Unroller`
+ANCHOR = 4
+
+class Unroller():
+    """
+    Unrolls the transition relation `trans`, as returned by `parse_trans_z3_gen`, of a model with
+    `n_bits` bits, either by substituting the definitions of the functional bits, or relationally,
+    as given by `kind`, defaulting to `mode`. `functional` is the sorted list of the bits whose next
+    values are computed by substitution, except in the states at the steps which are multiples of
+    `anchor`, defaulting to `ANCHOR`. A relation given as a plain function, without its ast, is
+    always unrolled relationally.
+    """
+    def __init__(self, n_bits, trans, kind = None, anchor = None):
+        kind = mode if kind is None else kind
+        if kind not in ('functional', 'relational'):
+            raise ValueError('Unknown kind of unrolling %s'%kind)
+        self.anchor = ANCHOR if anchor is None else anchor
+        self.n_bits = n_bits
+        self.trans = trans
+        self.functional = []
+        self.next = None
+        if kind == 'relational' or getattr(trans, 'ast', None) is None:
+            return
+
+        defs, rest, supports = {}, [], Supports()
+        for c in conjuncts(trans.ast):
+            d = definition(c, supports)
+            if d is None:
+                rest.append(c)
+            else:
+                defs.setdefault(d[0], []).append((c, d[1]))
+        for j, ds in list(defs.items()):
+            if len(ds) > 1:
+                # Several definitions of the same bit constrain the current state
+                rest += [ c for c, f in ds ]
+                del defs[j]
+        if not defs:
+            return
+
+        canon = [ z3.Var(i, z3.BoolSort()) for i in range(2*n_bits) ]
+        get_var = lambda name: canon[int(name[1:]) + (n_bits if name[0] == 'v' else 0)]
+        done = {}
+        self.functional = sorted(defs)
+        fs = [ compile_ast_z3(defs[j][0][1], get_var, 'Transition', done) for j in self.functional ]
+        # The definitions are packed as the arguments of a single application, so that the next
+        # state is built by one substitution, sharing the subexpressions of the definitions
+        pack = z3.Function('unroll_next', *([z3.BoolSort()] * (len(fs) + 1)))
+        self.next = Z3Template(pack(*fs), None, n_bits, 1)
+        if rest:
+            rest_ast = conjunction(rest)
+            self.rest = Z3Template(compile_ast_z3(rest_ast, get_var, 'Transition', done), rest_ast,
+                                   n_bits, 2)
+        else:
+            self.rest = None
+
+    def step(self, cur, k):
+        """
+        Given the list `cur` of the z3 expressions for the bits of a state, returns the list of the
+        expressions for the bits of its successor, which is the state at step `k` of the path,
+        along with the z3 constraint relating the two.
+        """
+        nxt = pool.state(k, self.n_bits)
+        if self.next is None or k % self.anchor == 0:
+            return nxt, self.trans(cur, nxt)
+        app = self.next(cur)
+        for a, j in enumerate(self.functional):
+            nxt[j] = app.arg(a)
+        if self.rest is None:
+            return nxt, z3.BoolVal(True)
+        return nxt, self.rest(cur, nxt)
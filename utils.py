@@ -1,59 +1,195 @@
 """
 Several utility functions
+
+z3 is only used by the functions that need it, through the module, so that the engines that do not
+use it (see `explicit.py` and `bdd.py`) can import the rest without loading it, see `boundedmc.py`.
 """
 
-from z3 import *
+from collections import namedtuple
+import z3
+import trace_io
 from parser.formulas import *
 
-def trace_print(n_bits, length, model, loop = -1):
+# A counterexample, `states` is the list of states of the trace, each a tuple of the values (0 or 1)
+# of the bits, and `loop` is the index of the state the last state loops back to, or -1 if the trace
+# does not loop.
+Trace = namedtuple('Trace', ['states', 'loop'])
+
+# The result of checking a property. `verdict` is 'cex' if the counterexample `trace` was found,
+# 'proved' if the property was proved, 'bounded' if there is no counterexample upto the bound
+# `depth`, and None if the property was not checked. `depth` is the length of the counterexample,
+# the bound upto which there are none, or the depth at which the property was proved.
+CheckResult = namedtuple('CheckResult', ['verdict', 'trace', 'depth'])
+
+def trace_print(n_bits, length, model, loop = -1, states = None, ast = None):
+    """
+    Prints out the trace as a neat sequence of states given a z3 sat model, and returns it as a
+    `Trace`. `states` is the list of the lists of z3 expressions for the bits of the states of the
+    trace, see `unroll.py`. If it is not given, the variable for the ith bit of the kth state in the
+    trace must be the one from the shared variable pool, see `varpool.py`. `ast` is the ast of the
+    LTL formula encoded, if any, whose subformulas the trace may be annotated with, see
+    `trace_io.capture`.
+    """
+
+    if states is None:
+        from varpool import pool
+        states = [ pool.state(k, n_bits) for k in range(length) ]
+    states = eval_states(model, states[:length])
+    trace = Trace(states, loop)
+    trace_io.capture(model, length, loop, ast)
+    print_trace(n_bits, trace)
+    return trace
+
+def print_trace(n_bits, trace):
     """
-    Prints out the trace as a neat sequence of states given a z3 sat model. Note that in the model,
-    the variable for the ith bit of the kth state in the trace must be named s_k_i
+    Prints out the `Trace` as a neat sequence of states
     """
-    
     print(''.join(['v%-3d'%i for i in range(n_bits)]))
-    for k in range(length):
-        print(''.join(['%-4d'%(1 if model.eval(Bool('s_%d_%d'%(k,i))) == True else 0) 
-                                    for i in range(n_bits)]))
-        if k == loop:
+    for k, state in enumerate(trace.states):
+        print(''.join(['%-4d'%b for b in state]))
+        if k == trace.loop:
             print('Loop:')
 
+def eval_states(model, states):
+    """
+    Returns the values of the states with the lists of z3 expressions `states` in the z3 `model`, as
+    tuples of the values (0 or 1) of the bits. Bits not fixed by the model are 0.
+
+    The expressions for the states of a path unrolled by substitution (see `unroll.py`) share most of
+    their subexpressions, so they are all evaluated by a single call to the model, as the arguments
+    of an application of an uninterpreted function, which evaluates each shared subexpression once.
+    The values are then read off the printed result in one go, unless some of them are not
+    constants, when they are read one by one.
+    """
+    flat = [ v for st in states for v in st ]
+    if not flat:
+        return [ () for st in states ]
+    # The z3py wrappers check every argument, so the C api is used directly, as in `parse_to_z3.py`
+    ctx = z3.main_ctx()
+    ref = ctx.ref()
+    n, bool_sort = len(flat), z3.BoolSort(ctx).ast
+    pack = z3.FuncDeclRef(z3.Z3_mk_func_decl(ref, z3.to_symbol('eval_pack', ctx), n,
+                                             (z3.Sort * n)(*[bool_sort] * n), bool_sort), ctx)
+    app = z3.BoolRef(z3.Z3_mk_app(ref, pack.ast, n, (z3.Ast * n)(*[ v.as_ast() for v in flat ])),
+                     ctx)
+    res = (z3.Ast * 1)()
+    if not z3.Z3_model_eval(ref, model.model, app.as_ast(), False, res):
+        raise z3.Z3Exception('Failed to evaluate the states in the model')
+    res = z3.BoolRef(res[0], ctx)
+    vals = _read_pack(z3.Z3_ast_to_string(ref, res.as_ast()), n)
+    if vals is None:
+        vals = []
+        for i in range(n):
+            arg = z3.Z3_get_app_arg(ref, res.as_ast(), i)
+            val = z3.Z3_get_bool_value(ref, arg)
+            if val == z3.Z3_L_UNDEF:
+                # The value depends on bits left free by the model
+                val = model.eval(z3.BoolRef(arg, ctx), model_completion = True)
+                val = z3.Z3_L_TRUE if z3.is_true(val) else z3.Z3_L_FALSE
+            vals.append(1 if val == z3.Z3_L_TRUE else 0)
+    out, i = [], 0
+    for st in states:
+        out.append(tuple(vals[i:i+len(st)]))
+        i += len(st)
+    return out
+
+def _read_pack(text, n):
+    # The values of the `n` arguments of the printed application `text` of `eval_pack`, if all of
+    # them are constants. The variables the model leaves free are 0, as with model completion.
+    if not text.startswith('(eval_pack ') or text.count('(') != 1:
+        return None
+    vals = [ 1 if t == 'true' else 0 for t in text[len('(eval_pack '):-1].split() ]
+    return vals if len(vals) == n else None
+
+def distinct_states(s1, s2):
+    """
+    Returns the z3 expression saying that the states with the lists of variables `s1` and `s2` differ
+    """
+    return z3.Or([ z3.Xor(a, b) for a, b in zip(s1, s2) ])
+
+def repeated_states(model, st):
+    """
+    Given a z3 model and a list `st` of lists of state expressions, returns the pairs `(i, j)` with
+    `i < j` such that the states `st[i]` and `st[j]` are the same in `model`, and no state between
+    them is the same as them. The path is simple iff there are no such pairs.
+    """
+    last, pairs = {}, []
+    for j, key in enumerate(eval_states(model, st)):
+        if key in last:
+            pairs.append((last[key], j))
+        last[key] = j
+    return pairs
+
+def is_temporal(ast):
+    """
+    Whether the formula `ast` uses any LTL operator, that is, whether it is not a predicate
+    """
+    seen, stack = set(), [ast]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Formula) or node in seen:
+            continue
+        seen.add(node)
+        if node.type in ('X', 'F', 'G', 'U', 'R'):
+            return True
+        if isinstance(node, FormulaDyadic):
+            stack.extend((node.left, node.right))
+        elif node.type == 'NOT':
+            stack.append(node.child)
+    return False
+
+
+# The dual of each operator, which the negation of a formula with that operator at the top becomes
+_DUAL = { 'AND': 'OR', 'OR': 'AND', 'X': 'X', 'F': 'G', 'G': 'F', 'U': 'R', 'R': 'U' }
+
+def _negate_literal(node):
+    # The negation of a proposition, negated proposition or literal
+    if node.type == 'LITERAL':
+        return FormulaMonadic('LITERAL', 'fls' if node.child == 'tru' else 'tru')
+    return FormulaMonadic('NEGPROP' if node.type == 'PROP' else 'PROP', node.child)
 
 def ast_to_nnf(ast):
     """
-    Converts the AST of the LTL formula to NNF form. Note: this causes exponential blowup for U and
-    R
+    Converts the AST of the LTL formula to NNF form. The negations are pushed down to the
+    propositions, turning each operator under an odd number of negations into its dual, so `U` and
+    `R` become each other without blowing up. The formula is walked as a DAG, converting each
+    distinct subformula once for each of the polarities it appears with, so the result has at most
+    twice as many distinct subformulas as `ast`, and deep formulas do not run into the recursion
+    limit.
     """
     if type(ast) == str:
         return ast
-    if ast.type != 'NOT':
-        if isinstance(ast, FormulaMonadic):
-            return FormulaMonadic(ast.type, ast_to_nnf(ast.child))
+    # Maps the pairs of a subformula and whether it is negated to their NNF
+    done = {}
+    stack = [(ast, False)]
+    while stack:
+        key = stack[-1]
+        if key in done:
+            stack.pop()
+            continue
+        node, neg = key
+        if node.type in ('PROP', 'NEGPROP', 'LITERAL'):
+            done[key] = _negate_literal(node) if neg else node
+        elif node.type == 'NOT':
+            child = (node.child, not neg)
+            if child not in done:
+                stack.append(child)
+                continue
+            done[key] = done[child]
+        elif isinstance(node, FormulaMonadic):
+            child = (node.child, neg)
+            if child not in done:
+                stack.append(child)
+                continue
+            done[key] = FormulaMonadic(_DUAL[node.type] if neg else node.type, done[child])
         else:
-            return FormulaDyadic(ast.type, ast_to_nnf(ast.left), ast_to_nnf(ast.right))
-    if ast.child.type == 'NOT':
-        return ast_to_nnf(ast.child.child)
-    elif ast.child.type == 'LITERAL':
-        return FormulaMonadic('LITERAL', 'fls' if ast.child.child == 'tru' else 'tru')
-    elif ast.child.type == 'PROP':
-        return FormulaMonadic('NEGPROP', ast.child.child)
-    elif ast.child.type == 'AND':
-        return FormulaDyadic('OR', ast_to_nnf(FormulaMonadic('NOT', ast.child.left)),
-                                    ast_to_nnf(FormulaMonadic('NOT', ast.child.right)))
-    elif ast.child.type == 'OR':
-        return FormulaDyadic('AND', ast_to_nnf(FormulaMonadic('NOT', ast.child.left)),
-                                    ast_to_nnf(FormulaMonadic('NOT', ast.child.right)))
-    elif ast.child.type == 'X':
-        return FormulaMonadic('X', ast_to_nnf(FormulaMonadic('NOT', ast.child.child)))
-    elif ast.child.type == 'F':
-        return FormulaMonadic('G', ast_to_nnf(FormulaMonadic('NOT', ast.child.child)))
-    elif ast.child.type == 'G':
-        return FormulaMonadic('F', ast_to_nnf(FormulaMonadic('NOT', ast.child.child)))
-    elif ast.child.type == 'U':
-        return FormulaDyadic('R', ast_to_nnf(FormulaMonadic('NOT', ast.child.left)),
-                                    ast_to_nnf(FormulaMonadic('NOT', ast.child.right)))
-    elif ast.child.type == 'R':
-        return FormulaDyadic('U', ast_to_nnf(FormulaMonadic('NOT', ast.child.left)),
-                                    ast_to_nnf(FormulaMonadic('NOT', ast.child.right)))
+            left, right = (node.left, neg), (node.right, neg)
+            if left not in done or right not in done:
+                stack.extend((right, left))
+                continue
+            done[key] = FormulaDyadic(_DUAL[node.type] if neg else node.type, done[left],
+                                      done[right])
+        stack.pop()
+    return done[(ast, False)]
 
 
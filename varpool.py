@@ -0,0 +1,88 @@
+"""
+Defines the pool of z3 boolean variables shared by all the encodings.
+
+Every variable used by the engines is created here exactly once, when it is first asked for, and is
+then reused. The state variables, `s_k_i` for the `i`-th bit of the `k`-th state of a path, are
+stored in a list of lists indexed by the step `k` and the bit `i`. The auxiliary variables of the
+LTL encodings are stored in a table indexed by tuples like `('nl', node_id, k, i)` or
+`('lp', node_id, k, i, l)`, where `node_id` is the `id` of the (hash-consed) subformula (see
+`parser/formulas.py`). The z3 name of a variable is built only once, when it is created, so the hot
+loops of the encoders do no string formatting and z3 does no name interning. Note that the names of
+the variables are kept the same as before, that is `s_k_i`, `nl_id_k_i`, `lp_id_k_i_l` and so on,
+so that models remain readable.
+
+The state variables are the same for every property, but the auxiliary ones are only used by the
+check of one property, so `parallel.check_properties` drops them with `clear_aux` before checking
+each property, to keep the pool from growing with the number of properties.
+"""
+
+import z3
+
+class VarPool():
+    """
+    A pool of z3 boolean variables, allocated lazily and reused.
+    """
+    def __init__(self, ctx = None):
+        self.ctx = z3.main_ctx() if ctx is None else ctx
+        self._ref = self.ctx.ref()
+        self._sort = z3.BoolSort(self.ctx).ast
+        self._states = []       # _states[k][i] is the variable for bit i of step k
+        self._aux = {}          # Auxiliary variables, indexed by tuples
+
+    def _mk(self, name):
+        # Same as `z3.Bool(name)`, but without the overhead of the argument checks
+        return z3.BoolRef(z3.Z3_mk_const(self._ref, z3.Z3_mk_string_symbol(self._ref, name),
+                                self._sort), self.ctx)
+
+    def state(self, k, n_bits):
+        """
+        Returns the list of the variables for the `n_bits` bits of the state at step `k`
+        """
+        states = self._states
+        while len(states) <= k:
+            states.append([])
+        row = states[k]
+        if len(row) < n_bits:
+            row.extend([ self._mk('s_%d_%d'%(k, i)) for i in range(len(row), n_bits) ])
+        return row[:n_bits]
+
+    def state_var(self, k, i):
+        """
+        Returns the variable for the `i`-th bit of the state at step `k`
+        """
+        try:
+            return self._states[k][i]
+        except IndexError:
+            return self.state(k, i+1)[i]
+
+    def var(self, key):
+        """
+        Returns the auxiliary variable for the given `key`, a tuple of a string prefix followed by
+        integers, named by joining the elements of the key with `_`.
+        """
+        v = self._aux.get(key)
+        if v is None:
+            v = self._aux[key] = self._mk('_'.join(map(str, key)))
+        return v
+
+    def lookup(self, key):
+        """
+        Returns the auxiliary variable for the given `key` if it was created, else None
+        """
+        return self._aux.get(key)
+
+    def clear_aux(self):
+        """
+        Drops the auxiliary variables, keeping the state variables
+        """
+        self._aux = {}
+
+    def clear(self):
+        """
+        Drops all the variables in the pool
+        """
+        self._states = []
+        self._aux = {}
+
+# The pool used by all the engines
+pool = VarPool()